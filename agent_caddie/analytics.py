@@ -1,4 +1,7 @@
-from questionary import text, select
+import numpy as np
+
+from .prompts import text, select
+from .scenario import scenario_fields
 
 LIE_ADJ = {
   "Above feet": +5, "Below feet": -5,
@@ -10,18 +13,44 @@ def wind_adj(dir, sp):
     return base if dir=="Headwind" else -base if dir=="Tailwind" else 0
 
 def compute_effective_distance(scn):
+    f = scenario_fields(scn)  # CLI (nested wind) or API (flat) shape
     return (
-      scn["distance"]
-      + LIE_ADJ.get(scn["lie"], 0)
-      + wind_adj(scn["wind_dir"], scn["wind_speed"])
+      f["distance"]
+      + LIE_ADJ.get(f["lie"], 0)
+      + wind_adj(f["wind_dir"], f["wind_speed"])
     )
 
+def _lookup(values, table):
+    # one vectorized comparison per known label; anything else maps to 0
+    values = np.asarray(values).reshape(-1)
+    out = np.zeros(values.shape, dtype=np.float64)
+    for label, adj in table.items():
+        out[values == label] = adj
+    return out
+
+def compute_effective_distances(columns) -> np.ndarray:
+    """Vectorized ``compute_effective_distance`` over many scenarios.
+
+    ``columns`` is anything indexable by field name (a dict of arrays, a
+    NumPy structured array, a DataFrame) with ``distance``, ``lie``,
+    ``wind_dir`` and ``wind_speed``. Results match the scalar function
+    exactly, row for row.
+    """
+    distance = np.asarray(columns["distance"], dtype=np.float64).reshape(-1)
+    wind_speed = np.asarray(columns["wind_speed"], dtype=np.float64).reshape(-1)
+    lie_adj = _lookup(columns["lie"], LIE_ADJ)
+    wind_sign = _lookup(columns["wind_dir"], {"Headwind": 1.0, "Tailwind": -1.0})
+    return distance + lie_adj + wind_sign * (wind_speed * 0.5)
+
+def classify_result(error):
+    if abs(error) <= 5: return "perfect"
+    elif error<0:     return "too short"
+    else:             return "too long"
+
 def record_shot_result(scn):
     carried = float(text("How many yards did it carry?").ask())
     error = carried - scn["distance"]
-    if abs(error) <= 5: res="perfect"
-    elif error<0:     res="too short"
-    else:             res="too long"
+    res = classify_result(error)
     cause = None
     if res!="perfect":
         cause = select("What went wrong?", choices=[
@@ -1,22 +1,112 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import List
-import openai
+from pydantic import BaseModel, ValidationError
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
+import asyncio
+import json
+import logging
 import os
+import re
+import secrets
+import tempfile
+import time
 from dotenv import load_dotenv
 
 # Import your modules using absolute paths if app.py is at the project root
 from .prompts import build_prompt
-from .analytics import compute_effective_distance
-from .db import save_club_distances, get_similar_shots, save_shot
+from .analytics import compute_effective_distance, classify_result
+from .scenario import canonical_scenario
+from .db import (
+    asave_club_distances, aretrieve_similar_shots, asave_shot,
+    save_shot_index, history_version, bump_history, aget_club_distances, asearch_shots,
+    club_stats, club_distance_cache, RETRIEVAL_MODE
+)
+from .embeddings import aget_embeddings, embedding_cache, embedding_batcher
+from .fastpath import (
+    FASTPATH_ENABLED, pick_club, fast_path_message, fallback_message, observed_distances
+)
+from .cache import TTLCache
+from .singleflight import SingleFlight, SharedCalls
+from .pipeline import Pipeline, Stage
+from .sse import SSE_HEADERS, coalesce, sse_event
+from .metrics import REGISTRY, ERRORS, callback, counter, histogram, stage
+from .clients import aclose_clients
+from .llm import CHAT_MODEL, LLMTimeout, stream_chat
+from .writebehind import ShotQueue, WriteBehindWorker
+from .warmup import LOCAL_SHOT_INDEX, WARMUP_ON_START, start_warmup, warmup, report
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+# strong references to fire-and-forget tasks so they are not garbage collected
+_background_tasks = set()
 
 load_dotenv()
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
+IMPORT_CHECKPOINT_DIR = os.getenv("IMPORT_CHECKPOINT_DIR", tempfile.gettempdir())
+# /record enqueues to a durable local queue and returns; a background worker
+# embeds and inserts in batches
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+WRITE_BEHIND_PATH = os.getenv(
+    "WRITE_BEHIND_PATH", os.path.join(tempfile.gettempdir(), "agent-caddie-shot-queue.sqlite")
+)
+write_behind = None  # WriteBehindWorker once the app has started
+# similar past shots fetched per recommendation; build_prompt summarizes
+# them per club when they would not fit PROMPT_TOKEN_BUDGET
+HISTORY_K = int(os.getenv("PROMPT_HISTORY_K", "3"))
+# finished token streams keyed by scenario, user and history version, so a
+# repeated question replays without another retrieval or LLM call
+response_cache = TTLCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "512")),
+    ttl_s=float(os.getenv("RESPONSE_CACHE_TTL", "900")),
+)
+recommend_flights = SingleFlight()
+shared_retrievals = SharedCalls()
+# /prefetch sessions: a partly answered shot's stages, picked up by the
+# /recommend call carrying the same session token
+prefetch_sessions = TTLCache(
+    maxsize=int(os.getenv("PREFETCH_SESSIONS", "1024")),
+    ttl_s=float(os.getenv("PREFETCH_TTL", "120")),
+)
+# /recommend/batch fans out at most this many completions at once by default
+RECOMMEND_BATCH_CONCURRENCY = int(os.getenv("RECOMMEND_BATCH_CONCURRENCY", "4"))
+RECOMMEND_BATCH_CONCURRENCY_MAX = int(os.getenv("RECOMMEND_BATCH_CONCURRENCY_MAX", "16"))
+RECOMMEND_BATCH_MAX = int(os.getenv("RECOMMEND_BATCH_MAX", "36"))
+# POST /warmup?refresh=true must send this as X-Warmup-Token; unset refuses it
+WARMUP_TOKEN = os.getenv("WARMUP_TOKEN") or None
+# how each recommendation was answered: fast_path, cache or llm
+recommend_counts = {"fast_path": 0, "cache": 0, "llm": 0}
+# whole /recommend responses, from request to last byte streamed
+RECOMMEND_SECONDS = histogram(
+    "caddie_recommend_seconds", "Time to stream a full recommendation.", ["source", "format"]
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global write_behind
+    # pre-open client pools and load the local index in the background so a
+    # cold start can answer right away; retrieval uses the match_shots RPC
+    # until the index is in
+    warm_task = start_warmup() if WARMUP_ON_START else None
+    if WRITE_BEHIND:
+        write_behind = WriteBehindWorker(
+          ShotQueue(WRITE_BEHIND_PATH),
+          batch_size=int(os.getenv("WRITE_BEHIND_BATCH", "50")),
+        )
+        write_behind.start()
+    yield
+    if warm_task is not None and not warm_task.done():
+        warm_task.cancel()
+    if write_behind is not None:
+        # flush queued shots before the process goes away
+        await write_behind.stop()
+        write_behind.queue.close()
+        write_behind = None
+    if LOCAL_SHOT_INDEX:
+        await asyncio.to_thread(save_shot_index)
+    await aclose_clients()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS for local frontend
 app.add_middleware(
@@ -42,70 +132,670 @@ class ShotDetails(BaseModel):
     elevation: float
     wind_dir: str
     wind_speed: float
+    # "embedding" or "features"; defaults to the RETRIEVAL_MODE env var
+    retrieval: Optional[Literal["embedding", "features"]] = None
+    # skip the club-distance fast path and always ask the LLM
+    use_llm: bool = False
+
+class PrefetchDetails(BaseModel):
+    """Whatever part of a ShotDetails is known so far, plus a session token."""
+    user_id: str
+    session: Optional[str] = None
+    scenario_text: Optional[str] = None
+    distance: Optional[float] = None
+    lie: Optional[str] = None
+    ball_pos: Optional[str] = None
+    elevation: Optional[float] = None
+    wind_dir: Optional[str] = None
+    wind_speed: Optional[float] = None
+    retrieval: Optional[Literal["embedding", "features"]] = None
+    use_llm: bool = False
+
+class ShotRecord(ShotDetails):
+    recommended_club: str
+    carried: float
+    error: Optional[float] = None
+    result: Optional[str] = None
+    cause: Optional[str] = None
 
 # @app.get("/")
 # async def root():
 #     return {"message": "Hello World! V-Caddie API is running at http://localhost:8000/"}
 
+@app.get("/healthz")
+async def healthz():
+    # liveness, and what fly.toml checks: 200 while warming too, since
+    # requests are served (through fallbacks) before warmup finishes
+    return report()
+
+@app.get("/readyz")
+async def readyz():
+    # readiness: 503 until warmup has run; degraded still serves, so 200
+    body = report()
+    return JSONResponse(body, status_code=200 if body["status"] in ("ready", "degraded") else 503)
+
+@app.post("/warmup")
+async def warmup_endpoint(refresh: bool = False, x_warmup_token: Optional[str] = Header(None)):
+    """Open client pools, load the local index and report per-stage timings.
+
+    ``refresh=true`` re-runs every stage, reloading the index and
+    re-pinging upstreams, so it needs the ``X-Warmup-Token`` header to
+    match WARMUP_TOKEN; with no token configured it is refused.
+    """
+    if refresh and not (
+        WARMUP_TOKEN and x_warmup_token and secrets.compare_digest(x_warmup_token, WARMUP_TOKEN)
+    ):
+        raise HTTPException(status_code=403, detail="refresh needs a valid X-Warmup-Token")
+    return await warmup(refresh=refresh)
+
 @app.post("/api/caddie/update-yardages")
 async def update_yardages(entries: List[ClubDistanceEntry]):
     """
     Record or update average carry distances for a user’s clubs.
     """
     try:
-        save_club_distances([entry.dict() for entry in entries])
+        await asave_club_distances([entry.dict() for entry in entries])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"DB error: {e}")
     return {"saved": len(entries)}
 
+async def _replay(tokens):
+    for token in tokens:
+        yield token
+
+def _scenario(details: ShotDetails) -> dict:
+    scn = details.model_dump()
+    with stage("effective_distance"):
+        scn["effective_dist"] = compute_effective_distance(scn)
+    scn["scenario_key"] = canonical_scenario(scn)
+    return scn
+
+def _cache_key(details: ShotDetails, scn) -> tuple:
+    return (
+      details.user_id, scn["scenario_key"], details.retrieval or RETRIEVAL_MODE,
+      history_version(details.user_id), CHAT_MODEL,
+    )
+
+def _flight_key(details: ShotDetails, scn) -> tuple:
+    # the prompt depends only on the scenario and the retrieved shots, so
+    # golfers in a group asking the same thing share a flight
+    return (scn["scenario_key"], details.retrieval or RETRIEVAL_MODE, CHAT_MODEL)
+
+async def _club_distances(user_id: str) -> dict:
+    # typed-in distances, replaced by recorded carries once there are enough
+    try:
+        declared = await aget_club_distances(user_id)
+    except Exception:
+        logger.exception("Could not load club distances")
+        ERRORS.inc(stage="club_distances")
+        declared = {}
+    return observed_distances(declared, club_stats.get(user_id))
+
+async def _declared_distances(ctx):
+    return await aget_club_distances(ctx["details"].user_id)
+
+async def _user_stats(ctx):
+    return club_stats.get(ctx["details"].user_id)
+
+async def _merged_distances(ctx):
+    return observed_distances(ctx["club_distances"], ctx["club_stats"])
+
+async def _retrieval(ctx):
+    details, scn = ctx["details"], ctx["scn"]
+    # identical requests arriving together share one retrieval, as they
+    # share one completion
+    return await shared_retrievals.call(
+        _flight_key(details, scn),
+        lambda: aretrieve_similar_shots(scn, k=HISTORY_K, mode=details.retrieval),
+    )
+
+def _user_key(inputs):
+    return inputs["details"].user_id
+
+def _retrieval_key(inputs):
+    # a prefetch without the full scenario never started retrieval
+    if inputs.get("scn") is None:
+        return None
+    return _flight_key(inputs["details"], inputs["scn"])
+
+def _stage_timeout(name: str, default_ms: float) -> float:
+    return float(os.getenv(f"{name.upper()}_TIMEOUT_MS", default_ms)) / 1000
+
+# club distances, per-user aggregates and retrieval (embedding + search) run
+# at once, so the fast-path decision and the prompt's history are ready after
+# the slowest of them rather than after all of them in turn; a stage that
+# fails or misses its deadline degrades (no distances -> no fast path, no
+# history -> prompt without past shots) instead of failing the request
+recommend_pipeline = Pipeline([
+    Stage("club_distances", _declared_distances,
+          timeout_s=_stage_timeout("club_distances", 500), fallback=dict, key=_user_key),
+    Stage("club_stats", _user_stats, fallback=dict, key=_user_key),
+    Stage("distances", _merged_distances, deps=("club_distances", "club_stats"), fallback=dict,
+          key=_user_key),
+    Stage("retrieval", _retrieval, timeout_s=_stage_timeout("retrieval", 2000), fallback=list,
+          key=_retrieval_key),
+])
+# /recommend stages that a prefetch had already started
+PREFETCH_ADOPTED = counter(
+    "caddie_prefetch_adopted_total", "Stages /recommend took over from a prefetch.", ["stage"]
+)
+
+def _fast_answer(details: ShotDetails, scn, distances) -> Optional[str]:
+    if not FASTPATH_ENABLED or details.use_llm:
+        return None
+    pick = pick_club(distances, scn["effective_dist"])
+    return fast_path_message(*pick, scn["effective_dist"]) if pick else None
+
+def _completion(scn, retrieve):
+    """Producer for a SingleFlight: retrieve past shots, prompt, stream tokens."""
+    async def produce():
+        past = await retrieve()
+        with stage("prompt"):
+            messages = build_prompt(scn, past)
+        # "llm" covers the request and the whole stream; stream_chat also
+        # records llm_ttft, the wait for the first token
+        with stage("llm"):
+            async for token in stream_chat(messages):
+                yield token
+    return produce
+
+async def _fallback_answer(scn, run) -> str:
+    """Answer without the model, from what the pipeline has loaded."""
+    # distances are quick (and bounded by their stage timeout); retrieval is
+    # only used if this request started it
+    distances = await run.get("distances")
+    past = await run.get("retrieval") if "retrieval" in run.started else []
+    return fallback_message(distances, past, scn["effective_dist"])
+
+async def _timed(body, started, source, fmt):
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        RECOMMEND_SECONDS.observe(time.perf_counter() - started, source=source, format=fmt)
+
+def _wants_sse(request: Request, stream: Optional[str]) -> bool:
+    if stream is not None:
+        return stream == "sse"
+    return "text/event-stream" in request.headers.get("accept", "")
+
+def _matched_shot(shot: dict) -> dict:
+    return {k: shot.get(k) for k in ("recommended_club", "carried", "result", "effective_dist")}
+
+async def _sse_recommend(details: ShotDetails, scn, started, source, tokens=None,
+                         cache_key=None, run=None):
+    """SSE body: a meta event, coalesced token frames, then a done event.
+
+    With ``tokens`` the answer is already known (fast path or cache);
+    otherwise the pipeline ``run``'s retrieval is awaited first so the meta
+    event can list the matched shots before the completion starts.
+    """
+    timings = {}
+
+    def mark(name):
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    meta = {
+      "source": source,
+      "effective_dist": round(scn["effective_dist"], 1),
+      "scenario_key": scn["scenario_key"],
+      "matched_shots": [],
+    }
+    flight = None
+    frames = 0
+    try:
+        if tokens is None:
+            past = await run.get("retrieval")
+            mark("retrieval_ms")
+            meta["matched_shots"] = [_matched_shot(p) for p in past]
+
+            async def retrieved():
+                return past
+            flight = recommend_flights.join(_flight_key(details, scn), _completion(scn, retrieved))
+            tokens = flight.subscribe()
+        yield sse_event("meta", meta)
+        mark("meta_ms")
+        async for text in coalesce(tokens):
+            if not frames:
+                mark("ttft_ms")
+            frames += 1
+            yield sse_event("token", {"text": text})
+    except LLMTimeout as e:
+        if frames:
+            # cut off mid-answer: what was sent stays, nothing is cached
+            yield sse_event("error", {"detail": str(e)})
+            return
+        mark("ttft_ms")
+        frames, flight = 1, None
+        yield sse_event("token", {"text": await _fallback_answer(scn, run)})
+        source = "fallback"
+    except Exception as e:
+        logger.warning("SSE recommendation failed: %r", e)
+        yield sse_event("error", {"detail": str(e)})
+        return
+    if flight is not None:
+        response_cache.put(cache_key, list(flight.tokens))
+    mark("total_ms")
+    done = {"frames": frames, "timings": timings}
+    if source == "fallback":
+        done["source"] = source
+    if run is not None:
+        done["stages"] = run.timings
+        done["fallbacks"] = run.fallbacks
+        done["prefetched"] = run.adopted
+    yield sse_event("done", done)
+
+@app.post("/api/caddie/prefetch", status_code=202)
+async def prefetch(partial: PrefetchDetails):
+    """
+    Start loading what /recommend will need while the shot is still being described.
+
+    Club distances load as soon as the user is known; retrieval starts once
+    every field of the scenario is in. Returns at once with a session token
+    for ``/recommend?session=`` and for the next prefetch, which keeps
+    whatever still applies and drops the rest.
+    """
+    session = partial.session or secrets.token_urlsafe(16)
+    fields = partial.model_dump(exclude={"session"}, exclude_none=True)
+    try:
+        details = ShotDetails(**{"scenario_text": "", **fields})
+    except ValidationError:
+        details, scn = partial, None
+    else:
+        scn = _scenario(details)
+    targets = []
+    if FASTPATH_ENABLED and not partial.use_llm:
+        targets.append("distances")
+    if scn is not None and _cache_key(details, scn) not in response_cache:
+        targets.append("retrieval")
+
+    previous = prefetch_sessions.get(session)
+    run = recommend_pipeline.start(*targets, warm=previous, details=details, scn=scn)
+    if previous is not None:
+        previous.cancel()
+    prefetch_sessions.put(session, run)
+    return {"session": session, "started": run.started}
+
 @app.post("/api/caddie/recommend")
-async def recommend(details: ShotDetails):
+async def recommend(details: ShotDetails, request: Request,
+                    stream: Optional[Literal["text", "sse"]] = None,
+                    session: Optional[str] = None):
     """
     Stream a club recommendation based on shot details and past performance.
+
+    Plain text by default; with ``stream=sse`` or ``Accept: text/event-stream``
+    the answer comes as Server-Sent Events instead (see ``_sse_recommend``).
+    ``session`` is a token from ``/prefetch``; whatever it already loaded
+    for this user and scenario is used instead of being fetched again.
     """
-    # 1) Compute effective distance
-    scn = details.model_dump()
-    scn["effective_dist"] = compute_effective_distance(scn)
+    started = time.perf_counter()
+    sse = _wants_sse(request, stream)
+    # 1) Compute effective distance and the canonical scenario key
+    scn = _scenario(details)
+
+    # 2) Start loading distances and retrieving history together. Retrieval
+    # is speculative: skipped when the cache or an identical in-flight
+    # request will answer, and cancelled if the fast path does
+    fast = FASTPATH_ENABLED and not details.use_llm
+    cache_key = _cache_key(details, scn)
+    speculate = cache_key not in response_cache and _flight_key(details, scn) not in recommend_flights
+    warm = prefetch_sessions.get(session) if session else None
+    run = recommend_pipeline.start(
+        *(["distances"] if fast else []), *(["retrieval"] if speculate else []),
+        warm=warm, details=details, scn=scn,
+    )
+    if warm is not None:
+        # whatever the prefetch started for another scenario is not needed
+        warm.cancel()
+        for name in run.adopted:
+            PREFETCH_ADOPTED.inc(stage=name)
 
-    # 2) Fetch similar past shots
-    past = get_similar_shots(scn["scenario_text"])
+    # 3) Answer from the user's club distances when one club clearly fits
+    answer = _fast_answer(details, scn, await run.get("distances")) if fast else None
+    if answer is not None:
+        run.cancel()
+        recommend_counts["fast_path"] += 1
+        if sse:
+            return StreamingResponse(
+                _timed(_sse_recommend(details, scn, started, "fast-path", _replay([answer])), started, "fast_path", "sse"),
+                media_type="text/event-stream", headers={**SSE_HEADERS, "X-Recommender": "fast-path"},
+            )
+        return StreamingResponse(
+            _timed(_replay([answer]), started, "fast_path", "text"), media_type="text/plain; charset=utf-8",
+            headers={"X-Recommender": "fast-path"},
+        )
 
-    # 3) Build prompt and call OpenAI with streaming
-    messages = build_prompt(scn, past)
+    # 4) Replay a cached answer for the same question and shot history
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        run.cancel()
+        recommend_counts["cache"] += 1
+        if sse:
+            return StreamingResponse(
+                _timed(_sse_recommend(details, scn, started, "cache", _replay(cached)), started, "cache", "sse"),
+                media_type="text/event-stream",
+                headers={**SSE_HEADERS, "X-Cache": "hit", "X-Recommender": "llm"},
+            )
+        return StreamingResponse(
+            _timed(_replay(cached), started, "cache", "text"), media_type="text/plain; charset=utf-8",
+            headers={"X-Cache": "hit", "X-Recommender": "llm"},
+        )
+
+    # 5) Prompt with the retrieved history and stream, sharing one upstream
+    # stream between concurrent identical requests
+    recommend_counts["llm"] += 1
+    if sse:
+        # errors after this point arrive as an "error" event, not a 500
+        return StreamingResponse(
+            _timed(_sse_recommend(details, scn, started, "llm", cache_key=cache_key, run=run),
+                   started, "llm", "sse"),
+            media_type="text/event-stream",
+            headers={**SSE_HEADERS, "X-Cache": "miss", "X-Recommender": "llm"},
+        )
+    flight = recommend_flights.join(
+        _flight_key(details, scn), _completion(scn, lambda: run.get("retrieval")),
+    )
     try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,  # type: ignore
-            stream=True
+        await flight.wait_started()
+    except LLMTimeout:
+        # no token in time: a deterministic answer beats none
+        return StreamingResponse(
+            _timed(_replay([await _fallback_answer(scn, run)]), started, "fallback", "text"),
+            media_type="text/plain; charset=utf-8", headers={"X-Recommender": "fallback"},
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OpenAI error: {e}")
+    finally:
+        # a follower never used its own retrieval
+        run.cancel()
+    headers = {"X-Cache": "miss", "X-Recommender": "llm"}
+    if run.fallbacks:
+        headers["X-Degraded"] = ",".join(sorted(run.fallbacks))
 
     async def event_stream():
-        for chunk in response:
-            delta = chunk.choices[0].delta
-            token = getattr(delta, "content", None)
-            if token:
+        try:
+            async for token in flight.subscribe():
                 yield token
-            
+        except LLMTimeout as e:
+            # past the deadline mid-answer: end what was sent, uncached
+            logger.warning("Recommendation cut off: %s", e)
+            return
+        # only complete answers are cached; a dropped stream never gets here
+        response_cache.put(cache_key, list(flight.tokens))
+
+    return StreamingResponse(
+        _timed(event_stream(), started, "llm", "text"), media_type="text/plain; charset=utf-8",
+        headers=headers,
+    )
+
+@app.post("/api/caddie/recommend/batch")
+async def recommend_batch(shots: List[ShotDetails], concurrency: Optional[int] = None):
+    """
+    Recommend clubs for many shots at once (e.g. every approach on a course).
+
+    Streams one NDJSON line per shot in completion order, tagged with its
+    input ``index``. Club distances are looked up once per user, embeddings
+    for all LLM-bound shots go out in one batched call, and at most
+    ``concurrency`` completions run at a time.
+    """
+    if len(shots) > RECOMMEND_BATCH_MAX:
+        raise HTTPException(
+            status_code=413, detail=f"at most {RECOMMEND_BATCH_MAX} shots per batch"
+        )
+    limit = max(1, min(concurrency or RECOMMEND_BATCH_CONCURRENCY, RECOMMEND_BATCH_CONCURRENCY_MAX))
+    scenarios = [_scenario(details) for details in shots]
+    # one club-distance lookup per user, and none for shots that skip the fast path
+    users = sorted({d.user_id for d in shots if FASTPATH_ENABLED and not d.use_llm})
+    distances = dict(zip(users, await asyncio.gather(*(_club_distances(u) for u in users))))
+    semaphore = asyncio.Semaphore(limit)
+
+    async def ask_llm(i, retrieve):
+        details, scn = shots[i], scenarios[i]
+        async with semaphore:
+            flight = recommend_flights.join(_flight_key(details, scn), _completion(scn, retrieve))
+            text = "".join([token async for token in flight.subscribe()])
+        response_cache.put(_cache_key(details, scn), list(flight.tokens))
+        return {"index": i, "source": "llm", "text": text}
+
+    async def fallback(i, retrieve, retrieved):
+        # as _fallback_answer: the user's distances (loaded now if this shot
+        # skipped the fast path) and the shots the prompt was built from
+        details, scn = shots[i], scenarios[i]
+        if details.user_id not in distances:
+            distances[details.user_id] = await _club_distances(details.user_id)
+        user_distances = distances[details.user_id]
+        if retrieved:
+            past = retrieved[0]
+        else:
+            # a follower's flight ran another shot's retrieval
+            try:
+                past = await retrieve()
+            except Exception:
+                past = []
+        return fallback_message(user_distances, past, scn["effective_dist"])
+
+    async def guarded(i, retrieve):
+        retrieved = []
+
+        async def remembered():
+            retrieved.append(await retrieve())
+            return retrieved[-1]
+
+        try:
+            return await ask_llm(i, remembered)
+        except LLMTimeout as e:
+            if e.partial:
+                return {"index": i, "error": str(e)}
+            return {"index": i, "source": "fallback", "text": await fallback(i, retrieve, retrieved)}
+        except Exception as e:
+            logger.warning("Batch recommendation %d failed: %r", i, e)
+            ERRORS.inc(stage="batch")
+            return {"index": i, "error": str(e)}
+
+    async def results():
+        tasks = []
+        try:
+            # fast-path and cached answers are ready immediately
+            pending = []
+            for i, (details, scn) in enumerate(zip(shots, scenarios)):
+                answer = _fast_answer(details, scn, distances.get(details.user_id, {}))
+                if answer is not None:
+                    recommend_counts["fast_path"] += 1
+                    yield json.dumps({"index": i, "source": "fast-path", "text": answer}) + "\n"
+                    continue
+                cached = response_cache.get(_cache_key(details, scn))
+                if cached is not None:
+                    recommend_counts["cache"] += 1
+                    yield json.dumps({"index": i, "source": "cache", "text": "".join(cached)}) + "\n"
+                    continue
+                pending.append(i)
+            recommend_counts["llm"] += len(pending)
+
+            retrievers = await _batch_retrievers(
+                [(shots[i], scenarios[i]) for i in pending]
+            )
+            tasks = [
+                asyncio.create_task(guarded(i, retrieve))
+                for i, retrieve in zip(pending, retrievers)
+            ]
+            for done in asyncio.as_completed(tasks):
+                yield json.dumps(await done) + "\n"
+        finally:
+            # client went away: stop the completions nobody will read
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+async def _batch_retrievers(items):
+    """One retrieval callable per (details, scn), sharing one embedding call."""
+    embed = [
+        scn["scenario_key"] for details, scn in items
+        if (details.retrieval or RETRIEVAL_MODE) == "embedding"
+    ]
+    vectors = {}
+    if embed:
+        try:
+            keys = list(dict.fromkeys(embed))
+            vectors = dict(zip(keys, await aget_embeddings(keys)))
+        except Exception:
+            # each shot falls back to embedding on its own
+            logger.exception("Batched embedding failed")
+
+    def retriever(details, scn):
+        if scn["scenario_key"] in vectors and (details.retrieval or RETRIEVAL_MODE) == "embedding":
+            return lambda: asearch_shots(vectors[scn["scenario_key"]], HISTORY_K)
+        return lambda: aretrieve_similar_shots(scn, k=HISTORY_K, mode=details.retrieval)
 
-    return StreamingResponse(event_stream(), media_type="text/plain; charset=utf-8")
+    return [retriever(details, scn) for details, scn in items]
+
+@app.get("/api/caddie/recommend/cache")
+async def recommend_cache_stats():
+    return {**response_cache.stats(), "single_flight": recommend_flights.stats()}
+
+@app.get("/api/caddie/recommend/stats")
+async def recommend_stats():
+    return {**recommend_counts, "cache": response_cache.stats()}
 
 @app.post("/api/caddie/record")
-async def record_shot(details: ShotDetails):
+async def record_shot(details: ShotRecord):
     """
     Record the outcome of a shot after recommendation.
     """
     data = details.model_dump()
+    data["effective_dist"] = compute_effective_distance(data)
+    if data["error"] is None:
+        data["error"] = data["carried"] - data["distance"]
+    data["result"] = data["result"] or classify_result(data["error"])
+
+    if write_behind is not None and data.get("cause") != "Mis-hit":
+        await asyncio.to_thread(write_behind.queue.put, data, details.retrieval)
+        write_behind.notify()
+        # the insert lands later; cached answers are stale as of now
+        bump_history([details.user_id])
+        return JSONResponse({"success": True, "queued": True}, status_code=202)
     try:
-        save_shot(data)
+        await asave_shot(data, mode=details.retrieval)
     except Exception as e:
+        ERRORS.inc(stage="record")
         raise HTTPException(status_code=500, detail=f"DB error: {e}")
     return JSONResponse({"success": True})
 
+@app.get("/api/caddie/record/queue")
+async def record_queue():
+    """
+    Depth and health of the write-behind queue.
+    """
+    if write_behind is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(write_behind.stats)}
+
+@app.get("/api/caddie/stats/{user_id}")
+async def club_stats_for_user(user_id: str):
+    """Per-club carry statistics for a user from their recorded shots."""
+    return {"user_id": user_id, "clubs": club_stats.get(user_id)}
+
+def _cache_stat(field):
+    caches = {
+      "response": response_cache, "embedding": embedding_cache,
+      "club_distance": club_distance_cache,
+    }
+    return lambda: {name: cache.stats()[field] for name, cache in caches.items()}
+
+def _queue_depths():
+    depths = {
+      "embedding_batch": embedding_batcher.stats()["pending"],
+      "single_flight": len(recommend_flights),
+    }
+    if write_behind is not None:
+        depths["write_behind"] = write_behind.queue.depth()
+    return depths
+
+callback(
+  "caddie_recommendations_total", "Recommendations by how they were answered.",
+  lambda: dict(recommend_counts), kind="counter", labelnames=["source"],
+)
+callback("caddie_cache_hits_total", "Cache hits.", _cache_stat("hits"), kind="counter", labelnames=["cache"])
+callback("caddie_cache_misses_total", "Cache misses.", _cache_stat("misses"), kind="counter", labelnames=["cache"])
+callback("caddie_cache_entries", "Entries held per cache.", _cache_stat("size"), labelnames=["cache"])
+callback("caddie_queue_depth", "Work waiting in each queue.", _queue_depths, labelnames=["queue"])
+callback(
+  "caddie_write_behind_failures_total", "Shots the write-behind worker failed to insert.",
+  lambda: write_behind.failures if write_behind is not None else 0, kind="counter",
+)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    # rendered in a worker thread: the queue-depth and embedding-cache
+    # callbacks count rows in SQLite
+    body = await asyncio.to_thread(REGISTRY.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.post("/api/caddie/import")
+async def import_shots(
+    request: Request,
+    fmt: Literal["csv", "jsonl"] = "jsonl",
+    user_id: Optional[str] = None,
+    chunk_size: int = 500,
+    import_id: Optional[str] = None,
+    retrieval: Optional[Literal["embedding", "features"]] = None,
+):
+    """
+    Bulk-import shots from a CSV/JSONL request body, streaming progress as
+    NDJSON. Retrying with the same import_id resumes after the last
+    committed chunk.
+    """
+    from .importer import import_bytes
+
+    checkpoint = None
+    if import_id:
+        if not re.fullmatch(r"[\w-]{1,64}", import_id):
+            raise HTTPException(status_code=422, detail="import_id must be 1-64 word characters")
+        checkpoint = os.path.join(IMPORT_CHECKPOINT_DIR, f"agent-caddie-import-{import_id}.json")
+
+    # spool the upload (to disk once large) so parsing never holds it all in memory
+    spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def progress(stats):
+        loop.call_soon_threadsafe(events.put_nowait, {"event": "progress", **stats})
+
+    async def run():
+        try:
+            stats = await asyncio.to_thread(
+              import_bytes, spool, fmt, user_id=user_id, chunk_size=chunk_size,
+              checkpoint=checkpoint, mode=retrieval, progress=progress
+            )
+            await events.put({"event": "done", **stats})
+        except Exception as e:
+            await events.put({"event": "error", "detail": str(e), "import_id": import_id})
+        finally:
+            spool.close()
+            await events.put(None)
+
+    # keep running even if the client goes away; the checkpoint records progress
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+    async def event_stream():
+        while (event := await events.get()) is not None:
+            yield json.dumps(event) + "\n"
+        await task
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app:app", host="127.0.0.1", port=8000, reload=True)
 
 
+# serving the built frontend; the import lives here so API-only start-up skips it
+# from fastapi.staticfiles import StaticFiles
 # app.mount("/", StaticFiles(directory="dist", html=True), name="frontend")
\ No newline at end of file
@@ -0,0 +1,204 @@
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Load benchmark: starts the fake OpenAI/PostgREST server (fakes.py) and the
+# API, both as uvicorn subprocesses, then drives the API at a fixed
+# concurrency and reports latency percentiles as JSON. See `agent-caddie bench`.
+
+ENDPOINTS = ("recommend", "record", "update-yardages")
+LIES = ("Fairway", "Rough", "Bunker")
+WINDS = ("Headwind", "Tailwind", "Crosswind", "None")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _spawn(module_app: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+      [sys.executable, "-m", "uvicorn", module_app, "--port", str(port), "--log-level", "warning"],
+      env={**os.environ, **env},
+    )
+
+async def _wait_ready(client, url: str, timeout_s: float = 30.0):
+    deadline = time.perf_counter() + timeout_s
+    while True:
+        try:
+            # /readyz answers 503 until warmup has run, so requests are
+            # timed against a warm app; a 404 still means the server is up
+            if (await client.get(url)).status_code in (200, 404):
+                return
+        except Exception:
+            pass
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"{url} did not come up within {timeout_s:.0f}s")
+        await asyncio.sleep(0.1)
+
+def summarize(values_ms) -> dict:
+    """p50/p95/p99/mean/max of a list of milliseconds (empty -> zeros)."""
+    if not len(values_ms):
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    arr = np.asarray(values_ms, dtype=float)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+      "p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2),
+      "mean": round(float(arr.mean()), 2), "max": round(float(arr.max()), 2),
+    }
+
+def _shot(rng: random.Random, i: int, users: int) -> dict:
+    # distinct-enough scenarios that the response cache rarely short-circuits
+    return {
+      "user_id": f"bench-{i % users}",
+      "scenario_text": "Approach shot",
+      "distance": rng.randint(90, 220),
+      "lie": rng.choice(LIES),
+      "ball_pos": "Level",
+      "elevation": rng.randint(-20, 20),
+      "wind_dir": rng.choice(WINDS),
+      "wind_speed": rng.randint(0, 25),
+    }
+
+def request_for(endpoint: str, rng: random.Random, i: int, users: int, use_llm: bool):
+    """``(path, json body)`` for request number ``i`` against ``endpoint``."""
+    shot = _shot(rng, i, users)
+    if endpoint == "recommend":
+        return "/api/caddie/recommend", {**shot, "use_llm": use_llm}
+    if endpoint == "record":
+        carried = shot["distance"] + rng.randint(-15, 15)
+        return "/api/caddie/record", {**shot, "recommended_club": "7-Iron", "carried": carried}
+    return "/api/caddie/update-yardages", [
+      {"user_id": shot["user_id"], "club": "7-Iron", "distance": rng.randint(150, 170)}
+    ]
+
+async def drive(client, base_url: str, endpoint: str, requests: int, concurrency: int,
+                users: int = 50, use_llm: bool = True, seed: int = 0) -> dict:
+    """Send ``requests`` requests to one endpoint with ``concurrency`` workers.
+
+    Latency is measured to the last byte; time to first token is the first
+    non-empty body chunk, which for /recommend is the start of the answer.
+    """
+    rng = random.Random(seed)
+    bodies = [request_for(endpoint, rng, i, users, use_llm) for i in range(requests)]
+    latencies, ttfts, statuses = [], [], {}
+    errors = 0
+    next_i = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in next_i:
+            path, body = bodies[i]
+            started = time.perf_counter()
+            first = None
+            try:
+                async with client.stream("POST", base_url + path, json=body) as response:
+                    async for chunk in response.aiter_bytes():
+                        if chunk and first is None:
+                            first = time.perf_counter()
+                status = response.status_code
+            except Exception:
+                errors += 1
+                statuses["exception"] = statuses.get("exception", 0) + 1
+                continue
+            done = time.perf_counter()
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status >= 400:
+                errors += 1
+                continue
+            latencies.append((done - started) * 1000)
+            if first is not None:
+                ttfts.append((first - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    elapsed = time.perf_counter() - started
+    result = {
+      "requests": requests, "concurrency": concurrency, "errors": errors, "statuses": statuses,
+      "seconds": round(elapsed, 3),
+      "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+      "latency_ms": summarize(latencies),
+    }
+    if endpoint == "recommend":
+        result["ttft_ms"] = summarize(ttfts)
+    return result
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+          ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+          cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        return None
+
+async def run(endpoints=ENDPOINTS, requests: int = 200, concurrency: int = 16, users: int = 50,
+              use_llm: bool = True, app_url: str | None = None, fake: dict | None = None,
+              app_env: dict | None = None) -> dict:
+    """Start the fake upstreams and the API (unless ``app_url``), then drive it.
+
+    ``fake`` sets the FAKE_* latency knobs of fakes.py; ``app_env`` adds
+    environment variables for the API process (e.g. RESPONSE_CACHE_SIZE).
+    """
+    import httpx
+
+    fake = fake or {}
+    procs = []
+    workdir = tempfile.mkdtemp(prefix="agent-caddie-bench-")
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        try:
+            if app_url is None:
+                fake_port, app_port = _free_port(), _free_port()
+                fake_url = f"http://127.0.0.1:{fake_port}"
+                procs.append(_spawn(
+                  "agent_caddie.fakes:app", fake_port,
+                  {f"FAKE_{k.upper()}": str(v) for k, v in fake.items()},
+                ))
+                await _wait_ready(client, fake_url + "/v1/models")
+                procs.append(_spawn("agent_caddie.app:app", app_port, {
+                  "OPENAI_API_KEY": "bench", "OPENAI_BASE_URL": fake_url + "/v1",
+                  "SUPABASE_URL": fake_url, "SUPABASE_SERVICE_ROLE_KEY": "bench.bench.bench",
+                  # exercise the match_shots RPC rather than a local index
+                  "LOCAL_SHOT_INDEX": "false",
+                  "WRITE_BEHIND_PATH": os.path.join(workdir, "queue.sqlite"),
+                  "IMPORT_CHECKPOINT_DIR": workdir,
+                  **(app_env or {}),
+                }))
+                app_url = f"http://127.0.0.1:{app_port}"
+                await _wait_ready(client, app_url + "/readyz")
+            results = {}
+            for seed, endpoint in enumerate(endpoints):
+                results[endpoint] = await drive(
+                  client, app_url, endpoint, requests, concurrency,
+                  users=users, use_llm=use_llm, seed=seed,
+                )
+            try:
+                server_stats = (await client.get(app_url + "/api/caddie/recommend/stats")).json()
+            except Exception:
+                server_stats = None
+        finally:
+            for proc in procs:
+                proc.terminate()
+            for proc in procs:
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+    return {
+      "commit": _git_commit(),
+      "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+      "config": {
+        "endpoints": list(endpoints), "requests": requests, "concurrency": concurrency,
+        "users": users, "use_llm": use_llm, "fake": fake, "app_env": app_env or {},
+      },
+      "results": results,
+      "server": server_stats,
+    }
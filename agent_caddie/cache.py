@@ -0,0 +1,221 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+
+def normalize_text(text: str) -> str:
+    # collapse whitespace and case so trivially different strings share an entry
+    return " ".join(text.split()).casefold()
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU map with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        # a peek: no hit/miss counted and recency unchanged
+        return key in self._data
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+          "size": len(self._data), "maxsize": self.maxsize,
+          "hits": self.hits, "misses": self.misses,
+          "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class TTLCache(LRUCache):
+    """LRUCache whose entries expire ``ttl_s`` seconds after being stored."""
+
+    def __init__(self, maxsize: int = 1024, ttl_s: float = 600.0, clock=time.monotonic):
+        super().__init__(maxsize)
+        self.ttl_s = ttl_s
+        self.expired = 0
+        self._clock = clock
+
+    def get(self, key):
+        entry = super().get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if self._clock() < expires_at:
+            return value
+        with self._lock:
+            # stale entries count as misses
+            self._data.pop(key, None)
+            self.hits -= 1
+            self.misses += 1
+            self.expired += 1
+        return None
+
+    def put(self, key, value):
+        super().put(key, (self._clock() + self.ttl_s, value))
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and self._clock() < entry[0]
+
+    def clear(self):
+        super().clear()
+        self.expired = 0
+
+    def stats(self) -> dict:
+        return {**super().stats(), "ttl_s": self.ttl_s, "expired": self.expired}
+
+
+class EmbeddingStore:
+    """SQLite-backed embedding store so cached vectors survive restarts."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+          "CREATE TABLE IF NOT EXISTS embeddings ("
+          " model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL,"
+          " PRIMARY KEY (model, text))"
+        )
+        self._conn.commit()
+
+    def get(self, model: str, text: str):
+        with self._lock:
+            row = self._conn.execute(
+              "SELECT vector FROM embeddings WHERE model = ? AND text = ?",
+              (model, text)
+            ).fetchone()
+        return array("d", row[0]).tolist() if row else None
+
+    def get_many(self, model: str, texts) -> list:
+        return [self.get(model, text) for text in texts]
+
+    def put_many(self, model: str, items):
+        rows = [(model, text, array("d", vec).tobytes()) for text, vec in items]
+        with self._lock:
+            self._conn.executemany(
+              "INSERT OR REPLACE INTO embeddings (model, text, vector) VALUES (?, ?, ?)",
+              rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def put(self, model: str, text: str, vector):
+        self.put_many(model, [(text, vector)])
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """In-memory LRU in front of an optional persistent EmbeddingStore.
+
+    Keys are ``(model, normalize_text(text))``. A disk hit is promoted into
+    the LRU so the next lookup for the same scenario never leaves memory.
+    """
+
+    def __init__(self, maxsize: int = 1024, path: str | None = None):
+        self.memory = LRUCache(maxsize)
+        self.store = EmbeddingStore(path) if path else None
+        self.disk_hits = 0
+
+    def get(self, model: str, text: str):
+        key = (model, normalize_text(text))
+        vec = self.memory.get(key)
+        if vec is None and self.store is not None:
+            vec = self._promote(key, self.store.get(*key))
+        return vec
+
+    def put(self, model: str, text: str, vector):
+        key = (model, normalize_text(text))
+        self.memory.put(key, vector)
+        if self.store is not None:
+            self.store.put(*key, vector)
+
+    async def aget_many(self, model: str, texts) -> list:
+        """``get`` for each text, with any disk lookups in one worker thread."""
+        keys = [(model, normalize_text(text)) for text in texts]
+        found = [self.memory.get(key) for key in keys]
+        missed = [key for key, vec in zip(keys, found) if vec is None]
+        if self.store is None or not missed:
+            return found
+        from_disk = await asyncio.to_thread(self.store.get_many, model, [text for _, text in missed])
+        promoted = {key: self._promote(key, vec) for key, vec in zip(missed, from_disk)}
+        return [vec if vec is not None else promoted[key] for key, vec in zip(keys, found)]
+
+    async def aget(self, model: str, text: str):
+        return (await self.aget_many(model, [text]))[0]
+
+    async def aput_many(self, model: str, items):
+        """``put`` for ``(text, vector)`` pairs; the disk write is one
+        transaction in a worker thread."""
+        items = [(normalize_text(text), vec) for text, vec in items]
+        for text, vec in items:
+            self.memory.put((model, text), vec)
+        if self.store is not None and items:
+            await asyncio.to_thread(self.store.put_many, model, items)
+
+    def _promote(self, key, vec):
+        if vec is not None:
+            self.disk_hits += 1
+            self.memory.put(key, vec)
+        return vec
+
+    def prefill(self, model: str, items) -> int:
+        """Load ``(text, vector)`` pairs, e.g. rows already in the shots table."""
+        items = [(normalize_text(text), vec) for text, vec in items]
+        if self.store is not None:
+            return self.store.put_many(model, items)
+        for text, vec in items:
+            self.memory.put((model, text), vec)
+        return len(items)
+
+    def clear(self):
+        self.memory.clear()
+        self.disk_hits = 0
+
+    def stats(self) -> dict:
+        return {
+          **self.memory.stats(),
+          "disk_hits": self.disk_hits,
+          "disk_size": len(self.store) if self.store is not None else 0,
+        }
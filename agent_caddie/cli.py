@@ -1,11 +1,19 @@
+import json
+
 import click
-import openai
 from questionary import text, select
 from tabulate import tabulate
 
 from .prompts import ask_shot_details, build_prompt
 from .analytics import compute_effective_distance, record_shot_result
-from .db import save_shot, get_similar_shots, save_club_distances
+from .scenario import canonical_scenario
+from .db import (
+    save_shot, get_similar_shots, save_club_distances, prefill_embedding_cache,
+    fetch_shot_vectors, get_similar_shots_by_features, rebuild_club_stats, club_stats,
+    RETRIEVAL_MODE, RETRIEVAL_MODES
+)
+from .embeddings import embedding_cache
+from .clients import openai_client
 
 @click.group()
 def cli():
@@ -56,18 +64,23 @@ def update(user_id):
 
 @cli.command()
 @click.option("--user-id", required=True, help="Your unique user ID")
-def shot(user_id):
+@click.option("--retrieval", type=click.Choice(RETRIEVAL_MODES), default=RETRIEVAL_MODE,
+              show_default=True, help="Match past shots by embedding or by scenario features")
+def shot(user_id, retrieval):
     """Get a club recommendation for your next shot."""
     # 1. Gather shot details
     scn = ask_shot_details()
     scn["effective_dist"] = compute_effective_distance(scn)
 
     # 2. Retrieve similar past shots
-    past = get_similar_shots(scn["scenario_text"])
+    if retrieval == "features":
+        past = get_similar_shots_by_features(scn)
+    else:
+        past = get_similar_shots(canonical_scenario(scn))
 
     # 3. Build and send prompt
     prompt = build_prompt(scn, past)
-    resp = openai.chat.completions.create(  # ✅ new v1 style
+    resp = openai_client().chat.completions.create(  # ✅ new v1 style
         model="gpt-3.5-turbo",
         messages=prompt,  # type: ignore
         stream=True
@@ -84,5 +97,128 @@ def shot(user_id):
         **outcome,
         "user_id": user_id,
         "recommended_club": club
-    })
+    }, mode=retrieval)
     click.echo("🏌️  Shot logged. Good luck on the next one!")
+
+@cli.command("prefill-cache")
+@click.option("--page-size", default=1000, show_default=True, help="Rows fetched per request")
+def prefill_cache(page_size):
+    """Seed the embedding cache from embeddings already saved in shots."""
+    loaded = prefill_embedding_cache(page_size=page_size)
+    if embedding_cache.store is None:
+        click.echo("⚠ EMBEDDING_CACHE_PATH is not set; entries only live for this process.")
+    click.echo(f"✅ Loaded {loaded} cached embeddings.")
+
+@cli.command("rebuild-stats")
+@click.option("--page-size", default=1000, show_default=True, help="Rows fetched per request")
+def rebuild_stats(page_size):
+    """Recompute per-club carry statistics from every saved shot.
+
+    This writes CLUB_STATS_PATH; a server that is already running keeps its
+    in-memory copy until it restarts and reads the file again.
+    """
+    shots = rebuild_club_stats(page_size=page_size)
+    if club_stats.path is None:
+        click.echo("⚠ CLUB_STATS_PATH is not set; the statistics only live for this process.")
+    click.echo(f"✅ Rebuilt {len(club_stats)} club aggregates from {shots} shots.")
+    if club_stats.path is not None:
+        click.echo("  Restart running API servers to pick the new statistics up.")
+
+@cli.command("index-report")
+@click.option("--k", default=10, show_default=True, help="Neighbours per query")
+@click.option("--queries", default=200, show_default=True, help="Number of sample queries")
+@click.option("--synthetic", type=int, default=0, help="Use N random vectors instead of the shots table")
+@click.option("--dim", default=1536, show_default=True, help="Vector width for --synthetic")
+@click.option("--as-json", is_flag=True, help="Print the report as JSON")
+def index_report(k, queries, synthetic, dim, as_json):
+    """Compare ANN index settings against exact search (recall vs latency)."""
+    import numpy as np
+    from .index import recall_report
+
+    rng = np.random.default_rng(0)
+    if synthetic:
+        # clustered data, closer to real scenario embeddings than pure noise
+        centers = rng.normal(size=(max(synthetic // 100, 1), dim))
+        vectors = centers[rng.integers(len(centers), size=synthetic)]
+        vectors = vectors + 0.3 * rng.normal(size=vectors.shape)
+    else:
+        vectors = np.asarray(fetch_shot_vectors(), dtype=np.float32)
+    if not len(vectors):
+        click.echo("⚠ No vectors to benchmark.")
+        return
+
+    picks = vectors[rng.integers(len(vectors), size=queries)]
+    sample = picks + 0.05 * rng.normal(size=picks.shape)
+    report = recall_report(vectors, sample, k=k)
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+    else:
+        click.echo(tabulate(report, headers="keys", tablefmt="github"))
+
+@cli.command("bench")
+@click.option("--endpoint", "endpoints", multiple=True, type=click.Choice(["recommend", "record", "update-yardages"]),
+              help="Endpoint to drive (repeatable; default all three)")
+@click.option("--requests", default=200, show_default=True, help="Requests per endpoint")
+@click.option("--concurrency", default=16, show_default=True, help="Requests in flight at once")
+@click.option("--users", default=50, show_default=True, help="Distinct user ids to spread requests over")
+@click.option("--allow-fast-path", is_flag=True, help="Let /recommend answer from club distances")
+@click.option("--llm-ttft-ms", default=300.0, show_default=True, help="Fake chat model time to first token")
+@click.option("--llm-slow-fraction", default=0.0, show_default=True,
+              help="Share of fake chat streams that are slow to start")
+@click.option("--llm-slow-ms", default=5000.0, show_default=True, help="Extra first-token delay of a slow stream")
+@click.option("--tokens-per-s", default=50.0, show_default=True, help="Fake chat model token rate")
+@click.option("--answer-tokens", default=40, show_default=True, help="Tokens per fake answer")
+@click.option("--embed-ms", default=80.0, show_default=True, help="Fake embeddings latency")
+@click.option("--db-ms", default=20.0, show_default=True, help="Fake PostgREST latency")
+@click.option("--app-env", multiple=True, metavar="KEY=VALUE", help="Extra environment for the API process")
+@click.option("--app-url", help="Benchmark an already running API instead of starting one")
+@click.option("--out", type=click.Path(dir_okay=False), help="Also write the JSON report here")
+def bench(endpoints, requests, concurrency, users, allow_fast_path, llm_ttft_ms, llm_slow_fraction,
+          llm_slow_ms, tokens_per_s, answer_tokens, embed_ms, db_ms, app_env, app_url, out):
+    """Load-test the API against local OpenAI/Supabase stand-ins; prints JSON."""
+    import asyncio
+    from .bench import ENDPOINTS, run
+
+    report = asyncio.run(run(
+      endpoints=endpoints or ENDPOINTS, requests=requests, concurrency=concurrency,
+      users=users, use_llm=not allow_fast_path, app_url=app_url,
+      fake={
+        "llm_ttft_ms": llm_ttft_ms, "llm_slow_fraction": llm_slow_fraction,
+        "llm_slow_ms": llm_slow_ms, "tokens_per_s": tokens_per_s, "answer_tokens": answer_tokens,
+        "embed_ms": embed_ms, "db_ms": db_ms,
+      },
+      app_env=dict(kv.split("=", 1) for kv in app_env),
+    ))
+    text = json.dumps(report, indent=2)
+    if out:
+        with open(out, "w") as f:
+            f.write(text + "\n")
+    click.echo(text)
+
+@cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--user-id", help="Assign every row to this user (else read user_id per row)")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension")
+@click.option("--chunk-size", default=500, show_default=True, help="Rows per embedding call and insert")
+@click.option("--checkpoint", type=click.Path(dir_okay=False), help="Resume file (default: PATH.checkpoint)")
+@click.option("--retrieval", type=click.Choice(RETRIEVAL_MODES), default=RETRIEVAL_MODE,
+              show_default=True, help="'features' skips embedding entirely")
+def import_shots_cmd(path, user_id, fmt, chunk_size, checkpoint, retrieval):
+    """Bulk-import shots from a CSV or JSONL launch-monitor export."""
+    from .importer import import_file
+
+    def report(stats):
+        click.echo(
+          f"  • {stats['resumed_from'] + stats['rows']} rows read, {stats['inserted']} inserted "
+          f"({stats['rows_per_sec']:.0f} rows/s)"
+        )
+
+    stats = import_file(
+      path, fmt=fmt, user_id=user_id, chunk_size=chunk_size,
+      checkpoint=checkpoint or f"{path}.checkpoint", mode=retrieval, progress=report
+    )
+    click.echo(
+      f"\n✅ Imported {stats['inserted']} shots in {stats['seconds']:.1f}s "
+      f"({stats['rows_per_sec']:.0f} rows/s); {stats['skipped']} mis-hits skipped, "
+      f"{stats['invalid']} invalid rows."
+    )
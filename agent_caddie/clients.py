@@ -0,0 +1,124 @@
+import asyncio
+import os
+import threading
+import weakref
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# one keep-alive pool per client, shared by every caller in the process
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+_lock = threading.Lock()
+_clients = {}
+# httpx async pools belong to the event loop that opened them
+_async_clients = weakref.WeakKeyDictionary()
+_pools = []
+
+
+# httpx, openai and supabase are imported on first use to keep app start-up
+# fast; see warmup.py
+
+def _limits():
+    import httpx
+    return httpx.Limits(
+      max_connections=HTTP_MAX_CONNECTIONS,
+      max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+      keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+def _timeout():
+    import httpx
+    return httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+def _pool(kind: str):
+    import httpx
+    pool = getattr(httpx, kind)(limits=_limits(), timeout=_timeout())
+    _pools.append(pool)
+    return pool
+
+def _get(name, build):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = build()
+    return client
+
+def _build_openai():
+    import openai
+    return openai.OpenAI(
+      http_client=_pool("Client"),
+      max_retries=OPENAI_MAX_RETRIES,
+    )
+
+def _build_async_openai():
+    import openai
+    return openai.AsyncOpenAI(
+      http_client=_pool("AsyncClient"),
+      max_retries=OPENAI_MAX_RETRIES,
+    )
+
+def _build_supabase():
+    from supabase import ClientOptions, create_client
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
+    return create_client(url, key, options=ClientOptions(
+      httpx_client=_pool("Client"),
+    ))
+
+def openai_client():
+    """Shared sync OpenAI client, built on first use."""
+    return _get("openai", _build_openai)
+
+def supabase_client():
+    """Shared Supabase client, built on first use.
+
+    The underlying httpx pool is thread-safe, so the ``asyncio.to_thread``
+    callers in ``db`` all reuse the same connections.
+    """
+    return _get("supabase", _build_supabase)
+
+def async_openai_client():
+    """Shared async OpenAI client for the running event loop."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _get("openai-async", _build_async_openai)
+    client = _async_clients.get(loop)
+    if client is None:
+        with _lock:
+            client = _async_clients.get(loop)
+            if client is None:
+                client = _async_clients[loop] = _build_async_openai()
+    return client
+
+def built_clients() -> list[str]:
+    """Names of the clients constructed so far in this process."""
+    names = sorted(_clients)
+    if len(_async_clients):
+        names.append("openai-async")
+    return sorted(set(names))
+
+async def aclose_clients():
+    """Close every pooled connection; the next call rebuilds on demand."""
+    with _lock:
+        pools = list(_pools)
+        _pools.clear()
+        _clients.clear()
+        _async_clients.clear()
+    for pool in pools:
+        if hasattr(pool, "aclose"):
+            await pool.aclose()
+        else:
+            pool.close()
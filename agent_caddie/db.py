@@ -1,54 +1,310 @@
+import asyncio
+import json
 import os
-from supabase.client import create_client
+import threading
+
+import numpy as np
 from dotenv import load_dotenv
 
-from .embeddings import get_embedding
+from .scenario import canonical_scenario, scenario_fields
+from .cache import TTLCache
+from .clients import supabase_client
+from .embeddings import get_embedding, aget_embedding, embedding_cache, EMBEDDING_MODEL
+from .index import index_from_env
+from .features import FeatureIndex
+from .stats import ClubStatsStore
+from .storage import make_storage, STORAGE_BACKENDS
+from .metrics import stage
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)  # type: ignore
+# where shots and club distances live: "supabase", or "sqlite" for a
+# single-node/CLI setup with no network hop (file at SQLITE_DB_PATH)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+if STORAGE_BACKEND not in STORAGE_BACKENDS:
+    raise ValueError(f"unknown STORAGE_BACKEND {STORAGE_BACKEND!r}; choose from {list(STORAGE_BACKENDS)}")
+# the lambda looks supabase_client up on every call, so the client stays lazy
+storage = make_storage(
+    STORAGE_BACKEND, client=lambda: supabase_client(),
+    path=os.getenv("SQLITE_DB_PATH", "agent-caddie.sqlite"),
+)
+
+# optional on-disk snapshot of the local shot index
+SHOT_INDEX_PATH = os.getenv("SHOT_INDEX_PATH")
+
+# columns kept alongside each vector in the in-process index
+INDEX_COLUMNS = [
+    "id", "user_id", "scenario_text", "recommended_club",
+    "carried", "error", "result", "effective_dist"
+]
+# local replacement for the match_shots RPC once load_shot_index() has run;
+# SHOT_INDEX picks exact, ivf or hnsw search
+shot_index = index_from_env()
+
+# "embedding" retrieves by scenario embedding, "features" by typed scenario
+# fields with no embedding API call at all
+RETRIEVAL_MODES = ("embedding", "features")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "embedding")
+FEATURE_COLUMNS = ["distance", "lie", "ball_pos", "elevation", "wind_dir", "wind_speed"]
+feature_index = FeatureIndex()
+# one (re)load at a time: concurrent first requests must not interleave
+# clear() and add_scenarios()
+_feature_load_lock = threading.RLock()
+# per-user, per-club carry aggregates, updated on every insert
+club_stats = ClubStatsStore(path=os.getenv("CLUB_STATS_PATH") or None)
+# per-user counter bumped on every write that changes what a recommendation
+# depends on; the API's response cache keys on it
+_history_versions = {}
+_history_lock = threading.Lock()
+# club -> average carry per user, keyed with the history version so a save
+# invalidates it; the TTL picks up edits made by other instances
+club_distance_cache = TTLCache(
+    maxsize=int(os.getenv("CLUB_DISTANCE_CACHE_SIZE", "1024")),
+    ttl_s=float(os.getenv("CLUB_DISTANCE_CACHE_TTL", "300")),
+)
+
+
+def history_version(user_id: str) -> int:
+    return _history_versions.get(user_id, 0)
 
+def bump_history(user_ids):
+    with _history_lock:
+        for user_id in set(user_ids):
+            _history_versions[user_id] = _history_versions.get(user_id, 0) + 1
 
 def save_club_distances(entries):
-    supabase.table("club_distances")\
-        .upsert(entries, on_conflict="user_id,club")\
-        .execute()
+    storage.upsert_club_distances(entries)
+    bump_history(e["user_id"] for e in entries)
 
-def save_shot(entry):
-    if entry.get("cause") == "Mis-hit":
-        return
-    # build a flat dict matching your shots table
-    db_row = {
+def get_club_distances(user_id: str) -> dict[str, float]:
+    key = (user_id, history_version(user_id))
+    distances = club_distance_cache.get(key)
+    if distances is None:
+        distances = storage.club_distances(user_id)
+        club_distance_cache.put(key, distances)
+    return distances
+
+def _shot_row(entry, embedding):
+    # build a flat dict matching your shots table; accepts the CLI's nested
+    # wind dict or the API's flat wind_dir/wind_speed
+    fields = scenario_fields(entry)
+    return {
         "user_id":           entry["user_id"],
         "scenario_text":     entry["scenario_text"],
-        "distance":          entry["distance"],
-        "lie":               entry["lie"],
-        "ball_pos":          entry["ball_pos"],
-        "wind_dir":          entry["wind"]["direction"],
-        "wind_speed":        entry["wind"]["speed"],
-        "elevation":         entry["elevation"],
+        "distance":          fields["distance"],
+        "lie":               fields["lie"],
+        "ball_pos":          fields["ball_pos"],
+        "wind_dir":          fields["wind_dir"],
+        "wind_speed":        fields["wind_speed"],
+        "elevation":         fields["elevation"],
         "effective_dist":    entry["effective_dist"],
         "recommended_club":  entry["recommended_club"],
         "carried":           entry["carried"],
         "error":             entry["error"],
         "result":            entry["result"],
         "cause":             entry.get("cause"),
-        "embedding":         get_embedding(entry["scenario_text"])
+        "embedding":         embedding
     }
-    supabase.table("shots").insert(db_row).execute()
+
+def _index_row(row):
+    return {col: row.get(col) for col in INDEX_COLUMNS}
+
+def _resolve_mode(mode):
+    mode = mode or RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"unknown retrieval mode {mode!r}; choose from {RETRIEVAL_MODES}")
+    return mode
+
+def _index_shots(db_rows, stored):
+    if not (shot_index.loaded or feature_index.loaded):
+        return
+    stored = stored if stored and len(stored) == len(db_rows) else db_rows
+    rows = [_index_row(r) for r in stored]
+    embedded = [(r["embedding"], row) for r, row in zip(db_rows, rows) if r["embedding"] is not None]
+    if shot_index.loaded and embedded:
+        shot_index.add_many([vec for vec, _ in embedded], [row for _, row in embedded])
+    if feature_index.loaded:
+        feature_index.add_scenarios(db_rows, rows)
+
+def _after_insert(db_rows, stored):
+    _index_shots(db_rows, stored)
+    club_stats.update_many(db_rows)
+    bump_history(r["user_id"] for r in db_rows)
+
+def save_shot(entry, mode=None):
+    if entry.get("cause") == "Mis-hit":
+        return
+    # feature-mode deployments never embed, so recording costs no API call
+    if _resolve_mode(mode) == "features":
+        embedding = None
+    else:
+        embedding = get_embedding(canonical_scenario(entry))
+    db_row = _shot_row(entry, embedding)
+    _after_insert([db_row], storage.insert_shots([db_row]))
+
+def store_shots(db_rows) -> list[dict]:
+    """Write prepared shot rows in one request, without indexing them."""
+    return storage.insert_shots(db_rows)
+
+def insert_shots(db_rows):
+    """Insert prepared shot rows in one request and index them."""
+    if not db_rows:
+        return
+    _after_insert(db_rows, store_shots(db_rows))
 
 def get_similar_shots(scenario_text: str, k: int = 3) -> list[dict]:
     # 1) embed the scenario
     emb = get_embedding(scenario_text)
 
-    # 2) call the SQL function via RPC
-    resp = (
-      supabase
-      .rpc("match_shots", {"query_embedding": emb, "match_count": k})
-      .execute()
-    )
-    return resp.data or []
+    # 2) search locally when the index is loaded, else ask the storage backend
+    # (the match_shots RPC on Supabase)
+    if shot_index.loaded:
+        with stage("search_local"):
+            return shot_index.search(emb, k)
+    with stage("search_rpc"):
+        return storage.match_shots(emb, k)
+
+def _as_vector(value):
+    # pgvector columns come back from PostgREST as "[0.1,0.2,...]" strings
+    return json.loads(value) if isinstance(value, str) else value
+
+def _iter_shots(columns: str, page_size: int = 1000, order: str | None = None):
+    return storage.iter_shots(columns, page_size, order)
+
+def prefill_embedding_cache(page_size: int = 1000) -> int:
+    """Seed the embedding cache from embeddings already stored in shots.
+
+    Entries are keyed by the row's canonical scenario, which is what
+    save_shot and get_similar_shots embed.
+    """
+    rows = _iter_shots("distance,lie,ball_pos,elevation,wind_dir,wind_speed,embedding", page_size)
+    pairs = [
+      (canonical_scenario(r), _as_vector(r["embedding"]))
+      for r in rows if r.get("embedding")
+    ]
+    return embedding_cache.prefill(EMBEDDING_MODEL, pairs)
+
+def rebuild_club_stats(page_size: int = 1000) -> int:
+    """Recompute every club aggregate from the shots table, oldest first."""
+    rows = _iter_shots("user_id,recommended_club,carried,result", page_size, order="id")
+    return club_stats.rebuild(rows)
+
+def load_shot_index(page_size: int = 1000, refresh: bool = False) -> int:
+    """Fill the in-process index from its snapshot or the shots table.
+
+    A snapshot at SHOT_INDEX_PATH is used unless ``refresh`` is set, so a
+    restart does not need Supabase; a fresh pull rewrites the snapshot.
+    """
+    if SHOT_INDEX_PATH and os.path.exists(SHOT_INDEX_PATH) and not refresh:
+        try:
+            shot_index.load(SHOT_INDEX_PATH)
+            return len(shot_index)
+        except ValueError:
+            pass  # snapshot from a different SHOT_INDEX kind; rebuild it
+    # added a page at a time as float32: buffering the whole table as lists
+    # of Python floats costs ~37 KB a shot. clear() marks the index unloaded,
+    # so searches go to the storage backend until the last page is in
+    shot_index.clear()
+    vectors, rows = [], []
+    for r in _iter_shots(",".join(INDEX_COLUMNS + ["embedding"]), page_size):
+        if r.get("embedding"):
+            vectors.append(np.asarray(_as_vector(r["embedding"]), dtype=np.float32))
+            rows.append(_index_row(r))
+        if len(rows) >= page_size:
+            shot_index.add_many(vectors, rows)
+            vectors, rows = [], []
+    shot_index.add_many(vectors, rows)
+    shot_index.loaded = True
+    save_shot_index()
+    return len(shot_index)
+
+def load_feature_index(page_size: int = 1000) -> int:
+    """Encode the typed fields of every stored shot into the feature index."""
+    columns = ",".join(dict.fromkeys(INDEX_COLUMNS + FEATURE_COLUMNS))
+    with _feature_load_lock:
+        rows = [
+          r for r in _iter_shots(columns, page_size)
+          if r.get("distance") is not None and r.get("lie")
+        ]
+        feature_index.clear()
+        feature_index.add_scenarios(rows, [_index_row(r) for r in rows])
+        feature_index.loaded = True
+        return len(feature_index)
+
+def ensure_feature_index():
+    """Load the feature index unless it is, once for any number of callers."""
+    if feature_index.loaded:
+        return
+    with _feature_load_lock:
+        if not feature_index.loaded:
+            load_feature_index()
+
+def get_similar_shots_by_features(scn, k: int = 3) -> list[dict]:
+    ensure_feature_index()
+    return feature_index.search_scenario(scn, k)
+
+def retrieve_similar_shots(scn, k: int = 3, mode=None) -> list[dict]:
+    """Dispatch to embedding or feature retrieval (default RETRIEVAL_MODE)."""
+    if _resolve_mode(mode) == "features":
+        return get_similar_shots_by_features(scn, k)
+    return get_similar_shots(canonical_scenario(scn), k)
+
+def fetch_shot_vectors(page_size: int = 1000) -> list[list[float]]:
+    return [
+      _as_vector(r["embedding"])
+      for r in _iter_shots("embedding", page_size) if r.get("embedding")
+    ]
+
+def save_shot_index():
+    if SHOT_INDEX_PATH and shot_index.loaded and len(shot_index):
+        shot_index.save(SHOT_INDEX_PATH)
+
+# --- async variants for the API: the embedding call is awaited and the
+# blocking storage round trip runs in a worker thread, so neither stalls
+# the event loop.
+
+async def asave_club_distances(entries):
+    await asyncio.to_thread(save_club_distances, entries)
+
+async def aget_club_distances(user_id: str) -> dict[str, float]:
+    # skip the thread hop when the distances are already cached
+    distances = club_distance_cache.get((user_id, history_version(user_id)))
+    if distances is not None:
+        return distances
+    return await asyncio.to_thread(get_club_distances, user_id)
+
+async def asave_shot(entry, mode=None):
+    if entry.get("cause") == "Mis-hit":
+        return
+    if _resolve_mode(mode) == "features":
+        embedding = None
+    else:
+        embedding = await aget_embedding(canonical_scenario(entry))
+    db_row = _shot_row(entry, embedding)
+    stored = await asyncio.to_thread(store_shots, [db_row])
+    # club stats commit to SQLite and the index may train: off the loop too
+    await asyncio.to_thread(_after_insert, [db_row], stored)
+
+async def aget_similar_shots(scenario_text: str, k: int = 3) -> list[dict]:
+    emb = await aget_embedding(scenario_text)
+    return await asearch_shots(emb, k)
+
+async def asearch_shots(emb, k: int = 3) -> list[dict]:
+    """Nearest stored shots to an embedding you already have."""
+    if shot_index.loaded:
+        with stage("search_local"):
+            return shot_index.search(emb, k)
+    with stage("search_rpc"):
+        return await asyncio.to_thread(storage.match_shots, emb, k)
 
+async def aget_similar_shots_by_features(scn, k: int = 3) -> list[dict]:
+    if not feature_index.loaded:
+        await asyncio.to_thread(ensure_feature_index)
+    with stage("search_features"):
+        return feature_index.search_scenario(scn, k)
 
+async def aretrieve_similar_shots(scn, k: int = 3, mode=None) -> list[dict]:
+    with stage("retrieval"):
+        if _resolve_mode(mode) == "features":
+            return await aget_similar_shots_by_features(scn, k)
+        return await aget_similar_shots(canonical_scenario(scn), k)
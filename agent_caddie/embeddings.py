@@ -1,8 +1,164 @@
-import openai
+import asyncio
+import os
+from dotenv import load_dotenv
+
+from .cache import EmbeddingCache
+from .clients import openai_client, async_openai_client
+from .metrics import stage
+
+load_dotenv()
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+# the embeddings endpoint accepts at most this many inputs per request
+MAX_BATCH_INPUTS = 2048
+
+# in-process LRU, backed by SQLite when EMBEDDING_CACHE_PATH is set
+embedding_cache = EmbeddingCache(
+    maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "1024")),
+    path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+)
 
 def get_embedding(text: str) -> list[float]:
-    resp = openai.embeddings.create(
-      model="text-embedding-ada-002",
-      input=text
-    )
-    return resp.data[0].embedding
+    with stage("embedding"):
+        cached = embedding_cache.get(EMBEDDING_MODEL, text)
+        if cached is not None:
+            return cached
+        resp = openai_client().embeddings.create(
+          model=EMBEDDING_MODEL,
+          input=text
+        )
+        embedding = resp.data[0].embedding
+        embedding_cache.put(EMBEDDING_MODEL, text, embedding)
+        return embedding
+
+def _split_cached(texts):
+    # cached vectors (None where missing) plus the distinct texts to fetch
+    found = [embedding_cache.get(EMBEDDING_MODEL, t) for t in texts]
+    missing = list(dict.fromkeys(t for t, v in zip(texts, found) if v is None))
+    return found, missing
+
+def _merge(texts, found, missing, vectors):
+    fetched = dict(zip(missing, vectors))
+    for text, vec in fetched.items():
+        embedding_cache.put(EMBEDDING_MODEL, text, vec)
+    return [v if v is not None else fetched[t] for t, v in zip(texts, found)]
+
+async def _asplit_cached(texts):
+    found = await embedding_cache.aget_many(EMBEDDING_MODEL, texts)
+    return found, list(dict.fromkeys(t for t, v in zip(texts, found) if v is None))
+
+async def _amerge(texts, found, missing, vectors):
+    # as _merge, but the cache's disk tier is written off the event loop
+    fetched = dict(zip(missing, vectors))
+    await embedding_cache.aput_many(EMBEDDING_MODEL, fetched.items())
+    return [v if v is not None else fetched[t] for t, v in zip(texts, found)]
+
+def _chunks(items, size=MAX_BATCH_INPUTS):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def get_embeddings(texts: list[str]) -> list[list[float]]:
+    """Embed many texts, sending only uncached, distinct ones in batched calls."""
+    found, missing = _split_cached(texts)
+    vectors = []
+    for chunk in _chunks(missing):
+        resp = openai_client().embeddings.create(model=EMBEDDING_MODEL, input=chunk)
+        vectors.extend(d.embedding for d in resp.data)
+    return _merge(texts, found, missing, vectors)
+
+async def _afetch(texts):
+    vectors = []
+    for chunk in _chunks(texts):
+        resp = await async_openai_client().embeddings.create(model=EMBEDDING_MODEL, input=chunk)
+        vectors.extend(d.embedding for d in resp.data)
+    return vectors
+
+async def aget_embeddings(texts: list[str]) -> list[list[float]]:
+    with stage("embedding_batch"):
+        found, missing = await _asplit_cached(texts)
+        return await _amerge(texts, found, missing, await _afetch(missing))
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent single-text embedding requests into batched calls.
+
+    Requests wait at most ``max_wait_ms`` (or until ``max_batch`` are
+    queued), then one ``aget_embeddings`` call answers all of them.
+    """
+
+    def __init__(self, max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.requests = 0
+        self.batches = 0
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    async def embed(self, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((text, fut))
+        self.requests += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self.batches += 1
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        # callers already missed the cache, so go straight to the API
+        texts = [text for text, _ in batch]
+        distinct = list(dict.fromkeys(texts))
+        try:
+            vectors = await _amerge(texts, [None] * len(texts), distinct, await _afetch(distinct))
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), vec in zip(batch, vectors):
+            if not fut.done():
+                fut.set_result(vec)
+
+    def stats(self) -> dict:
+        return {
+          "requests": self.requests, "batches": self.batches,
+          "pending": len(self._pending),
+          "avg_batch": self.requests / self.batches if self.batches else 0.0,
+        }
+
+
+# EMBEDDING_BATCH_WINDOW_MS=0 sends every API embedding request on its own
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+embedding_batcher = EmbeddingBatcher(
+    max_batch=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+    max_wait_ms=EMBEDDING_BATCH_WINDOW_MS,
+)
+
+async def aget_embedding(text: str) -> list[float]:
+    # cache hits are timed too, so the histogram shows what callers wait for
+    with stage("embedding"):
+        cached = await embedding_cache.aget(EMBEDDING_MODEL, text)
+        if cached is not None:
+            return cached
+        if EMBEDDING_BATCH_WINDOW_MS > 0:
+            return await embedding_batcher.embed(text)
+        resp = await async_openai_client().embeddings.create(
+          model=EMBEDDING_MODEL,
+          input=text
+        )
+        embedding = resp.data[0].embedding
+        await embedding_cache.aput_many(EMBEDDING_MODEL, [(text, embedding)])
+        return embedding
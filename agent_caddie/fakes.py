@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Local stand-ins for the OpenAI API (/v1) and Supabase's PostgREST (/rest/v1)
+# used by the load benchmark. Run with
+#   uvicorn agent_caddie.fakes:app --port 9000
+# and point OPENAI_BASE_URL at http://127.0.0.1:9000/v1 and SUPABASE_URL at
+# http://127.0.0.1:9000. Latencies come from the environment so bench.py can
+# configure the subprocess.
+
+FAKE_LLM_TTFT_MS = float(os.getenv("FAKE_LLM_TTFT_MS", "300"))
+FAKE_TOKENS_PER_S = float(os.getenv("FAKE_TOKENS_PER_S", "50"))
+FAKE_ANSWER_TOKENS = int(os.getenv("FAKE_ANSWER_TOKENS", "40"))
+FAKE_EMBED_MS = float(os.getenv("FAKE_EMBED_MS", "80"))
+FAKE_DB_MS = float(os.getenv("FAKE_DB_MS", "20"))
+FAKE_EMBED_DIM = int(os.getenv("FAKE_EMBED_DIM", "1536"))
+# a slow tail: this fraction of chat streams waits FAKE_LLM_SLOW_MS extra
+# before the first token, which is what hedging is for
+FAKE_LLM_SLOW_FRACTION = float(os.getenv("FAKE_LLM_SLOW_FRACTION", "0"))
+FAKE_LLM_SLOW_MS = float(os.getenv("FAKE_LLM_SLOW_MS", "5000"))
+
+CLUBS = {
+    "Driver": 240, "3-Wood": 220, "5-Iron": 180, "6-Iron": 170, "7-Iron": 160,
+    "8-Iron": 150, "9-Iron": 140, "Pitching Wedge": 125,
+}
+RESULTS = ("perfect", "too short", "too long")
+
+
+def _vector(text: str, dim: int) -> list[float]:
+    # deterministic per text, so repeated scenarios embed identically
+    seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(dim)]
+
+def _answer_tokens(n: int) -> list[str]:
+    words = ["7-Iron.", " It", " plays", " long", " into", " the", " wind,", " so", " club", " up."]
+    return [words[i % len(words)] for i in range(n)]
+
+def _chunk(model, content=None, finish=None) -> str:
+    body = {
+      "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+      "model": model,
+      "choices": [{
+        "index": 0, "finish_reason": finish,
+        "delta": {"content": content} if content is not None else {},
+      }],
+    }
+    return f"data: {json.dumps(body)}\n\n"
+
+
+def fake_app(
+    llm_ttft_ms: float = FAKE_LLM_TTFT_MS,
+    tokens_per_s: float = FAKE_TOKENS_PER_S,
+    answer_tokens: int = FAKE_ANSWER_TOKENS,
+    embed_ms: float = FAKE_EMBED_MS,
+    db_ms: float = FAKE_DB_MS,
+    dim: int = FAKE_EMBED_DIM,
+    llm_slow_fraction: float = FAKE_LLM_SLOW_FRACTION,
+    llm_slow_ms: float = FAKE_LLM_SLOW_MS,
+) -> FastAPI:
+    """OpenAI and PostgREST stand-ins with fixed latencies, on one app."""
+    app = FastAPI()
+    # seeded, so a benchmark run hits the same slow requests every time
+    slow = random.Random(0)
+    tables = {"club_distances": [], "shots": []}
+    ids = itertools.count(1)
+    app.state.requests = {"chat": 0, "embeddings": 0, "rpc": 0, "select": 0, "insert": 0}
+
+    # --- OpenAI -------------------------------------------------------------
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [
+          {"id": "gpt-3.5-turbo", "object": "model", "created": 0, "owned_by": "bench"}
+        ]}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        app.state.requests["embeddings"] += 1
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(embed_ms / 1000)
+        return {
+          "object": "list", "model": body.get("model", "text-embedding-ada-002"),
+          "data": [
+            {"object": "embedding", "index": i, "embedding": _vector(str(text), dim)}
+            for i, text in enumerate(inputs)
+          ],
+          "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        app.state.requests["chat"] += 1
+        body = await request.json()
+        model = body.get("model", "gpt-3.5-turbo")
+        tokens = _answer_tokens(answer_tokens)
+        if not body.get("stream"):
+            await asyncio.sleep(llm_ttft_ms / 1000 + len(tokens) / tokens_per_s)
+            return {
+              "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+              "model": model,
+              "choices": [{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "".join(tokens)},
+              }],
+              "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            }
+
+        ttft_ms = llm_ttft_ms + (llm_slow_ms if slow.random() < llm_slow_fraction else 0)
+
+        async def stream():
+            await asyncio.sleep(ttft_ms / 1000)
+            for token in tokens:
+                yield _chunk(model, token)
+                await asyncio.sleep(1 / tokens_per_s)
+            yield _chunk(model, finish="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    # --- PostgREST ----------------------------------------------------------
+
+    @app.post("/rest/v1/rpc/match_shots")
+    async def match_shots(request: Request):
+        app.state.requests["rpc"] += 1
+        body = await request.json()
+        await asyncio.sleep(db_ms / 1000)
+        rng = random.Random(json.dumps(body.get("query_embedding", [])[:4]))
+        rows = []
+        for i in range(int(body.get("match_count", 3))):
+            club, carry = rng.choice(list(CLUBS.items()))
+            rows.append({
+              "id": i + 1, "user_id": "bench", "recommended_club": club,
+              "carried": carry + rng.randint(-8, 8), "result": rng.choice(RESULTS),
+              "effective_dist": carry, "similarity": 0.9,
+            })
+        return rows
+
+    @app.get("/rest/v1/{table}")
+    async def select(table: str, request: Request):
+        app.state.requests["select"] += 1
+        await asyncio.sleep(db_ms / 1000)
+        user_id = request.query_params.get("user_id", "")
+        if table == "club_distances" and user_id.startswith("eq."):
+            # every user has a full bag, so fast-path requests can be answered
+            return [{"club": club, "distance": carry} for club, carry in CLUBS.items()]
+        rows = tables.get(table, [])
+        offset = int(request.query_params.get("offset", 0))
+        limit = int(request.query_params.get("limit", len(rows)))
+        return rows[offset:offset + limit]
+
+    @app.post("/rest/v1/{table}")
+    async def insert(table: str, request: Request):
+        app.state.requests["insert"] += 1
+        body = await request.json()
+        rows = body if isinstance(body, list) else [body]
+        await asyncio.sleep(db_ms / 1000)
+        stored = [{"id": next(ids), **row} for row in rows]
+        if table == "shots":
+            # keep only what the harness could ever look at
+            tables[table] = (tables[table] + [{k: v for k, v in r.items() if k != "embedding"} for r in stored])[-1000:]
+        return JSONResponse(stored, status_code=201)
+
+    return app
+
+
+app = fake_app()
@@ -0,0 +1,70 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FASTPATH_ENABLED = os.getenv("FASTPATH_ENABLED", "true").lower() in ("1", "true", "yes")
+# answer without the LLM only when the nearest club carries within MAX_GAP
+# yards of the effective distance and the runner-up is MARGIN yards further off
+FASTPATH_MAX_GAP = float(os.getenv("FASTPATH_MAX_GAP", "4"))
+FASTPATH_MARGIN = float(os.getenv("FASTPATH_MARGIN", "6"))
+# once a club has this many recorded shots, its recency-weighted carry
+# replaces the distance the user typed in
+FASTPATH_MIN_SHOTS = int(os.getenv("FASTPATH_MIN_SHOTS", "5"))
+
+
+def pick_club(club_distances: dict, effective_dist: float,
+              max_gap: float | None = None, margin: float | None = None):
+    """Return ``(club, carry)`` when one club clearly fits, else ``None``.
+
+    ``club_distances`` maps club name to the user's average carry. Anything
+    between clubs, outside the bag's range, or with no distances on file is
+    left to the LLM.
+    """
+    max_gap = FASTPATH_MAX_GAP if max_gap is None else max_gap
+    margin = FASTPATH_MARGIN if margin is None else margin
+    if not club_distances:
+        return None
+    ranked = sorted(club_distances.items(), key=lambda kv: abs(kv[1] - effective_dist))
+    club, carry = ranked[0]
+    gap = abs(carry - effective_dist)
+    if gap > max_gap:
+        return None
+    if len(ranked) > 1 and abs(ranked[1][1] - effective_dist) - gap < margin:
+        return None
+    return club, carry
+
+def observed_distances(declared: dict, stats: dict, min_shots: int | None = None) -> dict:
+    """Stored club distances, overridden by recorded carries where there are enough."""
+    min_shots = FASTPATH_MIN_SHOTS if min_shots is None else min_shots
+    merged = dict(declared)
+    for club, s in stats.items():
+        if s["count"] >= min_shots:
+            merged[club] = s["recent_carry"]
+    return merged
+
+def fast_path_message(club: str, carry: float, effective_dist: float) -> str:
+    return (
+      f"{club}. It plays {effective_dist:.0f} y and your {club} "
+      f"carries {carry:.0f} y on average."
+    )
+
+def fallback_message(club_distances: dict, past_shots, effective_dist: float) -> str:
+    """A deterministic answer for when the LLM does not respond in time.
+
+    The nearest club in the bag when distances are on file, else the club
+    that carried closest on a similar past shot, else just the distance.
+    """
+    if club_distances:
+        club, carry = min(club_distances.items(), key=lambda kv: abs(kv[1] - effective_dist))
+        return fast_path_message(club, carry, effective_dist)
+    carried = [s for s in past_shots if s.get("recommended_club") and s.get("carried") is not None]
+    if carried:
+        shot = min(carried, key=lambda s: abs(float(s["carried"]) - effective_dist))
+        club = shot["recommended_club"]
+        return (
+          f"{club}. It plays {effective_dist:.0f} y and on a similar shot your {club} "
+          f"carried {float(shot['carried']):.0f} y."
+        )
+    return f"It plays {effective_dist:.0f} y. Add your club distances to get a club pick."
@@ -0,0 +1,102 @@
+import numpy as np
+
+from .analytics import LIE_ADJ, wind_adj
+from .index import VectorIndex
+from .scenario import (
+    LIES, BALL_POSITIONS, ELEVATIONS, WIND_DIRECTIONS, scenario_fields, normalize_choice
+)
+
+# relative importance of each feature group in the nearest-neighbour distance
+DEFAULT_WEIGHTS = {
+    "carry":     3.0,   # distance plus the lie/ball/wind yardage adjustments
+    "wind":      1.0,   # raw wind speed
+    "elevation": 1.0,
+    "lie":       1.0,
+    "ball_pos":  0.5,
+    "wind_dir":  0.5,
+}
+YARDS_SCALE = 10.0
+WIND_SCALE = 5.0
+ELEVATION_SCALE = 10.0
+
+
+def _one_hot(value, vocab):
+    choice = normalize_choice(value, vocab)
+    return [1.0 if choice == v else 0.0 for v in vocab]
+
+def _elevation(value):
+    # the API sends feet, the CLI sends Level/Downhill/Uphill
+    if isinstance(value, (int, float)):
+        feet = float(value)
+        label = "Uphill" if feet > 0 else "Downhill" if feet < 0 else "Level"
+        return feet, label
+    return 0.0, normalize_choice(value, ELEVATIONS)
+
+def encode_scenario(scn, weights=None) -> np.ndarray:
+    """Encode a scenario as a small weighted feature vector.
+
+    Numerics are scaled to comparable units, categories are one-hot, and
+    each group is multiplied by the square root of its weight so plain
+    Euclidean distance between vectors is the weighted distance.
+    """
+    w = {**DEFAULT_WEIGHTS, **(weights or {})}
+    f = scenario_fields(scn)
+    lie = normalize_choice(f["lie"], LIES)
+    ball_pos = normalize_choice(f["ball_pos"], BALL_POSITIONS)
+    wind_dir = normalize_choice(f["wind_dir"], WIND_DIRECTIONS)
+    feet, elev_label = _elevation(f["elevation"])
+
+    groups = [
+      ("carry", [
+        float(f["distance"]) / YARDS_SCALE,
+        LIE_ADJ.get(lie, 0) / YARDS_SCALE,
+        LIE_ADJ.get(ball_pos, 0) / YARDS_SCALE,
+        wind_adj(wind_dir, float(f["wind_speed"])) / YARDS_SCALE,
+      ]),
+      ("wind", [float(f["wind_speed"]) / WIND_SCALE]),
+      ("elevation", [feet / ELEVATION_SCALE, *_one_hot(elev_label, ELEVATIONS)]),
+      ("lie", _one_hot(lie, LIES)),
+      ("ball_pos", _one_hot(ball_pos, BALL_POSITIONS)),
+      ("wind_dir", _one_hot(wind_dir, WIND_DIRECTIONS)),
+    ]
+    return np.concatenate([
+      np.asarray(values, dtype=np.float32) * np.float32(np.sqrt(w[name]))
+      for name, values in groups
+    ])
+
+
+class FeatureIndex(VectorIndex):
+    """Weighted nearest-neighbour search over encoded scenario features.
+
+    ``add``/``search`` take scenario dicts (CLI or API shape, or a shots
+    row) instead of embeddings, so no embedding API call is involved.
+    """
+
+    kind = "features"
+
+    def __init__(self, weights=None):
+        super().__init__()
+        self.weights = weights
+
+    def encode(self, scn) -> np.ndarray:
+        return encode_scenario(scn, self.weights)
+
+    def add_scenarios(self, scenarios, rows):
+        self.add_many([self.encode(s) for s in scenarios], rows)
+
+    def search_scenario(self, scn, k: int = 3) -> list[dict]:
+        return self.search(self.encode(scn), k)
+
+    def _prepare(self, vectors):
+        return vectors
+
+    def _query(self, query):
+        return np.asarray(query, dtype=np.float32).ravel()
+
+    def _score(self, vectors, q):
+        # negative squared distance so larger is still better
+        diff = vectors - q
+        return -np.einsum("ij,ij->i", diff, diff)
+
+    def _similarity(self, score):
+        return 1.0 / (1.0 + float(np.sqrt(-score)))
@@ -0,0 +1,159 @@
+import csv
+import io
+import json
+import os
+import time
+
+from .analytics import compute_effective_distance, classify_result
+from .db import insert_shots, _shot_row, _resolve_mode
+from .embeddings import get_embeddings
+from .scenario import canonical_scenario, scenario_fields
+
+FORMATS = ("csv", "jsonl")
+# launch-monitor exports often name columns differently from the shots table
+COLUMN_ALIASES = {
+    "club": "recommended_club",
+    "carry": "carried",
+    "target": "distance",
+    "wind_direction": "wind_dir",
+}
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def detect_format(name: str) -> str:
+    ext = os.path.splitext(name)[1].lower().lstrip(".")
+    if ext in ("jsonl", "ndjson"):
+        return "jsonl"
+    if ext == "csv":
+        return "csv"
+    raise ValueError(f"cannot tell the format of {name!r}; pass csv or jsonl explicitly")
+
+def iter_records(lines, fmt: str):
+    """Stream dicts from an iterable of text lines (a file object works)."""
+    if fmt == "csv":
+        yield from csv.DictReader(lines)
+    elif fmt == "jsonl":
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"unknown format {fmt!r}; choose from {FORMATS}")
+
+def _number(value, name):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise InvalidRecord(f"{name}={value!r} is not a number")
+
+def normalize_record(rec: dict, user_id: str | None = None) -> dict:
+    """Turn one exported row into a complete shot entry for the shots table."""
+    rec = {COLUMN_ALIASES.get(k, k): v for k, v in rec.items() if v not in (None, "")}
+    if user_id:
+        rec["user_id"] = user_id
+    for required in ("user_id", "distance", "lie", "carried"):
+        if required not in rec:
+            raise InvalidRecord(f"missing {required}")
+
+    fields = scenario_fields(rec)
+    elevation = fields["elevation"]
+    try:
+        elevation = float(elevation)
+    except (TypeError, ValueError):
+        pass  # Level / Uphill / Downhill
+    entry = {
+      **fields,
+      "distance":   _number(fields["distance"], "distance"),
+      "wind_speed": _number(fields["wind_speed"], "wind_speed"),
+      "elevation":  elevation,
+      "user_id":    str(rec["user_id"]),
+      "carried":    _number(rec["carried"], "carried"),
+      "recommended_club": rec.get("recommended_club"),
+      "cause":      rec.get("cause"),
+    }
+    entry["effective_dist"] = compute_effective_distance(entry)
+    entry["error"] = (
+      _number(rec["error"], "error") if "error" in rec
+      else entry["carried"] - entry["distance"]
+    )
+    entry["result"] = rec.get("result") or classify_result(entry["error"])
+    entry["scenario_text"] = rec.get("scenario_text") or canonical_scenario(entry)
+    return entry
+
+def _read_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f).get("rows_done", 0)
+    return 0
+
+def _write_checkpoint(path, rows_done):
+    if not path:
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"rows_done": rows_done}, f)
+    os.replace(tmp, path)  # atomic, so a crash never leaves a torn checkpoint
+
+def import_shots(records, user_id=None, chunk_size: int = 500, checkpoint=None,
+                 mode=None, progress=None) -> dict:
+    """Insert exported shots in chunks with one batched embedding call each.
+
+    ``records`` is any iterable of raw dicts (see ``iter_records``). After
+    every committed chunk the number of consumed input rows is written to
+    ``checkpoint``; rerunning with the same file skips them. ``progress`` is
+    called with the running stats dict after each chunk.
+    """
+    embed = _resolve_mode(mode) == "embedding"
+    skip = _read_checkpoint(checkpoint)
+    stats = {"rows": 0, "inserted": 0, "skipped": 0, "invalid": 0,
+             "resumed_from": skip, "chunks": 0, "seconds": 0.0, "rows_per_sec": 0.0}
+    started = time.perf_counter()
+    consumed = 0
+    chunk = []
+
+    def flush():
+        if chunk:
+            vectors = (
+              get_embeddings([canonical_scenario(e) for e in chunk]) if embed
+              else [None] * len(chunk)
+            )
+            insert_shots([_shot_row(e, v) for e, v in zip(chunk, vectors)])
+            stats["inserted"] += len(chunk)
+            stats["chunks"] += 1
+            chunk.clear()
+        _write_checkpoint(checkpoint, consumed)
+        stats["seconds"] = time.perf_counter() - started
+        stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+        if progress:
+            progress(dict(stats))
+
+    for consumed, rec in enumerate(records, start=1):
+        if consumed <= skip:
+            continue
+        stats["rows"] += 1
+        try:
+            entry = normalize_record(rec, user_id)
+        except InvalidRecord:
+            stats["invalid"] += 1
+            continue
+        if entry.get("cause") == "Mis-hit":
+            stats["skipped"] += 1
+            continue
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return stats
+
+def import_file(path: str, fmt=None, **kwargs) -> dict:
+    with open(path, newline="", encoding="utf-8") as f:
+        return import_shots(iter_records(f, fmt or detect_format(path)), **kwargs)
+
+def import_bytes(stream: io.BufferedIOBase, fmt: str, **kwargs) -> dict:
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    return import_shots(iter_records(text, fmt), **kwargs)
@@ -0,0 +1,434 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _as_matrix(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors[None, :] if vectors.ndim == 1 else vectors
+
+def _as_query(query) -> np.ndarray:
+    q = np.asarray(query, dtype=np.float32).ravel()
+    norm = np.linalg.norm(q)
+    return q / norm if norm else q
+
+
+class VectorIndex:
+    """Exact cosine-similarity index over a contiguous float32 matrix.
+
+    Vectors are L2-normalized on insert so a query is one matrix-vector
+    product plus an ``argpartition`` for the top-k. Each vector carries the
+    row dict returned to callers, the same shape the ``match_shots`` RPC
+    returns (plus ``similarity``).
+    """
+
+    kind = "exact"
+
+    def __init__(self, dim: int | None = None):
+        self.dim = dim
+        self.loaded = False
+        self._matrix = np.empty((0, dim or 0), dtype=np.float32)
+        self._size = 0
+        self._rows = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._matrix[:self._size]
+
+    def params(self) -> dict:
+        return {}
+
+    def _reserve(self, extra: int):
+        # grow geometrically so repeated single inserts stay amortized O(1)
+        needed = self._size + extra
+        if needed <= self._matrix.shape[0]:
+            return
+        capacity = max(needed, 2 * self._matrix.shape[0], 64)
+        grown = np.empty((capacity, self.dim), dtype=np.float32)
+        grown[:self._size] = self._matrix[:self._size]
+        self._matrix = grown
+
+    def add_many(self, vectors, rows):
+        # checked before _as_matrix, which would make [] a (1, 0) matrix
+        if not len(rows) and not len(vectors):
+            return
+        vectors = _as_matrix(vectors)
+        if len(vectors) != len(rows):
+            raise ValueError("vectors and rows must have the same length")
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._matrix = np.empty((0, self.dim), dtype=np.float32)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+            self._reserve(len(rows))
+            start = self._size
+            self._matrix[start:start + len(rows)] = self._prepare(vectors)
+            self._rows.extend(rows)
+            self._size += len(rows)
+            self._added(start, self._size)
+
+    def add(self, vector, row: dict):
+        self.add_many([vector], [row])
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        return _normalize(vectors)
+
+    def _query(self, query) -> np.ndarray:
+        return _as_query(query)
+
+    def _score(self, vectors: np.ndarray, q: np.ndarray) -> np.ndarray:
+        # higher is better; cosine similarity for unit vectors
+        return vectors @ q
+
+    def _similarity(self, score: float) -> float:
+        return score
+
+    def _added(self, start: int, stop: int):
+        """Hook for subclasses to index rows ``start:stop`` (lock held)."""
+
+    def _candidates(self, q: np.ndarray):
+        """Ids worth scoring for ``q``; ``None`` means every vector."""
+        return None
+
+    def search(self, query, k: int = 3) -> list[dict]:
+        with self._lock:
+            if not self._size or k <= 0:
+                return []
+            q = self._query(query)
+            ids = self._candidates(q)
+            scores = self._score(self.vectors if ids is None else self.vectors[ids], q)
+            k = min(k, len(scores))
+            if not k:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            found = top if ids is None else ids[top]
+            return [
+              {**self._rows[i], "similarity": self._similarity(s)}
+              for i, s in zip(found.tolist(), scores[top].tolist())
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._matrix = np.empty((0, self.dim or 0), dtype=np.float32)
+            self._rows = []
+            self._size = 0
+            self._cleared()
+            self.loaded = False
+
+    def _cleared(self):
+        """Hook for subclasses to drop derived state (lock held)."""
+
+    def _extra_state(self) -> dict:
+        return {}
+
+    def _load_extra_state(self, data):
+        pass
+
+    def save(self, path: str):
+        with self._lock:
+            with open(path, "wb") as f:
+                np.savez(
+                  f, vectors=self.vectors, rows=json.dumps(self._rows),
+                  kind=self.kind, **self._extra_state()
+                )
+
+    def load(self, path: str):
+        with open(path, "rb") as f:
+            data = np.load(f)
+            if str(data["kind"]) != self.kind:
+                raise ValueError(f"{path} holds a {data['kind']} index, not {self.kind}")
+            vectors = data["vectors"]
+            rows = json.loads(str(data["rows"]))
+            with self._lock:
+                self.dim = vectors.shape[1] if len(vectors) else self.dim
+                self._matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+                self._rows = rows
+                self._size = len(rows)
+                self._load_extra_state(data)
+                self.loaded = True
+
+
+class IVFIndex(VectorIndex):
+    """Inverted-file ANN index: vectors are bucketed under k-means centroids
+    and a query only scores the ``nprobe`` closest buckets.
+
+    Until ``train_size`` vectors have been added the index answers exactly;
+    after that it trains once and every insert is assigned incrementally.
+    Raise ``nprobe`` for recall, lower it for speed.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, dim: int | None = None, nlist: int = 256, nprobe: int = 16,
+                 train_size: int | None = None, iterations: int = 10, seed: int = 0):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size or nlist * 32
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = None
+        self._lists = []
+
+    def params(self) -> dict:
+        return {"nlist": self.nlist, "nprobe": self.nprobe}
+
+    def _kmeans(self, sample: np.ndarray) -> np.ndarray:
+        # spherical k-means: vectors are unit length, so assign by dot product
+        rng = np.random.default_rng(self.seed)
+        nlist = min(self.nlist, len(sample))
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+        return np.ascontiguousarray(centroids, dtype=np.float32)
+
+    def _assign_range(self, start: int, stop: int):
+        labels = np.argmax(self._matrix[start:stop] @ self.centroids.T, axis=1)
+        for offset, label in enumerate(labels.tolist()):
+            self._lists[label].append(start + offset)
+
+    def _train(self):
+        rng = np.random.default_rng(self.seed)
+        n = min(self._size, self.train_size)
+        sample = self.vectors[rng.choice(self._size, n, replace=False)]
+        self.centroids = self._kmeans(sample)
+        self._lists = [[] for _ in range(len(self.centroids))]
+        self._assign_range(0, self._size)
+
+    def train(self):
+        with self._lock:
+            if self._size:
+                self._train()
+
+    def _added(self, start, stop):
+        if self.centroids is not None:
+            self._assign_range(start, stop)
+        elif self._size >= self.train_size:
+            self._train()
+
+    def _candidates(self, q):
+        if self.centroids is None:
+            return None
+        nprobe = min(self.nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+        ids = [i for c in probe.tolist() for i in self._lists[c]]
+        return np.asarray(ids, dtype=np.int64)
+
+    def _cleared(self):
+        self.centroids = None
+        self._lists = []
+
+    def _extra_state(self):
+        if self.centroids is None:
+            return {}
+        assign = np.empty(self._size, dtype=np.int32)
+        for label, ids in enumerate(self._lists):
+            assign[ids] = label
+        return {"centroids": self.centroids, "assign": assign}
+
+    def _load_extra_state(self, data):
+        self._cleared()
+        if "centroids" in data.files:
+            self.centroids = data["centroids"]
+            self._lists = [[] for _ in range(len(self.centroids))]
+            for i, label in enumerate(data["assign"].tolist()):
+                self._lists[label].append(i)
+
+
+class HNSWIndex:
+    """Graph-based ANN index backed by the optional ``hnswlib`` package.
+
+    ``ef`` trades recall for speed at query time; ``m`` and
+    ``ef_construction`` control graph quality at build time.
+    """
+
+    kind = "hnsw"
+
+    def __init__(self, dim: int | None = None, m: int = 16, ef: int = 64,
+                 ef_construction: int = 200, capacity: int = 1024):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("SHOT_INDEX=hnsw needs the 'hnswlib' package") from e
+        self._hnswlib = hnswlib
+        self.dim = dim
+        self.m = m
+        self.ef = ef
+        self.ef_construction = ef_construction
+        self.capacity = capacity
+        self.loaded = False
+        self._index = None
+        self._rows = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def params(self) -> dict:
+        return {"m": self.m, "ef": self.ef}
+
+    def _new_index(self, capacity: int):
+        index = self._hnswlib.Index(space="cosine", dim=self.dim)
+        index.init_index(max_elements=capacity, M=self.m, ef_construction=self.ef_construction)
+        return index
+
+    def add_many(self, vectors, rows):
+        # checked before _as_matrix, which would make [] a (1, 0) matrix
+        if not len(rows) and not len(vectors):
+            return
+        vectors = _as_matrix(vectors)
+        if len(vectors) != len(rows):
+            raise ValueError("vectors and rows must have the same length")
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+            if self._index is None:
+                self._index = self._new_index(max(self.capacity, len(rows)))
+            needed = len(self._rows) + len(rows)
+            if needed > self._index.get_max_elements():
+                self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+            start = len(self._rows)
+            self._index.add_items(vectors, np.arange(start, start + len(rows)))
+            self._rows.extend(rows)
+
+    def add(self, vector, row: dict):
+        self.add_many([vector], [row])
+
+    def search(self, query, k: int = 3) -> list[dict]:
+        with self._lock:
+            if not self._rows or k <= 0:
+                return []
+            k = min(k, len(self._rows))
+            self._index.set_ef(max(self.ef, k))
+            labels, distances = self._index.knn_query(_as_query(query), k=k)
+            return [
+              {**self._rows[i], "similarity": 1.0 - float(d)}
+              for i, d in zip(labels[0].tolist(), distances[0].tolist())
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+            self._rows = []
+            self.loaded = False
+
+    def save(self, path: str):
+        with self._lock:
+            self._index.save_index(path + ".hnsw")
+            with open(path, "w") as f:
+                json.dump({"kind": self.kind, "dim": self.dim, "rows": self._rows}, f)
+
+    def load(self, path: str):
+        with open(path) as f:
+            data = json.load(f)
+        if data["kind"] != self.kind:
+            raise ValueError(f"{path} holds a {data['kind']} index, not {self.kind}")
+        with self._lock:
+            self.dim = data["dim"]
+            self._rows = data["rows"]
+            self._index = self._hnswlib.Index(space="cosine", dim=self.dim)
+            self._index.load_index(path + ".hnsw", max_elements=max(len(self._rows), self.capacity))
+            self.loaded = True
+
+
+INDEX_KINDS = {"exact": VectorIndex, "ivf": IVFIndex, "hnsw": HNSWIndex}
+
+def make_index(kind: str = "exact", **params):
+    try:
+        cls = INDEX_KINDS[kind]
+    except KeyError:
+        raise ValueError(f"unknown index kind {kind!r}; choose from {sorted(INDEX_KINDS)}")
+    return cls(**params)
+
+def index_from_env():
+    """Build the shot index selected by SHOT_INDEX and its tuning env vars."""
+    kind = os.getenv("SHOT_INDEX", "exact")
+    params = {
+      "exact": {},
+      "ivf": {
+        "nlist":  int(os.getenv("SHOT_INDEX_NLIST", "256")),
+        "nprobe": int(os.getenv("SHOT_INDEX_NPROBE", "16")),
+      },
+      "hnsw": {
+        "m":  int(os.getenv("SHOT_INDEX_M", "16")),
+        "ef": int(os.getenv("SHOT_INDEX_EF", "64")),
+      },
+    }.get(kind, {})
+    return make_index(kind, **params)
+
+
+DEFAULT_REPORT_CONFIGS = [
+    ("ivf", {"nprobe": 1}), ("ivf", {"nprobe": 4}), ("ivf", {"nprobe": 16}),
+    ("hnsw", {"ef": 16}), ("hnsw", {"ef": 64}), ("hnsw", {"ef": 256}),
+]
+
+def recall_report(vectors, queries, k: int = 10, configs=None) -> list[dict]:
+    """Measure recall@k and per-query latency of ANN configs against exact search.
+
+    Configs whose backend is not installed (e.g. hnswlib) are skipped.
+    """
+    vectors = _as_matrix(vectors)
+    queries = _as_matrix(queries)
+    rows = [{"id": i} for i in range(len(vectors))]
+
+    def run(index):
+        latencies, found = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            hits = index.search(q, k)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            found.append({h["id"] for h in hits})
+        return found, np.asarray(latencies)
+
+    def build(kind, params):
+        t0 = time.perf_counter()
+        index = make_index(kind, **params)
+        index.add_many(vectors, rows)
+        if isinstance(index, IVFIndex):
+            index.train()  # report on the trained layout even for small samples
+        return index, time.perf_counter() - t0
+
+    exact, build_s = build("exact", {})
+    truth, latencies = run(exact)
+    report = []
+
+    def record(index, build_s, found, latencies):
+        recall = np.mean([len(f & t) / max(len(t), 1) for f, t in zip(found, truth)])
+        report.append({
+          "index": index.kind,
+          "params": ", ".join(f"{name}={value}" for name, value in index.params().items()),
+          f"recall@{k}": round(float(recall), 4),
+          "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+          "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+          "build_s": round(build_s, 3),
+        })
+
+    record(exact, build_s, truth, latencies)
+    for kind, params in configs or DEFAULT_REPORT_CONFIGS:
+        try:
+            index, build_s = build(kind, params)
+        except ImportError:
+            continue
+        record(index, build_s, *run(index))
+    return report
@@ -0,0 +1,162 @@
+import asyncio
+import inspect
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from .clients import async_openai_client
+from .metrics import STAGE_SECONDS, counter
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-3.5-turbo")
+# a second request fired when the first has produced no token after
+# LLM_HEDGE_AFTER_MS; may name a cheaper model. 0 turns hedging off
+LLM_HEDGE_MODEL = os.getenv("LLM_HEDGE_MODEL", CHAT_MODEL)
+LLM_HEDGE_AFTER_MS = float(os.getenv("LLM_HEDGE_AFTER_MS", "2000"))
+# watchdog: no token from any request by then and the call gives up
+LLM_TTFT_TIMEOUT_MS = float(os.getenv("LLM_TTFT_TIMEOUT_MS", "8000"))
+# the whole stream, first request to last token
+LLM_DEADLINE_MS = float(os.getenv("LLM_DEADLINE_MS", "30000"))
+
+LLM_REQUESTS = counter(
+  "caddie_llm_requests_total", "Chat completion requests by role and how they ended.",
+  ["role", "outcome"],
+)
+LLM_TIMEOUTS = counter(
+  "caddie_llm_timeouts_total", "Chat calls cut off by the TTFT watchdog or the deadline.", ["kind"]
+)
+
+
+class LLMTimeout(Exception):
+    """The model missed the first-token watchdog (``ttft``) or the deadline.
+
+    ``partial`` is true when tokens had already been streamed.
+    """
+
+    def __init__(self, kind: str, partial: bool = False):
+        super().__init__(f"LLM {kind} timeout" + (" mid-stream" if partial else ""))
+        self.kind = kind
+        self.partial = partial
+
+
+def _content(chunk):
+    return getattr(chunk.choices[0].delta, "content", None)
+
+async def _close(response):
+    close = getattr(response, "close", None)
+    if close is None:
+        return
+    try:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+    except Exception:
+        logger.debug("Closing a chat stream failed", exc_info=True)
+
+async def _first_token(model: str, messages):
+    """Open a stream and read up to its first token.
+
+    Returns ``(token, chunks, response)``; ``token`` is None for an empty
+    answer, and ``chunks`` carries on where the first token left off.
+    """
+    response = await async_openai_client().chat.completions.create(
+        model=model,
+        messages=messages,  # type: ignore
+        stream=True
+    )
+    chunks = response.__aiter__()
+    try:
+        async for chunk in chunks:
+            token = _content(chunk)
+            if token:
+                return token, chunks, response
+    except BaseException:
+        # includes losing the race: the loser's connection is released
+        await _close(response)
+        raise
+    return None, chunks, response
+
+async def stream_chat(messages, model: str | None = None, hedge_model: str | None = None,
+                      hedge_after_ms: float | None = None, ttft_timeout_ms: float | None = None,
+                      deadline_ms: float | None = None):
+    """Yield the tokens of one streamed chat completion, hedged and bounded.
+
+    If no token has arrived ``hedge_after_ms`` after the request (or the
+    request fails first), a second one goes to ``hedge_model``; whichever
+    streams first wins and the other is cancelled. Raises ``LLMTimeout``
+    when no token arrives within ``ttft_timeout_ms`` or the stream runs past
+    ``deadline_ms``.
+    """
+    model = model or CHAT_MODEL
+    hedge_model = hedge_model or LLM_HEDGE_MODEL
+    hedge_after = (LLM_HEDGE_AFTER_MS if hedge_after_ms is None else hedge_after_ms) / 1000
+    ttft_timeout = (LLM_TTFT_TIMEOUT_MS if ttft_timeout_ms is None else ttft_timeout_ms) / 1000
+    deadline = (LLM_DEADLINE_MS if deadline_ms is None else deadline_ms) / 1000
+
+    started = time.perf_counter()
+    attempts = {asyncio.create_task(_first_token(model, messages)): "primary"}
+    hedged = hedge_after <= 0
+    winner = response = error = None
+    try:
+        while winner is None:
+            elapsed = time.perf_counter() - started
+            wait_s = ttft_timeout - elapsed
+            if not hedged:
+                wait_s = min(wait_s, hedge_after - elapsed)
+            done, _ = await asyncio.wait(
+              attempts, timeout=max(wait_s, 0), return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                role = attempts.pop(task)
+                if task.exception() is None:
+                    winner = role
+                    token, chunks, response = task.result()
+                    break
+                error = task.exception()
+                LLM_REQUESTS.inc(role=role, outcome="failed")
+                logger.warning("LLM %s request failed: %r", role, error)
+            if winner is not None:
+                break
+            if time.perf_counter() - started >= ttft_timeout:
+                LLM_TIMEOUTS.inc(kind="ttft")
+                raise LLMTimeout("ttft")
+            if not hedged and (not attempts or time.perf_counter() - started >= hedge_after):
+                hedged = True
+                attempts[asyncio.create_task(_first_token(hedge_model, messages))] = "hedge"
+            elif not attempts:
+                raise error
+    finally:
+        # the losers: stop those still waiting, close any that got a token too
+        for task in attempts:
+            task.cancel()
+        results = await asyncio.gather(*attempts, return_exceptions=True)
+        for role, result in zip(attempts.values(), results):
+            LLM_REQUESTS.inc(role=role, outcome="cancelled")
+            if isinstance(result, tuple):
+                await _close(result[2])
+
+    LLM_REQUESTS.inc(role=winner, outcome="won")
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_ttft")
+    try:
+        if token is None:
+            return
+        yield token
+        while True:
+            remaining = deadline - (time.perf_counter() - started)
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), max(remaining, 0))
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                LLM_TIMEOUTS.inc(kind="deadline")
+                raise LLMTimeout("deadline", partial=True) from None
+            token = _content(chunk)
+            if token:
+                yield token
+    finally:
+        await _close(response)
@@ -0,0 +1,207 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# timers cost a perf_counter call and a locked add each; METRICS_ENABLED=false
+# turns them into no-ops
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# seconds; spans a cached lookup (sub-millisecond) to a slow completion
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_str(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels) -> tuple:
+        return tuple(labels[n] for n in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(Metric):
+    """Bucketed observations (in seconds) per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (last is +Inf), sum, count]
+        self._values = {}
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the ``with`` block, even if it raises."""
+        if not METRICS_ENABLED:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(counts), total, n) for k, (counts, total, n) in self._values.items()]
+        lines = []
+        for key, counts, total, n in items:
+            running = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                running += c
+                le = _label_str(self.labelnames, key, [f'le="{_number(bound)}"'])
+                lines.append(f"{self.name}_bucket{le} {running}")
+            labels = _label_str(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {n}")
+        return lines
+
+
+class Callback(Metric):
+    """Values read at scrape time from ``fn``, so the hot path pays nothing.
+
+    ``fn`` returns a number, or a dict mapping label values (a tuple, or a
+    plain value for a single label) to numbers.
+    """
+
+    def __init__(self, name, help, fn, kind="gauge", labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self):
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+          f"{self.name}{_label_str(self.labelnames, k if isinstance(k, tuple) else (k,))} {_number(v)}"
+          for k, v in values.items()
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        # re-registering a name replaces it, so reloading a module is harmless
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                # one broken source must not take the whole scrape down
+                lines.append(f"# {metric.name} unavailable: {_escape(repr(e))}")
+                continue
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+def counter(name, help, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+def callback(name, help, fn, kind="gauge", labelnames=()) -> Callback:
+    return REGISTRY.register(Callback(name, help, fn, kind, labelnames))
+
+
+# shared by every module that times part of a recommendation
+STAGE_SECONDS = histogram(
+  "caddie_stage_seconds", "Time spent in each stage of a recommendation.", ["stage"]
+)
+ERRORS = counter("caddie_errors_total", "Failures by stage.", ["stage"])
+
+@contextmanager
+def stage(name: str):
+    """Time the ``with`` block into caddie_stage_seconds{stage=name}.
+
+    An exception escaping the block also counts towards
+    caddie_errors_total{stage=name}; cancellation does not.
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.inc(stage=name)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+
+from .metrics import counter
+
+logger = logging.getLogger(__name__)
+
+STAGE_FALLBACKS = counter(
+  "caddie_stage_fallbacks_total", "Pipeline stages that fell back instead of answering.",
+  ["stage", "reason"],
+)
+# strong references so a run's tasks outlive the request that started them
+_pending = set()
+
+
+class Stage:
+    """One node of a Pipeline.
+
+    ``fn`` is an async callable taking a context dict (the run's inputs plus
+    the results of ``deps``). If it raises or runs past ``timeout_s`` the
+    stage yields ``fallback`` instead (called if callable), so dependants
+    always get a value.
+
+    ``key`` maps a run's inputs to whatever the result depends on (``None``
+    for "don't reuse"); a run started with ``warm=`` takes over the warm
+    run's stage when the keys match instead of starting it again.
+    """
+
+    def __init__(self, name: str, fn, deps=(), timeout_s: float | None = None, fallback=None,
+                 key=None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout_s = timeout_s
+        self.fallback = fallback
+        self.key = key
+
+
+class Pipeline:
+    """A small DAG of async stages; each starts as soon as its deps are done."""
+
+    def __init__(self, stages):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"duplicate stage {stage.name!r}")
+            missing = [d for d in stage.deps if d not in self.stages]
+            if missing:
+                # listing deps first also rules out cycles
+                raise ValueError(f"stage {stage.name!r} depends on unknown or later stage(s) {missing}")
+            self.stages[stage.name] = stage
+
+    def _closure(self, targets) -> list[str]:
+        needed = set()
+        todo = list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in needed:
+                needed.add(name)
+                todo.extend(self.stages[name].deps)
+        return [name for name in self.stages if name in needed]
+
+    def start(self, *targets, warm: "PipelineRun | None" = None, **inputs) -> "PipelineRun":
+        """Start ``targets`` and whatever they depend on.
+
+        Other stages start lazily, the first time ``get`` asks for them.
+        Stages of ``warm`` (an earlier run, e.g. a prefetch) whose key
+        matches are taken over, finished or not, rather than started.
+        """
+        run = PipelineRun(self, inputs)
+        if warm is not None:
+            run._adopt(warm)
+        run._start(self._closure(targets))
+        return run
+
+
+class PipelineRun:
+    def __init__(self, pipeline: Pipeline, inputs: dict):
+        self.pipeline = pipeline
+        self.inputs = inputs
+        self.timings = {}
+        self.fallbacks = {}
+        # stages taken over from a warm run
+        self.adopted = []
+        self._tasks = {}
+        # the run that took over this one's stages, if any
+        self._heir = None
+
+    def _adopt(self, warm: "PipelineRun"):
+        for name, stage in self.pipeline.stages.items():
+            task = warm._tasks.get(name)
+            if task is None or stage.key is None or task.cancelled():
+                continue
+            if task.done() and name in warm.fallbacks:
+                # a stage that degraded gets another chance
+                continue
+            if any(dep not in self._tasks for dep in stage.deps):
+                continue
+            key = stage.key(self.inputs)
+            if key is None or key != stage.key(warm.inputs):
+                continue
+            # moved, not shared: cancelling the warm run leaves it running
+            self._tasks[name] = warm._tasks.pop(name)
+            self.adopted.append(name)
+            if name in warm.timings:
+                self.timings[name] = warm.timings.pop(name)
+        warm._heir = self
+
+    def _owner(self, name: str) -> "PipelineRun":
+        # a stage still running when it was adopted reports to its new run
+        run = self
+        while name not in run._tasks and run._heir is not None:
+            run = run._heir
+        return run
+
+    def _start(self, names):
+        for name in names:
+            if name in self._tasks:
+                continue
+            stage = self.pipeline.stages[name]
+            deps = {dep: self._tasks[dep] for dep in stage.deps}
+            task = asyncio.create_task(self._run(stage, deps))
+            self._tasks[name] = task
+            _pending.add(task)
+            task.add_done_callback(_pending.discard)
+
+    @property
+    def started(self) -> list[str]:
+        return list(self._tasks)
+
+    async def _run(self, stage: Stage, deps: dict):
+        ctx = dict(self.inputs)
+        for dep, task in deps.items():
+            ctx[dep] = await task
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(stage.fn(ctx), stage.timeout_s)
+        except asyncio.TimeoutError:
+            reason = "timeout"
+        except Exception as e:
+            logger.warning("Stage %s failed: %r", stage.name, e)
+            reason = "error"
+        finally:
+            self._owner(stage.name).timings[stage.name] = round((time.perf_counter() - started) * 1000, 1)
+        self._owner(stage.name).fallbacks[stage.name] = reason
+        STAGE_FALLBACKS.inc(stage=stage.name, reason=reason)
+        return stage.fallback() if callable(stage.fallback) else stage.fallback
+
+    async def get(self, name: str):
+        self._start(self.pipeline._closure([name]))
+        # shielded: a caller that gives up must not cancel a stage others share
+        return await asyncio.shield(self._tasks[name])
+
+    def cancel(self):
+        """Stop every stage still running; used once an answer no longer needs them."""
+        for task in self._tasks.values():
+            task.cancel()
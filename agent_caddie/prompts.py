@@ -1,15 +1,37 @@
-from questionary import text, select
+import os
+import re
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+from .scenario import LIES, BALL_POSITIONS, ELEVATIONS, WIND_DIRECTIONS
+
+load_dotenv()
+
+# upper bound on prompt tokens; past shots beyond it are summarized per club
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "400"))
+SYSTEM_PROMPT = "You’re a golf caddie balancing conditions and history."
+QUESTION = "\nGiven this, what club would you suggest?"
+# rough stand-in for the cl100k pre-tokenizer: words, 1-3 digit runs and
+# punctuation, each carrying its leading space
+_TOKEN_RE = re.compile(r" ?[^\W\d_]+| ?\d{1,3}| ?[^\w\s]+|\s+")
+
+# questionary pulls in prompt_toolkit; import it only when the CLI prompts so
+# the API server, which just needs build_prompt, starts faster
+def text(*args, **kwargs):
+    from questionary import text
+    return text(*args, **kwargs)
+
+def select(*args, **kwargs):
+    from questionary import select
+    return select(*args, **kwargs)
 
 def ask_shot_details():
     d = float(text("Distance to pin (yards)?").ask())
-    lie = select("What’s the lie?", choices=[
-      "Fairway","Rough","Sand / Bunker","Tree line","Pine straw"
-    ]).ask()
-    ball_pos = select("Ball position?", choices=["Level","Above feet","Below feet"]).ask()
-    elev = select("Elevation change?", choices=["Level","Downhill","Uphill"]).ask()
-    wind_dir = select("Wind direction?", choices=[
-      "Headwind","Tailwind","Left→Right","Right→Left","None"
-    ]).ask()
+    lie = select("What’s the lie?", choices=LIES).ask()
+    ball_pos = select("Ball position?", choices=BALL_POSITIONS).ask()
+    elev = select("Elevation change?", choices=ELEVATIONS).ask()
+    wind_dir = select("Wind direction?", choices=WIND_DIRECTIONS).ask()
     wind_sp = float(text("Wind speed (mph)?").ask())
     scenario = {
       "distance": d, "lie": lie, "ball_pos": ball_pos,
@@ -21,17 +43,80 @@ def ask_shot_details():
     )
     return scenario
 
-def build_prompt(scn, past_shots):
+@lru_cache(maxsize=1)
+def _encoding():
+    # tiktoken is optional and fetches its vocabulary on first use
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    """Count tokens locally: exact with tiktoken, a close estimate without."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(_TOKEN_RE.findall(text))
+
+def count_message_tokens(messages) -> int:
+    # chat formatting adds a few tokens per message and for the reply
+    return sum(count_tokens(m["content"]) + 4 for m in messages) + 3
+
+def summarize_history(past_shots) -> list[dict]:
+    """Per-club aggregates, most-used club first."""
+    clubs = {}
+    for p in past_shots:
+        agg = clubs.setdefault(p["recommended_club"], {"count": 0, "carry": 0.0, "short": 0, "long": 0})
+        agg["count"] += 1
+        agg["carry"] += float(p["carried"])
+        agg["short"] += p.get("result") == "too short"
+        agg["long"] += p.get("result") == "too long"
+    summary = [
+      {
+        "club": club, "count": a["count"], "mean_carry": a["carry"] / a["count"],
+        "short_rate": a["short"] / a["count"], "long_rate": a["long"] / a["count"],
+      }
+      for club, a in clubs.items()
+    ]
+    return sorted(summary, key=lambda a: (-a["count"], a["club"]))
+
+def _shot_line(p) -> str:
+    return f"- You took {p['recommended_club']} and carried {p['carried']}y ({p['result']}).\n"
+
+def _summary_line(a) -> str:
+    return (
+      f"- {a['club']}: {a['count']} shots, avg carry {a['mean_carry']:.0f}y, "
+      f"{a['short_rate']:.0%} short, {a['long_rate']:.0%} long.\n"
+    )
+
+def _messages(user_content):
+    return [
+      {"role":"system","content":SYSTEM_PROMPT},
+      {"role":"user","content": user_content}
+    ]
+
+def build_prompt(scn, past_shots, budget: int | None = None):
+    """Build the chat messages, keeping them within ``budget`` tokens.
+
+    Past shots are listed one per line while they fit; otherwise they are
+    compressed into per-club aggregates, dropping the least-used clubs if
+    even those do not fit.
+    """
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
     intro = (
       f"Effective distance: {scn['effective_dist']} y "
       f"({scn['distance']} base + adjustments).\n\n"
-      "Similar past shots:\n"
     )
-    for p in past_shots:
-        intro += (
-          f"- You took {p['recommended_club']} and carried {p['carried']}y ({p['result']}).\n"
-        )
-    return [
-      {"role":"system","content":"You’re a golf caddie balancing conditions and history."},
-      {"role":"user","content": intro + "\nGiven this, what club would you suggest?"}
-    ]
+    lines = [_shot_line(p) for p in past_shots]
+    heading = "Similar past shots:\n"
+    base = count_message_tokens(_messages(intro + heading + QUESTION))
+    if base + sum(count_tokens(line) for line in lines) > budget:
+        lines = [_summary_line(a) for a in summarize_history(past_shots)]
+        heading = f"Similar past shots ({len(past_shots)}), summarized by club:\n"
+        base = count_message_tokens(_messages(intro + heading + QUESTION))
+        costs = [count_tokens(line) for line in lines]
+        while lines and base + sum(costs) > budget:
+            lines.pop()
+            costs.pop()
+    return _messages(intro + heading + "".join(lines) + QUESTION)
@@ -0,0 +1,73 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LIES = ["Fairway", "Rough", "Sand / Bunker", "Tree line", "Pine straw"]
+BALL_POSITIONS = ["Level", "Above feet", "Below feet"]
+ELEVATIONS = ["Level", "Downhill", "Uphill"]
+WIND_DIRECTIONS = ["Headwind", "Tailwind", "Left→Right", "Right→Left", "None"]
+
+# bin widths used to quantize numeric inputs; override per deployment via env
+DEFAULT_BINS = {
+    "distance":   float(os.getenv("SCENARIO_DISTANCE_BIN", "5")),
+    "wind_speed": float(os.getenv("SCENARIO_WIND_BIN", "5")),
+    "elevation":  float(os.getenv("SCENARIO_ELEVATION_BIN", "10")),
+}
+
+
+def bucket(value: float, width: float) -> float:
+    """Snap ``value`` to the nearest multiple of ``width`` (0 disables)."""
+    if not width:
+        return float(value)
+    return round(float(value) / width) * width + 0.0  # + 0.0 folds -0.0 into 0.0
+
+def normalize_choice(value, vocab):
+    # match known choices case-insensitively, otherwise just tidy whitespace
+    cleaned = " ".join(str(value).split())
+    for choice in vocab:
+        if cleaned.casefold() == choice.casefold():
+            return choice
+    return cleaned
+
+def scenario_fields(scn) -> dict:
+    """Flatten a scenario from the CLI (nested ``wind``) or API (flat) shape."""
+    wind = scn.get("wind") or {}
+    return {
+      "distance":   scn["distance"],
+      "lie":        scn["lie"],
+      "ball_pos":   scn.get("ball_pos", "Level"),
+      "elevation":  scn.get("elevation", "Level"),
+      "wind_dir":   wind.get("direction", scn.get("wind_dir", "None")),
+      "wind_speed": wind.get("speed", scn.get("wind_speed", 0)),
+    }
+
+def canonical_scenario(scn, bins=None) -> str:
+    """Build the stable key used for embedding, retrieval and caching.
+
+    Numbers are bucketed and categories normalized so near-identical shots
+    (151y vs 150y, 9 vs 10 mph) produce the same string.
+    """
+    bins = {**DEFAULT_BINS, **(bins or {})}
+    f = scenario_fields(scn)
+
+    dist = bucket(f["distance"], bins["distance"])
+    wind_dir = normalize_choice(f["wind_dir"], WIND_DIRECTIONS)
+    wind_sp = bucket(f["wind_speed"], bins["wind_speed"])
+    if wind_dir == "None" or not wind_sp:
+        wind = "calm"
+    else:
+        wind = f"{wind_sp:g}mph {wind_dir}"
+
+    elev = f["elevation"]
+    if isinstance(elev, (int, float)):
+        elev = f"{bucket(elev, bins['elevation']):+g}ft"
+    else:
+        elev = normalize_choice(elev, ELEVATIONS)
+
+    return (
+      f"{dist:g}y, lie={normalize_choice(f['lie'], LIES)}, "
+      f"ball_pos={normalize_choice(f['ball_pos'], BALL_POSITIONS)}, "
+      f"wind={wind}, elev={elev}"
+    )
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """One upstream token stream shared by every subscriber.
+
+    The producer runs in its own task, so it is not tied to whichever
+    request started it. Subscribers replay the tokens produced so far and
+    then follow live; when the last one goes away before the stream ends
+    the producer is cancelled.
+    """
+
+    def __init__(self, produce, on_done=None):
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.abandoned = False
+        self._on_done = on_done
+        self._update = asyncio.Event()
+        self.task = asyncio.create_task(self._run(produce))
+
+    def _notify(self):
+        self._update.set()
+        self._update = asyncio.Event()
+
+    async def _run(self, produce):
+        try:
+            async for token in produce():
+                self.tokens.append(token)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = RuntimeError("stream abandoned by every subscriber")
+        except Exception as e:
+            logger.warning("Single-flight producer failed: %r", e)
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            if self._on_done:
+                self._on_done(self)
+
+    async def wait_started(self):
+        """Wait for the first token; re-raise if the stream failed before it."""
+        while not self.tokens and not self.done:
+            await self._update.wait()
+        if self.error is not None and not self.tokens:
+            raise self.error
+
+    async def subscribe(self):
+        # counted from join() rather than from here, so a follower that has
+        # joined but not started reading still keeps the producer alive
+        sent = 0
+        try:
+            while True:
+                update = self._update
+                while sent < len(self.tokens):
+                    yield self.tokens[sent]
+                    sent += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await update.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                # nobody is listening any more; stop paying for tokens
+                self.abandoned = True
+                self.task.cancel()
+
+    @property
+    def joinable(self) -> bool:
+        return not (self.done or self.abandoned or self.task.done())
+
+
+class SingleFlight:
+    """Coalesce concurrent identical streams onto one producer per key."""
+
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self.cancelled = 0
+        self._flights = {}
+
+    def join(self, key, produce) -> Flight:
+        """Return the in-progress flight for ``key``, starting one if needed.
+
+        ``produce`` is only called for a new flight and must return an async
+        iterator of tokens. Each join must be followed by one ``subscribe``.
+        """
+        flight = self._flights.get(key)
+        if flight is not None and flight.joinable:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            flight = self._flights[key] = Flight(produce, on_done=lambda f: self._finish(key, f))
+        flight.subscribers += 1
+        return flight
+
+    def _finish(self, key, flight):
+        if flight.abandoned:
+            self.cancelled += 1
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def __len__(self):
+        return len(self._flights)
+
+    def __contains__(self, key):
+        flight = self._flights.get(key)
+        return flight is not None and flight.joinable
+
+    def stats(self) -> dict:
+        return {
+          "in_flight": len(self._flights), "leaders": self.leaders,
+          "followers": self.followers, "cancelled": self.cancelled,
+        }
+
+
+class SharedCalls:
+    """Coalesce concurrent identical awaitables (not streams) onto one task.
+
+    The shared task is cancelled when its last waiter is, so speculative
+    work nobody wants any more stops.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def call(self, key, fn):
+        entry = self._calls.get(key)
+        if entry is None:
+            task = asyncio.create_task(fn())
+            entry = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda t: self._forget(key, t))
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                entry[0].cancel()
+
+    def _forget(self, key, task):
+        entry = self._calls.get(key)
+        if entry is not None and entry[0] is task:
+            del self._calls[key]
+
+    def __len__(self):
+        return len(self._calls)
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# a token frame goes out once it has waited this long or grown this big
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "50"))
+SSE_COALESCE_CHARS = int(os.getenv("SSE_COALESCE_CHARS", "64"))
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data) -> str:
+    """One Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def coalesce(tokens, window_ms: float | None = None, max_chars: int | None = None):
+    """Merge an async stream of tokens into larger chunks.
+
+    The first token goes out on its own so time to first byte is not
+    delayed; after that tokens are buffered until ``window_ms`` has passed
+    since the last flush or the buffer reaches ``max_chars``. A slow
+    upstream never holds buffered text back longer than the window.
+    """
+    window = (SSE_COALESCE_MS if window_ms is None else window_ms) / 1000
+    max_chars = SSE_COALESCE_CHARS if max_chars is None else max_chars
+    it = tokens.__aiter__()
+    buffer = []
+    size = 0
+    flushed_at = None
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                # reading through a task means a timeout never cancels the
+                # upstream iterator mid-token
+                pending = asyncio.ensure_future(it.__anext__())
+            timeout = None
+            if buffer:
+                timeout = max(0.0, flushed_at + window - time.perf_counter())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield "".join(buffer)
+                buffer, size, flushed_at = [], 0, time.perf_counter()
+                continue
+            try:
+                token = pending.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+            if flushed_at is None:
+                flushed_at = time.perf_counter()
+                yield token
+                continue
+            buffer.append(token)
+            size += len(token)
+            if size >= max_chars or time.perf_counter() - flushed_at >= window:
+                yield "".join(buffer)
+                buffer, size, flushed_at = [], 0, time.perf_counter()
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        if hasattr(it, "aclose"):
+            await it.aclose()
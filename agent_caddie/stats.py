@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# weight of the newest shot in the recency-weighted mean carry
+CLUB_STATS_ALPHA = float(os.getenv("CLUB_STATS_ALPHA", "0.2"))
+FIELDS = ("count", "mean", "m2", "short", "long", "perfect", "recent_mean")
+
+
+class ClubAggregate:
+    """Running carry statistics for one user's club, updated in O(1).
+
+    Mean and variance use Welford's algorithm, so no past shots are kept;
+    ``recent_mean`` is an exponentially weighted mean that favours recent
+    swings.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, short=0, long=0, perfect=0, recent_mean=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.short = short
+        self.long = long
+        self.perfect = perfect
+        self.recent_mean = recent_mean
+
+    def update(self, carried: float, result: str | None, alpha: float = CLUB_STATS_ALPHA):
+        carried = float(carried)
+        self.count += 1
+        delta = carried - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (carried - self.mean)
+        if self.count == 1:
+            self.recent_mean = carried
+        else:
+            self.recent_mean += alpha * (carried - self.recent_mean)
+        if result == "too short":
+            self.short += 1
+        elif result == "too long":
+            self.long += 1
+        elif result == "perfect":
+            self.perfect += 1
+
+    @property
+    def variance(self) -> float:
+        # sample variance; undefined for a single shot
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def as_tuple(self) -> tuple:
+        return tuple(getattr(self, f) for f in FIELDS)
+
+    def to_dict(self) -> dict:
+        return {
+          "count": self.count,
+          "mean_carry": self.mean,
+          "std_carry": self.variance ** 0.5,
+          "recent_carry": self.recent_mean,
+          "short": self.short,
+          "long": self.long,
+          "perfect": self.perfect,
+        }
+
+
+class ClubStatsStore:
+    """Per-user, per-club aggregates held in memory.
+
+    With ``path`` set every update is also written through to a SQLite
+    table, one row per (user, club), so the aggregates survive restarts.
+    """
+
+    def __init__(self, path: str | None = None, alpha: float = CLUB_STATS_ALPHA):
+        self.path = path
+        self.alpha = alpha
+        self._users = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+              "CREATE TABLE IF NOT EXISTS club_stats ("
+              " user_id TEXT NOT NULL, club TEXT NOT NULL,"
+              " count INTEGER, mean REAL, m2 REAL, short INTEGER, long INTEGER,"
+              " perfect INTEGER, recent_mean REAL, PRIMARY KEY (user_id, club))"
+            )
+            self._conn.commit()
+            for user_id, club, *values in self._conn.execute("SELECT * FROM club_stats"):
+                self._users.setdefault(user_id, {})[club] = ClubAggregate(*values)
+
+    def _write(self, rows):
+        if self._conn is not None and rows:
+            self._conn.executemany(
+              "INSERT OR REPLACE INTO club_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+              [(user_id, club, *agg.as_tuple()) for user_id, club, agg in rows]
+            )
+            self._conn.commit()
+
+    def update_many(self, shots):
+        """Fold shots (dicts with user_id, recommended_club, carried, result) in."""
+        touched = {}
+        with self._lock:
+            for s in shots:
+                if not s.get("recommended_club") or s.get("carried") is None:
+                    continue
+                clubs = self._users.setdefault(s["user_id"], {})
+                agg = clubs.setdefault(s["recommended_club"], ClubAggregate())
+                agg.update(s["carried"], s.get("result"), self.alpha)
+                touched[(s["user_id"], s["recommended_club"])] = agg
+            self._write([(u, c, agg) for (u, c), agg in touched.items()])
+        return len(touched)
+
+    def update(self, shot: dict):
+        self.update_many([shot])
+
+    def get(self, user_id: str) -> dict[str, dict]:
+        return {club: agg.to_dict() for club, agg in self._users.get(user_id, {}).items()}
+
+    def club(self, user_id: str, club: str) -> dict | None:
+        agg = self._users.get(user_id, {}).get(club)
+        return agg.to_dict() if agg else None
+
+    def rebuild(self, shots) -> int:
+        """Replace everything with aggregates recomputed from ``shots`` (oldest first)."""
+        fresh = ClubStatsStore(alpha=self.alpha)
+        fresh.update_many(shots)
+        with self._lock:
+            self._users = fresh._users
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM club_stats")
+                self._write([
+                  (user_id, club, agg)
+                  for user_id, clubs in self._users.items() for club, agg in clubs.items()
+                ])
+                # _write skips an empty set, and the DELETE must stick regardless
+                self._conn.commit()
+        return sum(agg.count for clubs in self._users.values() for agg in clubs.values())
+
+    def __len__(self):
+        return sum(len(clubs) for clubs in self._users.values())
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
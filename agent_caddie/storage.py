@@ -0,0 +1,207 @@
+import sqlite3
+import threading
+
+import numpy as np
+
+from .index import VectorIndex
+
+# every column of the shots table; SQLite callers may only select these
+SHOT_COLUMNS = (
+    "id", "user_id", "scenario_text", "distance", "lie", "ball_pos", "wind_dir",
+    "wind_speed", "elevation", "effective_dist", "recommended_club", "carried",
+    "error", "result", "cause", "embedding",
+)
+
+
+class SupabaseStorage:
+    """Shots and club distances in Supabase (PostgREST + the match_shots RPC).
+
+    ``client`` is called for every operation rather than stored, so the
+    shared client is built lazily and can be swapped out in tests.
+    """
+
+    kind = "supabase"
+
+    def __init__(self, client):
+        self._client = client
+
+    def upsert_club_distances(self, entries: list[dict]):
+        self._client().table("club_distances")\
+            .upsert(entries, on_conflict="user_id,club")\
+            .execute()
+
+    def club_distances(self, user_id: str) -> dict[str, float]:
+        resp = (
+          self._client().table("club_distances")
+          .select("club,distance")
+          .eq("user_id", user_id)
+          .execute()
+        )
+        return {r["club"]: float(r["distance"]) for r in resp.data or []}
+
+    def insert_shots(self, rows: list[dict]) -> list[dict]:
+        """Insert shot rows; returns them as stored (with ids) when the API does."""
+        # a single shot goes up as a plain object, as save_shot always sent it
+        payload = rows[0] if len(rows) == 1 else rows
+        return self._client().table("shots").insert(payload).execute().data
+
+    def match_shots(self, embedding, k: int = 3) -> list[dict]:
+        resp = (
+          self._client()
+          .rpc("match_shots", {"query_embedding": embedding, "match_count": k})
+          .execute()
+        )
+        return resp.data or []
+
+    def iter_shots(self, columns: str, page_size: int = 1000, order: str | None = None):
+        # page through the shots table with PostgREST ranges
+        start = 0
+        while True:
+            query = self._client().table("shots").select(columns)
+            if order:
+                query = query.order(order)
+            rows = query.range(start, start + page_size - 1).execute().data or []
+            yield from rows
+            if len(rows) < page_size:
+                return
+            start += page_size
+
+    def ping(self):
+        self._client().table("club_distances").select("user_id").limit(1).execute()
+
+
+class SQLiteStorage:
+    """Shots and club distances in one local SQLite file, no network hop.
+
+    Embeddings are stored as float32 BLOBs. Similarity search runs against
+    an exact in-memory index filled from those BLOBs on first use and kept
+    current by ``insert_shots``, so a query never re-reads the table.
+    """
+
+    kind = "sqlite"
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+          "CREATE TABLE IF NOT EXISTS club_distances ("
+          " user_id TEXT NOT NULL, club TEXT NOT NULL, distance REAL NOT NULL,"
+          " PRIMARY KEY (user_id, club));"
+          "CREATE TABLE IF NOT EXISTS shots ("
+          " id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL,"
+          " scenario_text TEXT, distance REAL, lie TEXT, ball_pos TEXT, wind_dir TEXT,"
+          " wind_speed REAL, elevation REAL, effective_dist REAL, recommended_club TEXT,"
+          " carried REAL, error REAL, result TEXT, cause TEXT, embedding BLOB);"
+        )
+        self._conn.commit()
+        self._index = None
+
+    @staticmethod
+    def _blob(embedding):
+        if embedding is None:
+            return None
+        return np.asarray(embedding, dtype=np.float32).tobytes()
+
+    @staticmethod
+    def _row(record) -> dict:
+        row = dict(record)
+        if row.get("embedding") is not None:
+            row["embedding"] = np.frombuffer(row["embedding"], dtype=np.float32).tolist()
+        return row
+
+    def upsert_club_distances(self, entries: list[dict]):
+        with self._lock:
+            self._conn.executemany(
+              "INSERT INTO club_distances (user_id, club, distance) VALUES (?, ?, ?)"
+              " ON CONFLICT (user_id, club) DO UPDATE SET distance = excluded.distance",
+              [(e["user_id"], e["club"], e["distance"]) for e in entries]
+            )
+            self._conn.commit()
+
+    def club_distances(self, user_id: str) -> dict[str, float]:
+        with self._lock:
+            rows = self._conn.execute(
+              "SELECT club, distance FROM club_distances WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        return {club: float(distance) for club, distance in rows}
+
+    def insert_shots(self, rows: list[dict]) -> list[dict]:
+        columns = [c for c in SHOT_COLUMNS if c != "id"]
+        sql = (
+          f"INSERT INTO shots ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        )
+        stored = []
+        with self._lock:
+            for row in rows:
+                values = [row.get(c) for c in columns[:-1]] + [self._blob(row.get("embedding"))]
+                cur = self._conn.execute(sql, values)
+                stored.append({**row, "id": cur.lastrowid})
+            self._conn.commit()
+            if self._index is not None:
+                embedded = [r for r in stored if r.get("embedding") is not None]
+                if embedded:
+                    self._index.add_many(
+                      [r["embedding"] for r in embedded], [self._match_row(r) for r in embedded]
+                    )
+        return stored
+
+    @staticmethod
+    def _match_row(row: dict) -> dict:
+        return {k: v for k, v in row.items() if k != "embedding"}
+
+    def _load_index(self):
+        index = VectorIndex()
+        vectors, rows = [], []
+        for record in self._conn.execute(
+          f"SELECT {', '.join(SHOT_COLUMNS)} FROM shots WHERE embedding IS NOT NULL ORDER BY id"
+        ):
+            vectors.append(np.frombuffer(record["embedding"], dtype=np.float32))
+            rows.append(self._match_row(dict(record)))
+        if vectors:
+            index.add_many(vectors, rows)
+        index.loaded = True
+        return index
+
+    def match_shots(self, embedding, k: int = 3) -> list[dict]:
+        """Same rows (plus ``similarity``) as the match_shots RPC, computed locally."""
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_index()
+            index = self._index
+        return index.search(embedding, k)
+
+    def iter_shots(self, columns: str, page_size: int = 1000, order: str | None = None):
+        names = [c.strip() for c in columns.split(",")]
+        unknown = set(names) - set(SHOT_COLUMNS) - {"*"}
+        if unknown or (order and order not in SHOT_COLUMNS):
+            raise ValueError(f"unknown shots column(s): {sorted(unknown) or order}")
+        sql = f"SELECT {', '.join(names)} FROM shots ORDER BY {order or 'id'} LIMIT ? OFFSET ?"
+        start = 0
+        while True:
+            with self._lock:
+                rows = [self._row(r) for r in self._conn.execute(sql, (page_size, start))]
+            yield from rows
+            if len(rows) < page_size:
+                return
+            start += page_size
+
+    def ping(self):
+        with self._lock:
+            self._conn.execute("SELECT 1")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+STORAGE_BACKENDS = ("supabase", "sqlite")
+
+def make_storage(kind: str = "supabase", client=None, path: str | None = None):
+    if kind == "supabase":
+        return SupabaseStorage(client)
+    if kind == "sqlite":
+        return SQLiteStorage(path or ":memory:")
+    raise ValueError(f"unknown storage backend {kind!r}; choose from {list(STORAGE_BACKENDS)}")
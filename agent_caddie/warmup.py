@@ -0,0 +1,124 @@
+import asyncio
+import importlib
+import logging
+import os
+import time
+
+from . import db
+from .clients import async_openai_client, supabase_client, built_clients
+
+logger = logging.getLogger(__name__)
+
+LOCAL_SHOT_INDEX = os.getenv("LOCAL_SHOT_INDEX", "true").lower() in ("1", "true", "yes")
+# start warming in the background as soon as the server is up
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() in ("1", "true", "yes")
+# send one cheap request per client so the TLS handshake happens here, not
+# in front of the first user
+WARMUP_PING = os.getenv("WARMUP_PING", "true").lower() in ("1", "true", "yes")
+# prefilling reads every stored embedding, so it is opt-in
+WARMUP_PREFILL_CACHE = os.getenv("WARMUP_PREFILL_CACHE", "false").lower() in ("1", "true", "yes")
+# heavy modules the package no longer imports at start-up
+DEFERRED_MODULES = ("httpx", "openai", "supabase")
+
+# status is cold until warmup starts, warming while it runs, then ready, or
+# degraded if a stage failed (the app then serves through its fallbacks)
+state = {"status": "cold", "stages": {}, "total_ms": None}
+_lock = asyncio.Lock()
+
+
+async def _imports():
+    for name in DEFERRED_MODULES:
+        await asyncio.to_thread(importlib.import_module, name)
+    return {"modules": list(DEFERRED_MODULES)}
+
+async def _openai():
+    client = async_openai_client()
+    if WARMUP_PING:
+        await client.models.list()
+    return {}
+
+async def _supabase():
+    if db.storage.kind != "supabase":
+        return {"skipped": f"STORAGE_BACKEND is {db.storage.kind}"}
+    client = await asyncio.to_thread(supabase_client)
+    if WARMUP_PING:
+        await asyncio.to_thread(
+          client.table("club_distances").select("user_id").limit(1).execute
+        )
+    return {}
+
+async def _index():
+    if db.RETRIEVAL_MODE == "features":
+        if db.feature_index.loaded:
+            return {"skipped": "already loaded"}
+        return {"index": "features", "rows": await asyncio.to_thread(db.load_feature_index)}
+    if not LOCAL_SHOT_INDEX:
+        return {"skipped": "LOCAL_SHOT_INDEX is off"}
+    if db.shot_index.loaded:
+        return {"skipped": "already loaded"}
+    return {"index": db.shot_index.kind, "rows": await asyncio.to_thread(db.load_shot_index)}
+
+async def _embedding_cache():
+    if not WARMUP_PREFILL_CACHE:
+        return {"skipped": "WARMUP_PREFILL_CACHE is off"}
+    return {"rows": await asyncio.to_thread(db.prefill_embedding_cache)}
+
+STAGES = {
+    "imports": _imports,
+    "openai": _openai,
+    "supabase": _supabase,
+    "index": _index,
+    "embedding_cache": _embedding_cache,
+}
+
+
+async def _run(name, refresh):
+    done = state["stages"].get(name)
+    if done and "error" not in done and not refresh:
+        return
+    started = time.perf_counter()
+    try:
+        detail = await STAGES[name]()
+    except Exception as e:
+        logger.warning("Warmup stage %s failed: %r", name, e)
+        detail = {"error": repr(e)}
+    state["stages"][name] = {"ms": round((time.perf_counter() - started) * 1000, 1), **detail}
+
+async def _chain(names, refresh):
+    for name in names:
+        await _run(name, refresh)
+
+async def warmup(refresh: bool = False) -> dict:
+    """Run every warmup stage that has not succeeded yet and report timings.
+
+    Stages that fail are recorded with their error and retried on the next
+    call; the app keeps serving through its fallbacks (RPC retrieval, a
+    client built on first request) either way.
+    """
+    async with _lock:
+        state["status"] = "warming"
+        started = time.perf_counter()
+        try:
+            await _run("imports", refresh)
+            # the index and cache need Supabase; OpenAI warms alongside
+            await asyncio.gather(
+              _run("openai", refresh),
+              _chain(["supabase", "index", "embedding_cache"], refresh),
+            )
+        finally:
+            failed = any("error" in stage for stage in state["stages"].values())
+            state["status"] = "degraded" if failed else "ready"
+        state["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return report()
+
+def start_warmup() -> asyncio.Task:
+    state["status"] = "warming"  # before the first request can see "cold"
+    return asyncio.create_task(warmup())
+
+def report() -> dict:
+    return {
+      "status": state["status"],
+      "total_ms": state["total_ms"],
+      "stages": {name: dict(stage) for name, stage in state["stages"].items()},
+      "clients": built_clients(),
+    }
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from .db import store_shots, _after_insert, _shot_row, _resolve_mode
+from .embeddings import aget_embeddings
+from .scenario import canonical_scenario
+
+logger = logging.getLogger(__name__)
+
+
+class ShotQueue:
+    """Durable SQLite queue of shots waiting to be embedded and inserted.
+
+    Jobs are claimed in id order, acked once inserted, and retried with
+    exponential backoff on failure; after ``max_attempts`` they are kept as
+    ``dead`` for inspection instead of being dropped.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 5, backoff_s: float = 1.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+          "CREATE TABLE IF NOT EXISTS shot_queue ("
+          " id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL,"
+          " mode TEXT, attempts INTEGER NOT NULL DEFAULT 0,"
+          " next_attempt REAL NOT NULL DEFAULT 0, status TEXT NOT NULL DEFAULT 'pending',"
+          " last_error TEXT)"
+        )
+        self._conn.commit()
+        # a crash mid-flush leaves jobs claimed; hand them back out
+        self.release_claimed()
+
+    def release_claimed(self):
+        with self._lock:
+            self._conn.execute("UPDATE shot_queue SET status = 'pending' WHERE status = 'claimed'")
+            self._conn.commit()
+
+    def put(self, entry: dict, mode=None) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+              "INSERT INTO shot_queue (payload, mode) VALUES (?, ?)",
+              (json.dumps(entry), mode)
+            )
+            self._conn.commit()
+            return cur.lastrowid
+
+    def claim(self, limit: int) -> list[tuple[int, dict, str | None]]:
+        with self._lock:
+            rows = self._conn.execute(
+              "SELECT id, payload, mode FROM shot_queue"
+              " WHERE status = 'pending' AND next_attempt <= ? ORDER BY id LIMIT ?",
+              (time.time(), limit)
+            ).fetchall()
+            self._conn.executemany(
+              "UPDATE shot_queue SET status = 'claimed' WHERE id = ?", [(r[0],) for r in rows]
+            )
+            self._conn.commit()
+        return [(job_id, json.loads(payload), mode) for job_id, payload, mode in rows]
+
+    def ack(self, ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM shot_queue WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+
+    def fail(self, ids, error: str):
+        now = time.time()
+        with self._lock:
+            for job_id in ids:
+                attempts = self._conn.execute(
+                  "SELECT attempts FROM shot_queue WHERE id = ?", (job_id,)
+                ).fetchone()[0] + 1
+                status = "dead" if attempts >= self.max_attempts else "pending"
+                self._conn.execute(
+                  "UPDATE shot_queue SET attempts = ?, status = ?, next_attempt = ?,"
+                  " last_error = ? WHERE id = ?",
+                  (attempts, status, now + self.backoff_s * 2 ** (attempts - 1), error, job_id)
+                )
+            self._conn.commit()
+
+    def depth(self) -> int:
+        """Jobs not yet inserted (pending or in flight)."""
+        with self._lock:
+            return self._conn.execute(
+              "SELECT COUNT(*) FROM shot_queue WHERE status IN ('pending', 'claimed')"
+            ).fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._conn.execute(
+              "SELECT status, COUNT(*) FROM shot_queue GROUP BY status"
+            ).fetchall())
+        return {
+          "depth": counts.get("pending", 0) + counts.get("claimed", 0),
+          "in_flight": counts.get("claimed", 0),
+          "dead": counts.get("dead", 0),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class WriteBehindWorker:
+    """Background task that drains a ShotQueue in batches.
+
+    Each batch costs one batched embedding call and one insert. If the
+    insert fails its rows are retried one by one, so a malformed shot is
+    retried (and eventually dead-lettered) alone. ``stop`` lets the batch
+    in flight finish, then flushes everything that is currently due.
+    """
+
+    def __init__(self, queue: ShotQueue, batch_size: int = 50, interval_s: float = 0.5):
+        self.queue = queue
+        self.batch_size = batch_size
+        self.interval_s = interval_s
+        self.inserted = 0
+        self.failures = 0
+        self._task = None
+        self._wake = None
+        self._stopping = None
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._loop())
+
+    def notify(self):
+        # called after put() so a new shot is written without waiting a full interval
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _loop(self):
+        # one batch at a time, so stop() is seen between batches
+        while not self._stopping.is_set():
+            try:
+                processed = await self._batch()
+            except Exception:
+                logger.exception("Write-behind batch failed")
+                processed = 0
+            if not processed:
+                self._wake.clear()
+                if self._stopping.is_set():
+                    break
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval_s)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain(self) -> int:
+        """Process due jobs until none are left; returns how many were handled."""
+        handled = 0
+        while processed := await self._batch():
+            handled += processed
+        return handled
+
+    async def _batch(self) -> int:
+        jobs = await asyncio.to_thread(self.queue.claim, self.batch_size)
+        if jobs:
+            await self._process(jobs)
+        return len(jobs)
+
+    async def _fail(self, ids, error):
+        self.failures += len(ids)
+        await asyncio.to_thread(self.queue.fail, ids, repr(error))
+        logger.warning("Write-behind of %d shot(s) failed: %r", len(ids), error)
+
+    async def _written(self, ready, stored):
+        rows = [row for _, row in ready]
+        # acked as soon as the rows are stored, so a failure below cannot
+        # make a retry insert them twice
+        await asyncio.to_thread(self.queue.ack, [job_id for job_id, _ in ready])
+        self.inserted += len(ready)
+        try:
+            await asyncio.to_thread(_after_insert, rows, stored)
+        except Exception:
+            logger.exception("Indexing %d written shot(s) failed", len(rows))
+
+    async def _process(self, jobs):
+        prepared = []
+        for job_id, entry, mode in jobs:
+            try:
+                text = canonical_scenario(entry) if _resolve_mode(mode) == "embedding" else None
+            except Exception as e:
+                await self._fail([job_id], e)
+                continue
+            prepared.append((job_id, entry, text))
+        embed = [(job_id, text) for job_id, _, text in prepared if text is not None]
+        try:
+            vectors = dict(zip(
+              [job_id for job_id, _ in embed],
+              await aget_embeddings([text for _, text in embed]) if embed else []
+            ))
+        except Exception as e:
+            await self._fail([job_id for job_id, _, _ in prepared], e)
+            return
+        ready = []
+        for job_id, entry, _ in prepared:
+            try:
+                ready.append((job_id, _shot_row(entry, vectors.get(job_id))))
+            except Exception as e:
+                await self._fail([job_id], e)
+        if not ready:
+            return
+        try:
+            stored = await asyncio.to_thread(store_shots, [row for _, row in ready])
+        except Exception as e:
+            if len(ready) == 1:
+                await self._fail([ready[0][0]], e)
+                return
+            # one bad row fails the whole insert; retry them alone so only
+            # that row is charged an attempt
+            logger.warning("Write-behind batch of %d failed, retrying row by row: %r", len(ready), e)
+            for job in ready:
+                try:
+                    stored = await asyncio.to_thread(store_shots, [job[1]])
+                except Exception as e:
+                    await self._fail([job[0]], e)
+                    continue
+                await self._written([job], stored)
+            return
+        await self._written(ready, stored)
+
+    async def stop(self):
+        if self._task is not None:
+            # not cancelled: a store_shots thread would finish anyway, and
+            # releasing its claimed jobs would insert them a second time
+            self._stopping.set()
+            self._wake.set()
+            await self._task
+            self._task = None
+        await asyncio.to_thread(self.queue.release_claimed)
+        await self.drain()
+
+    def stats(self) -> dict:
+        return {**self.queue.stats(), "inserted": self.inserted, "failures": self.failures}
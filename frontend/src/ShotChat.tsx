@@ -1,5 +1,5 @@
 // src/components/ShotChat.tsx
-import React, { useState } from 'react'
+import React, { useRef, useState } from 'react'
 import { Button } from '@/components/ui/button'
 
 type Answer = string | number
@@ -14,6 +14,22 @@ const questions: { key: keyof Payload; question: string }[] = [
   { key: 'wind_speed',    question: 'Wind speed (mph)?' },
 ]
 
+interface StreamMeta {
+  source: string
+  effective_dist: number
+  matched_shots: { recommended_club: string; carried: number; result: string }[]
+}
+
+function parseEvent(frame: string): { event: string; data: any } | null {
+  let event = 'message'
+  let data = ''
+  for (const line of frame.split('\n')) {
+    if (line.startsWith('event: ')) event = line.slice(7)
+    else if (line.startsWith('data: ')) data += line.slice(6)
+  }
+  return data ? { event, data: JSON.parse(data) } : null
+}
+
 interface Payload {
   user_id: string
   scenario_text: string
@@ -30,45 +46,67 @@ export function ShotChat() {
   const [answers, setAnswers] = useState<Partial<Payload>>({ user_id: '1' })
   const [loading, setLoading] = useState(false)
   const [response, setResponse] = useState<string | null>(null)
+  const [meta, setMeta] = useState<StreamMeta | null>(null)
+  // prefetch session: the server loads club distances and similar shots
+  // while the remaining questions are answered
+  const session = useRef<string | null>(null)
 
   const isDone = step >= questions.length
 
+  const prefetch = (partial: Partial<Payload>) => {
+    // best effort: /recommend works the same without it
+    fetch('/api/caddie/prefetch', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ ...partial, session: session.current }),
+    })
+      .then(res => (res.ok ? res.json() : null))
+      .then(body => { if (body) session.current = body.session })
+      .catch(() => {})
+  }
+
   const handleNext = (answer: Answer) => {
     // safe to index because this only runs when step < questions.length
     const { key } = questions[step]
-    setAnswers(prev => ({ 
-      ...prev, 
-      [key]: typeof answer === 'number' ? answer : answer.trim() 
-    }))
+    const next = {
+      ...answers,
+      [key]: typeof answer === 'number' ? answer : answer.trim()
+    }
+    setAnswers(next)
     setStep(prev => prev + 1)
+    prefetch(next)
   }
 
   const handleSubmit = async () => {
     setLoading(true)
     try {
       const fullPayload = answers as Payload
-      const res = await fetch('/api/caddie/recommend', {
+      const query = session.current ? `?session=${encodeURIComponent(session.current)}` : ''
+      const res = await fetch(`/api/caddie/recommend${query}`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
         body: JSON.stringify(fullPayload),
       })
-        if (!res.ok) throw new Error(res.statusText);
-        const reader  = res.body!.getReader();
-        const decoder = new TextDecoder();
-        let done  = false;
-        setResponse(""); 
+      if (!res.ok) throw new Error(res.statusText)
+      const reader = res.body!.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      setResponse('')
 
-        while (!done) {
-        const { value, done: doneReading } = await reader.read();
-        done = doneReading;
-        if (!value) continue;
-
-        const chunkText = decoder.decode(value, { stream: true });
-        for (const char of chunkText) {
-        setResponse((r) => r + char);
-        await new Promise((resolve) => setTimeout(resolve, 20));
+      // the server coalesces tokens into frames, so each one is drawn as it arrives
+      while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const frames = buffer.split('\n\n')
+        buffer = frames.pop() ?? ''
+        for (const frame of frames) {
+          const event = parseEvent(frame)
+          if (event?.event === 'meta') setMeta(event.data)
+          else if (event?.event === 'token') setResponse(r => (r ?? '') + event.data.text)
+          else if (event?.event === 'error') throw new Error(event.data.detail)
+        }
       }
-    }
     } catch (err: any) {
       setResponse(`Error: ${err.message}`)
     } finally {
@@ -77,15 +115,23 @@ export function ShotChat() {
   }
 
   // 1) Show the recommendation & reset button
-  if (response) {
+  if (response !== null) {
     return (
       <div className="p-4">
         <h2 className="text-xl font-semibold mb-2">Recommendation:</h2>
+        {meta && (
+          <p className="text-sm text-gray-500 mb-2">
+            Plays {meta.effective_dist.toFixed(0)} y
+            {meta.matched_shots.length > 0 && ` · ${meta.matched_shots.length} similar past shots`}
+          </p>
+        )}
         <p className="whitespace-pre-line">{response}</p>
         <Button onClick={() => {
           setResponse(null)
+          setMeta(null)
           setStep(0)
           setAnswers({ user_id: '1' })
+          session.current = null
         }}>
           Start Over
         </Button>
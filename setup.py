@@ -11,6 +11,7 @@ setup(
         "questionary",
         "tabulate",
         "python-dotenv",
+        "numpy",
     ],
     entry_points={
         "console_scripts": [
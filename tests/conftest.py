@@ -1,6 +1,16 @@
 import pytest
 from unittest.mock import MagicMock
 
+from agent_caddie.embeddings import embedding_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_embedding_cache():
+    """Keep cached embeddings from leaking between tests."""
+    embedding_cache.clear()
+    yield
+    embedding_cache.clear()
+
 
 @pytest.fixture
 def sample_scenario():
@@ -0,0 +1,614 @@
+import asyncio
+import json
+import httpx
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from fastapi.testclient import TestClient
+from agent_caddie.app import app, response_cache, recommend_pipeline
+from agent_caddie.db import bump_history
+from agent_caddie.llm import LLMTimeout
+from agent_caddie.stats import ClubStatsStore
+from agent_caddie.writebehind import ShotQueue, WriteBehindWorker
+
+
+class FakeStream:
+    """Async iterator standing in for a streamed chat completion."""
+    
+    def __init__(self, tokens):
+        self.tokens = list(tokens)
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        if not self.tokens:
+            raise StopAsyncIteration
+        token = self.tokens.pop(0)
+        return MagicMock(choices=[MagicMock(delta=MagicMock(content=token))])
+
+
+@pytest.fixture
+def shot_payload():
+    """Recommend/record request body as sent by the frontend."""
+    return {
+        "user_id": "user123",
+        "scenario_text": "Approach from the rough",
+        "distance": 150,
+        "lie": "Rough",
+        "ball_pos": "Level",
+        "elevation": 0,
+        "wind_dir": "Headwind",
+        "wind_speed": 10
+    }
+
+
+@pytest.fixture
+def client():
+    """Test client that does not run the startup index load.
+
+    Users have no club distances on file unless a test says otherwise, so
+    recommendations take the LLM path.
+    """
+    response_cache.clear()
+    with patch('agent_caddie.app.aget_club_distances', new_callable=AsyncMock, return_value={}), \
+         patch('agent_caddie.app.club_stats', ClubStatsStore()):
+        yield TestClient(app)
+    response_cache.clear()
+
+
+class TestRecommend:
+    """Test the streamed recommendation endpoint."""
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_recommend_streams_tokens(self, mock_retrieve, mock_client, client, shot_payload):
+        """Test tokens from the async completion are streamed back."""
+        mock_retrieve.return_value = []
+        mock_client.return_value.chat.completions.create = AsyncMock(
+            return_value=FakeStream(["7-", "Iron"])
+        )
+        
+        response = client.post("/api/caddie/recommend", json=shot_payload)
+        
+        assert response.status_code == 200
+        assert response.text == "7-Iron"
+        scn = mock_retrieve.call_args[0][0]
+        assert scn["effective_dist"] == 163
+        assert scn["scenario_key"] == "150y, lie=Rough, ball_pos=Level, wind=10mph Headwind, elev=+0ft"
+
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_slow_retrieval_degrades_instead_of_failing(self, mock_retrieve, mock_client, client, shot_payload):
+        """Test a retrieval past its timeout still answers, without history."""
+        async def slow_retrieval(*args, **kwargs):
+            await asyncio.sleep(1.0)
+            return [{"recommended_club": "9-Iron"}]
+        
+        mock_retrieve.side_effect = slow_retrieval
+        create = AsyncMock(return_value=FakeStream(["7-Iron"]))
+        mock_client.return_value.chat.completions.create = create
+        
+        with patch.object(recommend_pipeline.stages["retrieval"], "timeout_s", 0.01):
+            response = client.post("/api/caddie/recommend", json=shot_payload)
+        
+        assert response.status_code == 200
+        assert response.text == "7-Iron"
+        assert response.headers["X-Degraded"] == "retrieval"
+        prompt = create.call_args.kwargs["messages"][-1]["content"]
+        assert "9-Iron" not in prompt
+
+
+class TestPrefetch:
+    """Test warming a recommendation before the shot is fully described."""
+    
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_partial_details_only_load_distances(self, mock_retrieve, client):
+        """Test a prefetch without the full scenario skips retrieval."""
+        response = client.post("/api/caddie/prefetch", json={"user_id": "u1", "distance": 150})
+        
+        assert response.status_code == 202
+        body = response.json()
+        assert body["session"]
+        assert sorted(body["started"]) == ["club_distances", "club_stats", "distances"]
+        mock_retrieve.assert_not_awaited()
+    
+    @patch('agent_caddie.app.aget_club_distances', new_callable=AsyncMock, return_value={})
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_recommend_picks_up_prefetched_stages(self, mock_retrieve, mock_client, mock_distances,
+                                                  client, shot_payload):
+        """Test /recommend with the session reuses retrieval and distances."""
+        mock_retrieve.return_value = [{"recommended_club": "7-Iron", "carried": 160, "result": "perfect"}]
+        mock_client.return_value.chat.completions.create = AsyncMock(return_value=FakeStream(["7-Iron"]))
+        
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                partial = {k: v for k, v in shot_payload.items() if k != "wind_speed"}
+                first = (await ac.post("/api/caddie/prefetch", json=partial)).json()
+                second = (await ac.post(
+                    "/api/caddie/prefetch", json={**shot_payload, "session": first["session"]}
+                )).json()
+                response = await ac.post(
+                    f"/api/caddie/recommend?stream=sse&session={second['session']}", json=shot_payload
+                )
+                return first, second, response
+        
+        first, second, response = asyncio.run(run())
+        
+        assert second["session"] == first["session"]
+        assert "retrieval" not in first["started"]
+        assert "retrieval" in second["started"]
+        events = sse_events(response.text)
+        done = dict(events)["done"]
+        assert sorted(done["prefetched"]) == ["club_distances", "club_stats", "distances", "retrieval"]
+        assert dict(events)["meta"]["matched_shots"][0]["recommended_club"] == "7-Iron"
+        mock_retrieve.assert_awaited_once()
+        mock_distances.assert_awaited_once()
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_unknown_session_is_ignored(self, mock_retrieve, mock_client, client, shot_payload):
+        """Test an expired or made-up session just takes the normal path."""
+        mock_retrieve.return_value = []
+        mock_client.return_value.chat.completions.create = AsyncMock(return_value=FakeStream(["7-Iron"]))
+        
+        response = client.post("/api/caddie/recommend?session=nope", json=shot_payload)
+        
+        assert response.status_code == 200
+        assert response.text == "7-Iron"
+        mock_retrieve.assert_awaited_once()
+
+
+class TestRecommendFastPath:
+    """Test answering from stored club distances."""
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aget_club_distances', new_callable=AsyncMock)
+    def test_clear_fit_skips_llm(self, mock_distances, mock_client, client, shot_payload):
+        """Test an effective distance on one club's carry needs no LLM call."""
+        # 150 y into a 10 mph headwind from the rough plays 163 y
+        mock_distances.return_value = {"6-Iron": 175, "7-Iron": 164, "8-Iron": 152}
+        before = client.get("/api/caddie/recommend/stats").json()
+        
+        response = client.post("/api/caddie/recommend", json=shot_payload)
+        
+        assert response.headers["x-recommender"] == "fast-path"
+        assert response.text.startswith("7-Iron.")
+        mock_client.assert_not_called()
+        after = client.get("/api/caddie/recommend/stats").json()
+        assert after["fast_path"] == before["fast_path"] + 1
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    @patch('agent_caddie.app.aget_club_distances', new_callable=AsyncMock)
+    def test_use_llm_or_ambiguous_goes_to_llm(self, mock_distances, mock_retrieve,
+                                              mock_client, client, shot_payload):
+        """Test an explicit request or a between-clubs distance asks the LLM."""
+        mock_distances.return_value = {"7-Iron": 164, "8-Iron": 152}
+        mock_retrieve.return_value = []
+        mock_client.return_value.chat.completions.create = AsyncMock(
+            side_effect=lambda **kw: FakeStream(["7-Iron"])
+        )
+        
+        explicit = client.post("/api/caddie/recommend", json={**shot_payload, "use_llm": True})
+        between = client.post("/api/caddie/recommend", json={**shot_payload, "distance": 145})
+        
+        assert explicit.headers["x-recommender"] == "llm"
+        assert between.headers["x-recommender"] == "llm"
+        assert mock_client.return_value.chat.completions.create.await_count == 2
+
+
+def sse_events(text):
+    """Parse an SSE body into (event, data) pairs."""
+    events = []
+    for frame in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestRecommendSSE:
+    """Test the Server-Sent Events streaming mode."""
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_meta_tokens_and_timings(self, mock_retrieve, mock_client, client, shot_payload):
+        """Test the stream opens with metadata and closes with timings."""
+        mock_retrieve.return_value = [
+            {"recommended_club": "7-Iron", "carried": 160, "result": "too short", "effective_dist": 165}
+        ]
+        mock_client.return_value.chat.completions.create = AsyncMock(
+            return_value=FakeStream(["7-", "Iron"])
+        )
+        
+        response = client.post("/api/caddie/recommend?stream=sse", json=shot_payload)
+        events = sse_events(response.text)
+        
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert events[0][0] == "meta"
+        assert events[0][1]["effective_dist"] == 163
+        assert events[0][1]["matched_shots"][0]["recommended_club"] == "7-Iron"
+        assert "".join(data["text"] for event, data in events if event == "token") == "7-Iron"
+        event, done = events[-1]
+        assert event == "done"
+        assert {"retrieval_ms", "meta_ms", "ttft_ms", "total_ms"} <= set(done["timings"])
+    
+    @patch('agent_caddie.app.aget_club_distances', new_callable=AsyncMock)
+    def test_accept_header_selects_sse(self, mock_distances, client, shot_payload):
+        """Test fast-path answers are framed as SSE when asked via Accept."""
+        mock_distances.return_value = {"6-Iron": 175, "7-Iron": 164, "8-Iron": 152}
+        
+        response = client.post(
+            "/api/caddie/recommend", json=shot_payload, headers={"Accept": "text/event-stream"}
+        )
+        events = sse_events(response.text)
+        
+        assert [event for event, _ in events] == ["meta", "token", "done"]
+        assert events[0][1]["source"] == "fast-path"
+        assert events[1][1]["text"].startswith("7-Iron.")
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_upstream_error_is_an_event(self, mock_retrieve, mock_client, client, shot_payload):
+        """Test a failed completion ends the stream with an error event."""
+        mock_retrieve.return_value = []
+        mock_client.return_value.chat.completions.create = AsyncMock(side_effect=Exception("down"))
+        
+        response = client.post("/api/caddie/recommend?stream=sse", json=shot_payload)
+        events = sse_events(response.text)
+        
+        assert [event for event, _ in events] == ["meta", "error"]
+        assert "down" in events[-1][1]["detail"]
+
+
+class TestMetricsEndpoint:
+    """Test the Prometheus scrape endpoint."""
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_stages_and_counters_exported(self, mock_retrieve, mock_client, client, shot_payload):
+        """Test a recommendation shows up as stage timings and counters."""
+        mock_retrieve.return_value = []
+        mock_client.return_value.chat.completions.create = AsyncMock(
+            return_value=FakeStream(["7-", "Iron"])
+        )
+        client.post("/api/caddie/recommend", json=shot_payload)
+        
+        response = client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        for name in ("effective_distance", "prompt", "llm", "llm_ttft"):
+            assert f'caddie_stage_seconds_count{{stage="{name}"}}' in text
+        assert 'caddie_recommend_seconds_count{source="llm",format="text"}' in text
+        assert 'caddie_recommendations_total{source="llm"}' in text
+        assert 'caddie_cache_misses_total{cache="response"}' in text
+        assert 'caddie_queue_depth{queue="single_flight"} 0' in text
+    
+    def test_sqlite_backed_stats_run_off_the_loop(self, client, tmp_path):
+        """Test /metrics and the queue stats count SQLite rows outside the event loop."""
+        worker = WriteBehindWorker(ShotQueue(str(tmp_path / "queue.sqlite")))
+        on_loop = []
+        
+        def loop_running():
+            try:
+                asyncio.get_running_loop()
+                return True
+            except RuntimeError:
+                return False
+        
+        def depth(count=worker.queue.depth):
+            on_loop.append(loop_running())
+            return count()
+        
+        def stats(queue_stats=worker.queue.stats):
+            on_loop.append(loop_running())
+            return queue_stats()
+        
+        worker.queue.depth = depth
+        worker.queue.stats = stats
+        with patch('agent_caddie.app.write_behind', worker):
+            text = client.get("/metrics").text
+            queue_stats = client.get("/api/caddie/record/queue").json()
+        
+        assert 'caddie_queue_depth{queue="write_behind"} 0' in text
+        assert queue_stats["depth"] == 0
+        assert on_loop == [False, False]
+        worker.queue.close()
+
+
+class TestClubStatsEndpoint:
+    """Test reading per-club statistics."""
+    
+    def test_stats_and_fast_path_use_recorded_carries(self, client, shot_payload):
+        """Test recorded shots show up in stats and override typed distances."""
+        from agent_caddie import app as appmod
+        appmod.club_stats.update_many([
+            {"user_id": "user123", "recommended_club": "6-Iron", "carried": c, "result": "perfect"}
+            for c in [162, 163, 164, 163, 163]
+        ])
+        
+        stats = client.get("/api/caddie/stats/user123").json()
+        response = client.post("/api/caddie/recommend", json=shot_payload)
+        
+        assert stats["clubs"]["6-Iron"]["count"] == 5
+        assert response.headers["x-recommender"] == "fast-path"
+        assert response.text.startswith("6-Iron.")
+
+
+class TestRecommendFallback:
+    """Test the deterministic answer when the LLM misses its first-token deadline."""
+    
+    @staticmethod
+    def stalled_create():
+        async def create(**kwargs):
+            await asyncio.sleep(1.0)
+            return FakeStream(["too late"])
+        return create
+    
+    @patch('agent_caddie.llm.LLM_HEDGE_AFTER_MS', 0)
+    @patch('agent_caddie.llm.LLM_TTFT_TIMEOUT_MS', 20)
+    @patch('agent_caddie.app.aget_club_distances', new_callable=AsyncMock)
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_text_falls_back_to_nearest_club(self, mock_retrieve, mock_client, mock_distances,
+                                             client, shot_payload):
+        """Test a stalled model yields the nearest club, uncached."""
+        mock_retrieve.return_value = []
+        mock_distances.return_value = {"6-Iron": 170, "7-Iron": 160}
+        mock_client.return_value.chat.completions.create = self.stalled_create()
+        
+        response = client.post("/api/caddie/recommend", json={**shot_payload, "use_llm": True})
+        
+        assert response.status_code == 200
+        assert response.headers["X-Recommender"] == "fallback"
+        assert response.text.startswith("7-Iron.")
+        assert len(response_cache) == 0
+    
+    @patch('agent_caddie.llm.LLM_HEDGE_AFTER_MS', 0)
+    @patch('agent_caddie.llm.LLM_TTFT_TIMEOUT_MS', 20)
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_sse_falls_back_to_past_shots(self, mock_retrieve, mock_client, client, shot_payload):
+        """Test the SSE answer uses retrieved history and is marked as a fallback."""
+        mock_retrieve.return_value = [{"recommended_club": "6-Iron", "carried": 162, "result": "perfect"}]
+        mock_client.return_value.chat.completions.create = self.stalled_create()
+        
+        response = client.post("/api/caddie/recommend?stream=sse", json=shot_payload)
+        
+        events = sse_events(response.text)
+        assert [name for name, _ in events] == ["meta", "token", "done"]
+        assert events[1][1]["text"].startswith("6-Iron.")
+        assert events[2][1]["source"] == "fallback"
+    
+
+class TestRecommendCache:
+    """Test replaying cached recommendations."""
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_repeat_question_replays_cache(self, mock_retrieve, mock_client, client, shot_payload):
+        """Test an identical request replays tokens without retrieval or LLM."""
+        mock_retrieve.return_value = []
+        mock_create = AsyncMock(side_effect=lambda **kw: FakeStream(["7-", "Iron"]))
+        mock_client.return_value.chat.completions.create = mock_create
+        
+        first = client.post("/api/caddie/recommend", json=shot_payload)
+        second = client.post("/api/caddie/recommend", json={**shot_payload, "distance": 151})
+        
+        assert first.headers["x-cache"] == "miss"
+        assert second.headers["x-cache"] == "hit"
+        assert second.text == "7-Iron"
+        assert mock_create.await_count == 1
+        assert mock_retrieve.await_count == 1
+        assert client.get("/api/caddie/recommend/cache").json()["hits"] == 1
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_new_history_invalidates(self, mock_retrieve, mock_client, client, shot_payload):
+        """Test a saved shot for the user forces a fresh answer."""
+        mock_retrieve.return_value = []
+        mock_create = AsyncMock(side_effect=lambda **kw: FakeStream(["8-Iron"]))
+        mock_client.return_value.chat.completions.create = mock_create
+        
+        client.post("/api/caddie/recommend", json=shot_payload)
+        bump_history(["user123"])
+        response = client.post("/api/caddie/recommend", json=shot_payload)
+        other_user = client.post("/api/caddie/recommend", json={**shot_payload, "user_id": "u2"})
+        
+        assert response.headers["x-cache"] == "miss"
+        assert other_user.headers["x-cache"] == "miss"
+        assert mock_create.await_count == 3
+
+
+class TestRecommendSingleFlight:
+    """Test concurrent identical recommendations share one completion."""
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.aretrieve_similar_shots', new_callable=AsyncMock)
+    def test_group_shares_one_completion(self, mock_retrieve, mock_client, client, shot_payload):
+        """Test golfers asking the same question at once cost one LLM call."""
+        class SlowStream(FakeStream):
+            async def __anext__(self):
+                await asyncio.sleep(0.01)
+                return await super().__anext__()
+        
+        mock_retrieve.return_value = []
+        mock_create = AsyncMock(side_effect=lambda **kw: SlowStream(["7-", "Iron"]))
+        mock_client.return_value.chat.completions.create = mock_create
+        
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                return await asyncio.gather(*(
+                    ac.post("/api/caddie/recommend", json={**shot_payload, "user_id": f"u{i}"})
+                    for i in range(3)
+                ))
+        
+        responses = asyncio.run(run())
+        
+        assert [r.text for r in responses] == ["7-Iron"] * 3
+        assert mock_create.await_count == 1
+        assert mock_retrieve.await_count == 1
+        stats = client.get("/api/caddie/recommend/cache").json()["single_flight"]
+        assert stats["followers"] >= 2
+
+
+class TestRecommendBatch:
+    """Test the batched recommendation endpoint."""
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    @patch('agent_caddie.app.asearch_shots', new_callable=AsyncMock)
+    @patch('agent_caddie.app.aget_embeddings', new_callable=AsyncMock)
+    @patch('agent_caddie.app.aget_club_distances', new_callable=AsyncMock)
+    def test_batch_mixes_fast_path_and_llm(self, mock_distances, mock_embed, mock_search,
+                                           mock_client, client, shot_payload):
+        """Test shared lookups, one embedding call and bounded fan-out."""
+        mock_distances.return_value = {"7-Iron": 164, "8-Iron": 152}
+        mock_embed.side_effect = lambda keys: [[float(i)] for i in range(len(keys))]
+        mock_search.return_value = []
+        running = {"now": 0, "max": 0}
+        
+        async def create(**kw):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            return FakeStream([kw["messages"][1]["content"].split(" y")[0].split()[-1]])
+        
+        mock_client.return_value.chat.completions.create = create
+        shots = [
+            shot_payload,                      # plays 163 y: fast path
+            {**shot_payload, "distance": 100},
+            {**shot_payload, "distance": 110},
+            {**shot_payload, "distance": 120},
+            {**shot_payload, "distance": 100},  # same question as index 1
+        ]
+        
+        response = client.post("/api/caddie/recommend/batch?concurrency=2", json=shots)
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        
+        assert response.status_code == 200
+        assert lines[0] == {"index": 0, "source": "fast-path", "text": lines[0]["text"]}
+        assert sorted(line["index"] for line in lines) == [0, 1, 2, 3, 4]
+        by_index = {line["index"]: line for line in lines}
+        assert by_index[2]["text"] == "123.0"  # each answer echoes its own prompt
+        mock_distances.assert_awaited_once_with("user123")
+        mock_embed.assert_awaited_once()
+        assert len(mock_embed.call_args[0][0]) == 3
+        assert running["max"] <= 2
+    
+    @patch('agent_caddie.app.stream_chat')
+    @patch('agent_caddie.app.asearch_shots', new_callable=AsyncMock)
+    @patch('agent_caddie.app.aget_embeddings', new_callable=AsyncMock)
+    @patch('agent_caddie.app.aget_club_distances', new_callable=AsyncMock)
+    def test_timed_out_shot_falls_back_on_its_bag(self, mock_distances, mock_embed, mock_search,
+                                                  mock_stream, client, shot_payload):
+        """Test an LLM shot that times out is answered from its distances and past shots."""
+        mock_distances.side_effect = lambda user: {"7-Iron": 164} if user == "user123" else {}
+        mock_embed.side_effect = lambda keys: [[0.1]] * len(keys)
+        mock_search.return_value = [{"recommended_club": "8-Iron", "carried": 158, "result": "too short"}]
+        
+        async def timeout(messages):
+            raise LLMTimeout("ttft")
+            yield
+        
+        mock_stream.side_effect = timeout
+        
+        response = client.post("/api/caddie/recommend/batch", json=[
+            {**shot_payload, "use_llm": True},
+            {**shot_payload, "use_llm": True, "user_id": "user456"},
+        ])
+        by_index = {line["index"]: line for line in map(json.loads, response.text.splitlines())}
+        
+        assert {line["source"] for line in by_index.values()} == {"fallback"}
+        assert by_index[0]["text"].startswith("7-Iron")  # from the bag on file
+        assert by_index[1]["text"].startswith("8-Iron")  # from the retrieved shot
+        assert mock_distances.await_count == 2
+    
+    def test_batch_size_limit(self, client, shot_payload):
+        """Test oversized batches are rejected up front."""
+        with patch('agent_caddie.app.RECOMMEND_BATCH_MAX', 2):
+            response = client.post("/api/caddie/recommend/batch", json=[shot_payload] * 3)
+        
+        assert response.status_code == 413
+
+
+class TestImportEndpoint:
+    """Test the bulk import endpoint."""
+    
+    @patch('agent_caddie.importer.insert_shots')
+    @patch('agent_caddie.importer.get_embeddings')
+    def test_import_streams_progress(self, mock_embed, mock_insert, client):
+        """Test NDJSON progress events end with a done summary."""
+        mock_embed.side_effect = lambda texts: [[0.1]] * len(texts)
+        body = "".join(
+            json.dumps({"distance": 150 + i, "lie": "Fairway", "carry": 150}) + "\n"
+            for i in range(5)
+        )
+        
+        response = client.post(
+            "/api/caddie/import?fmt=jsonl&user_id=user123&chunk_size=2", content=body
+        )
+        events = [json.loads(line) for line in response.text.splitlines()]
+        
+        assert response.status_code == 200
+        assert [e["event"] for e in events] == ["progress"] * 3 + ["done"]
+        assert events[-1]["inserted"] == 5
+        assert mock_insert.call_count == 3
+    
+    def test_import_rejects_bad_import_id(self, client):
+        """Test import ids cannot escape the checkpoint directory."""
+        response = client.post("/api/caddie/import?import_id=../etc", content="")
+        assert response.status_code == 422
+
+
+class TestRecordEndpoint:
+    """Test recording shot outcomes."""
+    
+    @patch('agent_caddie.app.asave_shot', new_callable=AsyncMock)
+    def test_record_without_queue_saves_directly(self, mock_save, client, shot_payload):
+        """Test outcome fields are derived and the shot saved inline."""
+        response = client.post("/api/caddie/record", json={
+            **shot_payload, "recommended_club": "7-Iron", "carried": 158
+        })
+        
+        assert response.status_code == 200
+        saved = mock_save.call_args[0][0]
+        assert saved["effective_dist"] == 163
+        assert saved["error"] == 8
+        assert saved["result"] == "too long"
+    
+    @patch('agent_caddie.app.asave_shot', new_callable=AsyncMock)
+    def test_record_with_write_behind_enqueues(self, mock_save, client, shot_payload, tmp_path):
+        """Test the write-behind path queues the shot and returns 202."""
+        worker = WriteBehindWorker(ShotQueue(str(tmp_path / "queue.sqlite")))
+        with patch('agent_caddie.app.write_behind', worker):
+            response = client.post("/api/caddie/record", json={
+                **shot_payload, "recommended_club": "7-Iron", "carried": 150
+            })
+            queue_stats = client.get("/api/caddie/record/queue").json()
+        
+        assert response.status_code == 202
+        assert response.json() == {"success": True, "queued": True}
+        mock_save.assert_not_awaited()
+        assert queue_stats["depth"] == 1
+        worker.queue.close()
+    
+    @patch('agent_caddie.db.storage')
+    def test_mis_hit_with_write_behind_is_not_queued(self, mock_storage, client, shot_payload, tmp_path):
+        """Test a Mis-hit gets the synchronous response and nothing is queued."""
+        worker = WriteBehindWorker(ShotQueue(str(tmp_path / "queue.sqlite")))
+        with patch('agent_caddie.app.write_behind', worker):
+            response = client.post("/api/caddie/record", json={
+                **shot_payload, "recommended_club": "7-Iron", "carried": 90, "cause": "Mis-hit"
+            })
+        
+        assert response.status_code == 200
+        assert response.json() == {"success": True}
+        assert worker.queue.depth() == 0
+        mock_storage.insert_shots.assert_not_called()
+        worker.queue.close()
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import random
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from agent_caddie.bench import drive, request_for, summarize
+from agent_caddie.fakes import fake_app
+
+
+class TestSummarize:
+    """Test latency percentiles."""
+    
+    def test_percentiles(self):
+        """Test p50/p95/p99 over a known distribution."""
+        stats = summarize(list(range(1, 101)))
+        
+        assert stats["p50"] == 50.5
+        assert stats["p99"] == 99.01
+        assert stats["max"] == 100
+    
+    def test_empty(self):
+        """Test an endpoint with no successes reports zeros."""
+        assert summarize([]) == {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+
+
+class TestRequestFor:
+    """Test generated request bodies."""
+    
+    def test_bodies_match_the_api(self):
+        """Test each endpoint gets the body shape the API expects."""
+        rng = random.Random(0)
+        
+        path, body = request_for("recommend", rng, 3, users=2, use_llm=True)
+        assert path == "/api/caddie/recommend"
+        assert body["user_id"] == "bench-1" and body["use_llm"] is True
+        
+        path, body = request_for("record", rng, 0, users=2, use_llm=True)
+        assert path == "/api/caddie/record" and "carried" in body
+        
+        path, body = request_for("update-yardages", rng, 0, users=2, use_llm=True)
+        assert path == "/api/caddie/update-yardages" and body[0]["club"] == "7-Iron"
+
+
+class TestFakes:
+    """Test the OpenAI and PostgREST stand-ins."""
+    
+    def test_chat_streams_chunks(self):
+        """Test the fake chat endpoint streams OpenAI-shaped SSE chunks."""
+        client = TestClient(fake_app(llm_ttft_ms=0, tokens_per_s=10_000, answer_tokens=3))
+        
+        response = client.post("/v1/chat/completions", json={"model": "m", "stream": True, "messages": []})
+        
+        data = [line[6:] for line in response.text.splitlines() if line.startswith("data: ")]
+        assert data[-1] == "[DONE]"
+        tokens = [json.loads(d)["choices"][0]["delta"].get("content") for d in data[:-1]]
+        assert "".join(t for t in tokens if t) == "7-Iron. It plays"
+    
+    def test_embeddings_are_deterministic(self):
+        """Test the same text always embeds to the same vector."""
+        client = TestClient(fake_app(embed_ms=0, dim=8))
+        
+        first = client.post("/v1/embeddings", json={"input": ["a", "b"]}).json()
+        second = client.post("/v1/embeddings", json={"input": "a"}).json()
+        
+        assert len(first["data"]) == 2
+        assert first["data"][0]["embedding"] == second["data"][0]["embedding"]
+    
+    def test_postgrest_routes(self):
+        """Test match_shots, inserts and paged selects."""
+        client = TestClient(fake_app(db_ms=0))
+        
+        matches = client.post("/rest/v1/rpc/match_shots", json={"query_embedding": [0.1], "match_count": 5})
+        inserted = client.post("/rest/v1/shots", json=[{"user_id": "u", "embedding": [1.0]}])
+        page = client.get("/rest/v1/shots", params={"select": "*", "offset": 0, "limit": 10})
+        bag = client.get("/rest/v1/club_distances", params={"user_id": "eq.u"})
+        
+        assert len(matches.json()) == 5
+        assert inserted.status_code == 201 and inserted.json()[0]["id"] == 1
+        assert page.json() == [{"id": 1, "user_id": "u"}]
+        assert {"club": "7-Iron", "distance": 160} in bag.json()
+
+
+class TestDrive:
+    """Test the load driver."""
+    
+    def test_counts_latency_ttft_and_errors(self):
+        """Test successes are timed and failures counted per status."""
+        app = FastAPI()
+        
+        @app.post("/api/caddie/recommend")
+        async def recommend(body: dict):
+            if body["distance"] > 200:
+                raise HTTPException(status_code=500)
+            return "7-Iron"
+        
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await drive(client, "http://test", "recommend", requests=20, concurrency=4)
+        
+        result = asyncio.run(run())
+        
+        assert sum(result["statuses"].values()) == 20
+        assert result["statuses"].get("500", 0) > 0
+        assert result["errors"] == result["statuses"]["500"]
+        assert result["ttft_ms"]["p50"] > 0
+        assert result["throughput_rps"] > 0
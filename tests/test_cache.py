@@ -0,0 +1,158 @@
+import asyncio
+import threading
+from unittest.mock import patch, MagicMock
+from agent_caddie.cache import LRUCache, TTLCache, EmbeddingStore, EmbeddingCache, normalize_text
+from agent_caddie.embeddings import get_embedding, embedding_cache
+
+
+class TestLRUCache:
+    """Test the bounded in-memory LRU."""
+    
+    def test_get_put_counts_hits_and_misses(self):
+        """Test lookups update the hit/miss counters."""
+        cache = LRUCache(maxsize=2)
+        assert cache.get("a") is None
+        cache.put("a", 1)
+        assert cache.get("a") == 1
+        
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+    
+    def test_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is evicted first."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+
+
+class TestEmbeddingCache:
+    """Test the two-tier embedding cache."""
+    
+    def test_normalize_text(self):
+        """Test whitespace and case differences share a key."""
+        assert normalize_text("  150y,  lie=Rough ") == normalize_text("150Y, LIE=rough")
+    
+    def test_persistent_store_survives_new_cache(self, tmp_path):
+        """Test entries written to disk are visible to a fresh cache."""
+        path = str(tmp_path / "emb.sqlite")
+        EmbeddingCache(maxsize=4, path=path).put("m", "150y", [0.1, 0.2])
+        
+        fresh = EmbeddingCache(maxsize=4, path=path)
+        assert fresh.get("m", "150Y") == [0.1, 0.2]
+        assert fresh.disk_hits == 1
+        # promoted into memory on the first disk hit
+        assert fresh.get("m", "150y") == [0.1, 0.2]
+        assert fresh.memory.hits == 1
+    
+    def test_keys_include_model(self, tmp_path):
+        """Test the same text under another model is a miss."""
+        cache = EmbeddingCache(maxsize=4, path=str(tmp_path / "emb.sqlite"))
+        cache.put("model-a", "150y", [1.0])
+        assert cache.get("model-b", "150y") is None
+    
+    def test_prefill(self, tmp_path):
+        """Test bulk prefill from stored shot rows."""
+        store_path = str(tmp_path / "emb.sqlite")
+        cache = EmbeddingCache(maxsize=4, path=store_path)
+        loaded = cache.prefill("m", [("150y", [0.1]), ("200y", [0.2])])
+        
+        assert loaded == 2
+        assert len(EmbeddingStore(store_path)) == 2
+        assert cache.get("m", "200y") == [0.2]
+
+    def test_async_disk_tier_runs_in_a_worker_thread(self, tmp_path):
+        """Test aget_many/aput_many touch SQLite off the event loop thread."""
+        path = str(tmp_path / "emb.sqlite")
+        cache = EmbeddingCache(maxsize=4, path=path)
+        threads = []
+        
+        def recorded(method):
+            def call(*args):
+                threads.append(threading.get_ident())
+                return method(*args)
+            return call
+        
+        cache.store.get_many = recorded(cache.store.get_many)
+        cache.store.put_many = recorded(cache.store.put_many)
+        
+        async def run():
+            await cache.aput_many("m", [("150y", [0.1]), ("200Y", [0.2])])
+            cache.memory.clear()
+            return await cache.aget_many("m", ["150Y", "200y", "250y"]), threading.get_ident()
+        
+        vectors, loop_thread = asyncio.run(run())
+        
+        assert vectors == [[0.1], [0.2], None]
+        assert cache.disk_hits == 2
+        assert len(threads) == 2 and loop_thread not in threads
+        assert asyncio.run(cache.aget("m", "150y")) == [0.1]
+        assert cache.memory.hits == 1
+
+
+class TestTTLCache:
+    """Test expiry on top of LRU eviction."""
+    
+    def test_entries_expire(self):
+        """Test an entry is a miss once its TTL has passed."""
+        now = [0.0]
+        cache = TTLCache(maxsize=2, ttl_s=10, clock=lambda: now[0])
+        cache.put("a", ["7-Iron"])
+        
+        now[0] = 9.9
+        assert cache.get("a") == ["7-Iron"]
+        now[0] = 10.0
+        assert cache.get("a") is None
+        assert cache.stats() == {
+            "size": 0, "maxsize": 2, "hits": 1, "misses": 1,
+            "hit_rate": 0.5, "ttl_s": 10, "expired": 1,
+        }
+    
+    def test_contains_respects_expiry_without_counting(self):
+        """Test membership checks skip expired entries and leave stats alone."""
+        now = [0.0]
+        cache = TTLCache(maxsize=2, ttl_s=10, clock=lambda: now[0])
+        cache.put("a", ["7-Iron"])
+        
+        assert "a" in cache
+        now[0] = 10.0
+        assert "a" not in cache
+        assert cache.stats()["hits"] == 0
+        assert cache.stats()["misses"] == 0
+    
+    def test_size_bound(self):
+        """Test the least recently used entry is evicted."""
+        cache = TTLCache(maxsize=2, ttl_s=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+
+
+class TestCachedGetEmbedding:
+    """Test get_embedding consults the cache before the API."""
+    
+    @patch('agent_caddie.embeddings.openai_client')
+    def test_repeat_scenario_skips_api(self, mock_openai):
+        """Test a repeated scenario only calls OpenAI once."""
+        mock_response = MagicMock()
+        mock_response.data = [MagicMock(embedding=[0.1, 0.2, 0.3])]
+        mock_openai.return_value.embeddings.create.return_value = mock_response
+        
+        first = get_embedding("150y, lie=Rough")
+        second = get_embedding("150y,  lie=Rough")
+        
+        assert first == second == [0.1, 0.2, 0.3]
+        mock_openai.return_value.embeddings.create.assert_called_once()
+        assert embedding_cache.stats()["hits"] == 1
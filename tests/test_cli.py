@@ -128,7 +128,7 @@ class TestCLIShot:
     @patch('agent_caddie.cli.build_prompt')
     @patch('agent_caddie.cli.ask_shot_details')
     @patch('agent_caddie.cli.compute_effective_distance')
-    @patch('agent_caddie.cli.openai')
+    @patch('agent_caddie.cli.openai_client')
     def test_shot_command_success(self, mock_openai, mock_compute, mock_ask, 
                                  mock_build, mock_get_similar, mock_save, mock_record):
         """Test successful shot recommendation."""
@@ -164,7 +164,7 @@ class TestCLIShot:
         # Mock OpenAI response
         mock_response = MagicMock()
         mock_response.choices = [MagicMock(message=MagicMock(content="7-Iron"))]
-        mock_openai.chat.completions.create.return_value = mock_response
+        mock_openai.return_value.chat.completions.create.return_value = mock_response
         
         # Mock shot result recording
         mock_result = {
@@ -184,9 +184,11 @@ class TestCLIShot:
         # Verify all functions were called correctly
         mock_ask.assert_called_once()
         mock_compute.assert_called_once_with(mock_scenario)
-        mock_get_similar.assert_called_once_with(mock_scenario["scenario_text"])
+        mock_get_similar.assert_called_once_with(
+            "150y, lie=Rough, ball_pos=Above feet, wind=10mph Headwind, elev=Uphill"
+        )
         mock_build.assert_called_once_with(mock_scenario, mock_past_shots)
-        mock_openai.chat.completions.create.assert_called_once_with(
+        mock_openai.return_value.chat.completions.create.assert_called_once_with(
             model="gpt-3.5-turbo",
             messages=mock_prompt
         )
@@ -207,7 +209,7 @@ class TestCLIShot:
     @patch('agent_caddie.cli.build_prompt')
     @patch('agent_caddie.cli.ask_shot_details')
     @patch('agent_caddie.cli.compute_effective_distance')
-    @patch('agent_caddie.cli.openai')
+    @patch('agent_caddie.cli.openai_client')
     def test_shot_command_no_recommendation(self, mock_openai, mock_compute, mock_ask,
                                            mock_build, mock_get_similar, mock_save, mock_record):
         """Test shot command when no recommendation is returned."""
@@ -228,7 +230,7 @@ class TestCLIShot:
         # Mock OpenAI response with no content
         mock_response = MagicMock()
         mock_response.choices = []
-        mock_openai.chat.completions.create.return_value = mock_response
+        mock_openai.return_value.chat.completions.create.return_value = mock_response
         
         mock_result = {"carried": 150, "error": 0, "result": "perfect", "cause": None}
         mock_record.return_value = mock_result
@@ -244,7 +246,7 @@ class TestCLIShot:
     @patch('agent_caddie.cli.build_prompt')
     @patch('agent_caddie.cli.ask_shot_details')
     @patch('agent_caddie.cli.compute_effective_distance')
-    @patch('agent_caddie.cli.openai')
+    @patch('agent_caddie.cli.openai_client')
     def test_shot_command_empty_response(self, mock_openai, mock_compute, mock_ask,
                                        mock_build, mock_get_similar, mock_save, mock_record):
         """Test shot command with empty OpenAI response."""
@@ -265,7 +267,7 @@ class TestCLIShot:
         # Mock OpenAI response with empty content
         mock_response = MagicMock()
         mock_response.choices = [MagicMock(message=MagicMock(content=""))]
-        mock_openai.chat.completions.create.return_value = mock_response
+        mock_openai.return_value.chat.completions.create.return_value = mock_response
         
         mock_result = {"carried": 150, "error": 0, "result": "perfect", "cause": None}
         mock_record.return_value = mock_result
@@ -313,4 +315,23 @@ class TestCLIGeneral:
         
         assert result.exit_code == 0
         assert "Get a club recommendation" in result.output
-        assert "--user-id" in result.output 
\ No newline at end of file
+        assert "--user-id" in result.output 
+
+class TestCLIImport:
+    """Test the bulk import command."""
+    
+    @patch('agent_caddie.importer.insert_shots')
+    @patch('agent_caddie.importer.get_embeddings')
+    def test_import_command_reports_rate(self, mock_embed, mock_insert, tmp_path):
+        """Test a CSV import inserts every row and reports throughput."""
+        mock_embed.side_effect = lambda texts: [[0.1]] * len(texts)
+        path = tmp_path / "export.csv"
+        path.write_text("distance,lie,carry\n150,Fairway,148\n120,Rough,125\n")
+        runner = CliRunner()
+        
+        result = runner.invoke(cli, ['import', str(path), '--user-id', 'user123'])
+        
+        assert result.exit_code == 0
+        assert "Imported 2 shots" in result.output
+        assert "rows/s" in result.output
+        assert not (tmp_path / "export.csv.checkpoint").exists()
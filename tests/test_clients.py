@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch
+from agent_caddie import clients
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    """Start every test with no clients built and dummy credentials."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("SUPABASE_URL", "https://test.supabase.co")
+    monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", "test")
+    asyncio.run(clients.aclose_clients())
+    yield
+    asyncio.run(clients.aclose_clients())
+
+
+class TestClientRegistry:
+    """Test lazy, shared client construction."""
+    
+    def test_nothing_built_until_first_use(self):
+        """Test importing the package does not build any client."""
+        assert clients.built_clients() == []
+        
+        first = clients.openai_client()
+        
+        assert clients.openai_client() is first
+        assert clients.built_clients() == ["openai"]
+    
+    def test_concurrent_first_use_builds_once(self):
+        """Test racing threads all get the same single client."""
+        seen = []
+        with patch('agent_caddie.clients._build_openai', wraps=clients._build_openai) as build:
+            threads = [
+                threading.Thread(target=lambda: seen.append(clients.openai_client()))
+                for _ in range(8)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        
+        assert build.call_count == 1
+        assert all(c is seen[0] for c in seen)
+    
+    def test_pool_limits_from_settings(self):
+        """Test the shared pool is built with the configured timeouts."""
+        with patch.object(clients, 'HTTP_CONNECT_TIMEOUT', 2.5):
+            client = clients.openai_client()
+        
+        assert client._client.timeout.connect == 2.5
+    
+    def test_supabase_requires_env(self, monkeypatch):
+        """Test a missing Supabase setting fails on use, not on import."""
+        monkeypatch.delenv("SUPABASE_URL", raising=False)
+        
+        with pytest.raises(RuntimeError, match="SUPABASE_URL"):
+            clients.supabase_client()
+    
+    def test_async_client_per_event_loop(self):
+        """Test one async client is shared within a loop but not across loops."""
+        async def grab():
+            return clients.async_openai_client(), clients.async_openai_client()
+        
+        a1, a2 = asyncio.run(grab())
+        b1, _ = asyncio.run(grab())
+        
+        assert a1 is a2
+        assert a1 is not b1
+    
+    def test_aclose_clients_rebuilds_on_demand(self):
+        """Test closed clients are replaced on the next call."""
+        first = clients.openai_client()
+        
+        asyncio.run(clients.aclose_clients())
+        
+        assert first._client.is_closed
+        assert clients.openai_client() is not first
@@ -1,19 +1,32 @@
+import asyncio
+import threading
+import time
+import numpy as np
 import pytest
-from unittest.mock import patch, MagicMock
-from agent_caddie.db import save_club_distances, save_shot, get_similar_shots
+from unittest.mock import patch, MagicMock, AsyncMock
+from agent_caddie.db import (
+    save_club_distances, save_shot, get_similar_shots,
+    aget_similar_shots, asave_shot, prefill_embedding_cache, load_shot_index,
+    retrieve_similar_shots, history_version, insert_shots, get_club_distances,
+    rebuild_club_stats, aget_similar_shots_by_features
+)
+from agent_caddie.stats import ClubStatsStore
+from agent_caddie.storage import SQLiteStorage
+from agent_caddie.index import VectorIndex
+from agent_caddie.features import FeatureIndex
 
 
 class TestSaveClubDistances:
     """Test club distances saving functionality."""
     
-    @patch('agent_caddie.db.supabase')
+    @patch('agent_caddie.db.supabase_client')
     def test_save_club_distances_single_entry(self, mock_supabase):
         """Test saving a single club distance entry."""
         mock_table = MagicMock()
         mock_upsert = MagicMock()
         mock_execute = MagicMock()
         
-        mock_supabase.table.return_value = mock_table
+        mock_supabase.return_value.table.return_value = mock_table
         mock_table.upsert.return_value = mock_upsert
         mock_upsert.execute.return_value = mock_execute
         
@@ -25,18 +38,18 @@ class TestSaveClubDistances:
         
         save_club_distances(entries)
         
-        mock_supabase.table.assert_called_once_with("club_distances")
+        mock_supabase.return_value.table.assert_called_once_with("club_distances")
         mock_table.upsert.assert_called_once_with(entries, on_conflict="user_id,club")
         mock_upsert.execute.assert_called_once()
     
-    @patch('agent_caddie.db.supabase')
+    @patch('agent_caddie.db.supabase_client')
     def test_save_club_distances_multiple_entries(self, mock_supabase):
         """Test saving multiple club distance entries."""
         mock_table = MagicMock()
         mock_upsert = MagicMock()
         mock_execute = MagicMock()
         
-        mock_supabase.table.return_value = mock_table
+        mock_supabase.return_value.table.return_value = mock_table
         mock_table.upsert.return_value = mock_upsert
         mock_upsert.execute.return_value = mock_execute
         
@@ -48,24 +61,24 @@ class TestSaveClubDistances:
         
         save_club_distances(entries)
         
-        mock_supabase.table.assert_called_once_with("club_distances")
+        mock_supabase.return_value.table.assert_called_once_with("club_distances")
         mock_table.upsert.assert_called_once_with(entries, on_conflict="user_id,club")
         mock_upsert.execute.assert_called_once()
     
-    @patch('agent_caddie.db.supabase')
+    @patch('agent_caddie.db.supabase_client')
     def test_save_club_distances_empty_list(self, mock_supabase):
         """Test saving empty list of club distances."""
         mock_table = MagicMock()
         mock_upsert = MagicMock()
         mock_execute = MagicMock()
         
-        mock_supabase.table.return_value = mock_table
+        mock_supabase.return_value.table.return_value = mock_table
         mock_table.upsert.return_value = mock_upsert
         mock_upsert.execute.return_value = mock_execute
         
         save_club_distances([])
         
-        mock_supabase.table.assert_called_once_with("club_distances")
+        mock_supabase.return_value.table.assert_called_once_with("club_distances")
         mock_table.upsert.assert_called_once_with([], on_conflict="user_id,club")
         mock_upsert.execute.assert_called_once()
 
@@ -74,7 +87,7 @@ class TestSaveShot:
     """Test shot saving functionality."""
     
     @patch('agent_caddie.db.get_embedding')
-    @patch('agent_caddie.db.supabase')
+    @patch('agent_caddie.db.supabase_client')
     def test_save_shot_normal_shot(self, mock_supabase, mock_get_embedding):
         """Test saving a normal shot (not mis-hit)."""
         mock_table = MagicMock()
@@ -82,7 +95,7 @@ class TestSaveShot:
         mock_execute = MagicMock()
         mock_embedding = [0.1, 0.2, 0.3, 0.4, 0.5]
         
-        mock_supabase.table.return_value = mock_table
+        mock_supabase.return_value.table.return_value = mock_table
         mock_table.insert.return_value = mock_insert
         mock_insert.execute.return_value = mock_execute
         mock_get_embedding.return_value = mock_embedding
@@ -109,7 +122,7 @@ class TestSaveShot:
         mock_get_embedding.assert_called_once_with(shot_entry["scenario_text"])
         
         # Verify database insert
-        mock_supabase.table.assert_called_once_with("shots")
+        mock_supabase.return_value.table.assert_called_once_with("shots")
         mock_table.insert.assert_called_once()
         
         # Verify the insert call arguments
@@ -131,7 +144,7 @@ class TestSaveShot:
         assert insert_call_args["embedding"] == mock_embedding
     
     @patch('agent_caddie.db.get_embedding')
-    @patch('agent_caddie.db.supabase')
+    @patch('agent_caddie.db.supabase_client')
     def test_save_shot_mis_hit_shot(self, mock_supabase, mock_get_embedding):
         """Test that mis-hit shots are not saved."""
         shot_entry = {
@@ -153,11 +166,11 @@ class TestSaveShot:
         save_shot(shot_entry)
         
         # Verify that no database operations were performed
-        mock_supabase.table.assert_not_called()
+        mock_supabase.return_value.table.assert_not_called()
         mock_get_embedding.assert_not_called()
     
     @patch('agent_caddie.db.get_embedding')
-    @patch('agent_caddie.db.supabase')
+    @patch('agent_caddie.db.supabase_client')
     def test_save_shot_with_cause(self, mock_supabase, mock_get_embedding):
         """Test saving a shot with a cause."""
         mock_table = MagicMock()
@@ -165,7 +178,7 @@ class TestSaveShot:
         mock_execute = MagicMock()
         mock_embedding = [0.5, -0.3, 0.8]
         
-        mock_supabase.table.return_value = mock_table
+        mock_supabase.return_value.table.return_value = mock_table
         mock_table.insert.return_value = mock_insert
         mock_insert.execute.return_value = mock_execute
         mock_get_embedding.return_value = mock_embedding
@@ -198,7 +211,7 @@ class TestGetSimilarShots:
     """Test similar shots retrieval functionality."""
     
     @patch('agent_caddie.db.get_embedding')
-    @patch('agent_caddie.db.supabase')
+    @patch('agent_caddie.db.supabase_client')
     def test_get_similar_shots_success(self, mock_supabase, mock_get_embedding):
         """Test successful retrieval of similar shots."""
         mock_rpc = MagicMock()
@@ -219,7 +232,7 @@ class TestGetSimilarShots:
             }
         ]
         
-        mock_supabase.rpc.return_value = mock_rpc
+        mock_supabase.return_value.rpc.return_value = mock_rpc
         mock_rpc.execute.return_value = MagicMock(data=mock_similar_shots)
         mock_get_embedding.return_value = mock_embedding
         
@@ -230,7 +243,7 @@ class TestGetSimilarShots:
         mock_get_embedding.assert_called_once_with(scenario_text)
         
         # Verify RPC call
-        mock_supabase.rpc.assert_called_once_with(
+        mock_supabase.return_value.rpc.assert_called_once_with(
             "match_shots",
             {"query_embedding": mock_embedding, "match_count": 3}
         )
@@ -240,14 +253,14 @@ class TestGetSimilarShots:
         assert result == mock_similar_shots
     
     @patch('agent_caddie.db.get_embedding')
-    @patch('agent_caddie.db.supabase')
+    @patch('agent_caddie.db.supabase_client')
     def test_get_similar_shots_custom_k(self, mock_supabase, mock_get_embedding):
         """Test retrieval with custom k value."""
         mock_rpc = MagicMock()
         mock_execute = MagicMock()
         mock_embedding = [0.1, 0.2, 0.3]
         
-        mock_supabase.rpc.return_value = mock_rpc
+        mock_supabase.return_value.rpc.return_value = mock_rpc
         mock_rpc.execute.return_value = MagicMock(data=[])
         mock_get_embedding.return_value = mock_embedding
         
@@ -255,7 +268,7 @@ class TestGetSimilarShots:
         result = get_similar_shots(scenario_text, k=5)
         
         # Verify RPC call with custom k
-        mock_supabase.rpc.assert_called_once_with(
+        mock_supabase.return_value.rpc.assert_called_once_with(
             "match_shots",
             {"query_embedding": mock_embedding, "match_count": 5}
         )
@@ -263,14 +276,14 @@ class TestGetSimilarShots:
         assert result == []
     
     @patch('agent_caddie.db.get_embedding')
-    @patch('agent_caddie.db.supabase')
+    @patch('agent_caddie.db.supabase_client')
     def test_get_similar_shots_no_results(self, mock_supabase, mock_get_embedding):
         """Test retrieval when no similar shots are found."""
         mock_rpc = MagicMock()
         mock_execute = MagicMock()
         mock_embedding = [0.1, 0.2, 0.3]
         
-        mock_supabase.rpc.return_value = mock_rpc
+        mock_supabase.return_value.rpc.return_value = mock_rpc
         mock_rpc.execute.return_value = MagicMock(data=None)
         mock_get_embedding.return_value = mock_embedding
         
@@ -280,18 +293,355 @@ class TestGetSimilarShots:
         assert result == []
     
     @patch('agent_caddie.db.get_embedding')
-    @patch('agent_caddie.db.supabase')
+    @patch('agent_caddie.db.supabase_client')
     def test_get_similar_shots_empty_string(self, mock_supabase, mock_get_embedding):
         """Test retrieval with empty scenario text."""
         mock_rpc = MagicMock()
         mock_execute = MagicMock()
         mock_embedding = [0.0, 0.0, 0.0]
         
-        mock_supabase.rpc.return_value = mock_rpc
+        mock_supabase.return_value.rpc.return_value = mock_rpc
         mock_rpc.execute.return_value = MagicMock(data=[])
         mock_get_embedding.return_value = mock_embedding
         
         result = get_similar_shots("")
         
         mock_get_embedding.assert_called_once_with("")
-        assert result == [] 
\ No newline at end of file
+        assert result == [] 
+
+class TestHistoryVersion:
+    """Test the per-user history version used by the response cache."""
+    
+    @patch('agent_caddie.db.supabase_client')
+    def test_writes_bump_version(self, mock_supabase):
+        """Test club and shot writes bump only the affected users."""
+        start_a, start_b = history_version("a"), history_version("b")
+        
+        save_club_distances([{"user_id": "a", "club": "7-Iron", "avg_carry": 150}])
+        insert_shots([{"user_id": "a", "embedding": None}, {"user_id": "b", "embedding": None}])
+        
+        assert history_version("a") == start_a + 2
+        assert history_version("b") == start_b + 1
+    
+    @patch('agent_caddie.db.supabase_client')
+    def test_mis_hit_keeps_version(self, mock_supabase):
+        """Test a skipped mis-hit does not invalidate cached answers."""
+        start = history_version("user123")
+        
+        save_shot({"user_id": "user123", "cause": "Mis-hit"})
+        
+        assert history_version("user123") == start
+
+
+class TestClubDistances:
+    """Test reading back a user's club distances."""
+    
+    @patch('agent_caddie.db.supabase_client')
+    def test_cached_until_saved(self, mock_supabase):
+        """Test distances are fetched once and refetched after a save."""
+        query = mock_supabase.return_value.table.return_value.select.return_value.eq.return_value
+        query.execute.return_value = MagicMock(data=[
+            {"club": "7-Iron", "distance": 160}, {"club": "8-Iron", "distance": "150"}
+        ])
+        
+        first = get_club_distances("cd-user")
+        second = get_club_distances("cd-user")
+        save_club_distances([{"user_id": "cd-user", "club": "7-Iron", "distance": 162}])
+        get_club_distances("cd-user")
+        
+        assert first == second == {"7-Iron": 160.0, "8-Iron": 150.0}
+        assert query.execute.call_count == 2
+
+
+class TestClubStats:
+    """Test club aggregates are kept up to date."""
+    
+    @patch('agent_caddie.db.club_stats', new_callable=ClubStatsStore)
+    @patch('agent_caddie.db.supabase_client')
+    def test_insert_updates_stats(self, mock_supabase, mock_stats):
+        """Test inserted shots are folded into the aggregates."""
+        insert_shots([
+            {"user_id": "a", "recommended_club": "7-Iron", "carried": 150,
+             "result": "perfect", "embedding": None},
+        ])
+        
+        assert mock_stats.club("a", "7-Iron")["count"] == 1
+    
+    @patch('agent_caddie.db.club_stats', new_callable=ClubStatsStore)
+    @patch('agent_caddie.db.supabase_client')
+    def test_rebuild_reads_shots_oldest_first(self, mock_supabase, mock_stats):
+        """Test the rebuild pages through shots ordered by id."""
+        query = mock_supabase.return_value.table.return_value.select.return_value.order.return_value
+        query.range.return_value.execute.return_value = MagicMock(data=[
+            {"user_id": "a", "recommended_club": "7-Iron", "carried": 150, "result": "perfect"},
+            {"user_id": "a", "recommended_club": "7-Iron", "carried": 160, "result": "too long"},
+        ])
+        
+        assert rebuild_club_stats() == 2
+        
+        mock_supabase.return_value.table.return_value.select.return_value.order.assert_called_once_with("id")
+        assert mock_stats.club("a", "7-Iron")["mean_carry"] == 155
+
+
+class TestSQLiteBackend:
+    """Test db functions against the embedded SQLite backend."""
+    
+    @patch('agent_caddie.db.get_embedding')
+    @patch('agent_caddie.db.club_stats', new_callable=ClubStatsStore)
+    @patch('agent_caddie.db.storage', new_callable=SQLiteStorage)
+    def test_save_then_retrieve(self, mock_storage, mock_stats, mock_embed):
+        """Test a saved shot and club distances come back without Supabase."""
+        mock_embed.return_value = [1.0, 0.0, 0.0]
+        save_club_distances([{"user_id": "sqlite-user", "club": "7-Iron", "distance": 150}])
+        save_shot({
+            "user_id": "sqlite-user", "scenario_text": "Approach", "distance": 150,
+            "lie": "Fairway", "ball_pos": "Level", "elevation": 0,
+            "wind_dir": "None", "wind_speed": 0, "effective_dist": 150,
+            "recommended_club": "7-Iron", "carried": 148, "error": -2, "result": "perfect",
+        }, mode="embedding")
+        
+        found = get_similar_shots("Approach", k=1)
+        
+        assert found[0]["user_id"] == "sqlite-user" and found[0]["carried"] == 148
+        assert get_club_distances("sqlite-user") == {"7-Iron": 150.0}
+
+
+class TestAsyncDb:
+    """Test the async database helpers used by the API."""
+    
+    @patch('agent_caddie.db.aget_embedding', new_callable=AsyncMock)
+    @patch('agent_caddie.db.supabase_client')
+    def test_aget_similar_shots(self, mock_supabase, mock_aget_embedding):
+        """Test async retrieval awaits the embedding and runs the RPC."""
+        mock_rpc = MagicMock()
+        mock_supabase.return_value.rpc.return_value = mock_rpc
+        mock_rpc.execute.return_value = MagicMock(data=[{"id": 1}])
+        mock_aget_embedding.return_value = [0.1, 0.2]
+        
+        result = asyncio.run(aget_similar_shots("150y", k=2))
+        
+        mock_aget_embedding.assert_awaited_once_with("150y")
+        mock_supabase.return_value.rpc.assert_called_once_with(
+            "match_shots",
+            {"query_embedding": [0.1, 0.2], "match_count": 2}
+        )
+        assert result == [{"id": 1}]
+    
+    @patch('agent_caddie.db.aget_embedding', new_callable=AsyncMock)
+    @patch('agent_caddie.db.supabase_client')
+    def test_asave_shot_mis_hit(self, mock_supabase, mock_aget_embedding):
+        """Test async save skips mis-hits without any external calls."""
+        asyncio.run(asave_shot({"cause": "Mis-hit"}))
+        
+        mock_supabase.return_value.table.assert_not_called()
+        mock_aget_embedding.assert_not_awaited()
+    
+    @patch('agent_caddie.db._after_insert')
+    @patch('agent_caddie.db.storage')
+    @patch('agent_caddie.db.aget_embedding', new_callable=AsyncMock)
+    def test_asave_shot_indexes_off_the_loop(self, mock_aget_embedding, mock_storage, mock_after,
+                                             sample_scenario, sample_shot_result):
+        """Test the insert and the post-insert step both run in worker threads."""
+        threads = []
+        
+        def insert(rows):
+            threads.append(threading.get_ident())
+            return rows
+        
+        mock_aget_embedding.return_value = [0.1]
+        mock_storage.insert_shots.side_effect = insert
+        mock_after.side_effect = lambda rows, stored: insert(rows)
+        
+        async def run():
+            await asave_shot({**sample_scenario, **sample_shot_result, "user_id": "u1",
+                              "recommended_club": "7-Iron"}, mode="embedding")
+            return threading.get_ident()
+        
+        loop_thread = asyncio.run(run())
+        
+        assert len(threads) == 2 and loop_thread not in threads
+        mock_after.assert_called_once()
+
+
+class TestPrefillEmbeddingCache:
+    """Test seeding the embedding cache from the shots table."""
+    
+    @patch('agent_caddie.db.embedding_cache')
+    @patch('agent_caddie.db.supabase_client')
+    def test_prefill_pages_and_parses_vectors(self, mock_supabase, mock_cache):
+        """Test rows are paged, keyed canonically and vectors parsed."""
+        row = {"lie": "Rough", "ball_pos": "Level", "elevation": "Level",
+               "wind_dir": "None", "wind_speed": 0}
+        mock_select = mock_supabase.return_value.table.return_value.select.return_value
+        mock_select.range.return_value.execute.side_effect = [
+            MagicMock(data=[
+                {**row, "distance": 151, "embedding": "[0.1,0.2]"},
+                {**row, "distance": 200, "embedding": [0.3, 0.4]},
+            ]),
+            MagicMock(data=[{**row, "distance": 90, "embedding": None}]),
+        ]
+        mock_cache.prefill.side_effect = lambda model, pairs: len(pairs)
+        
+        loaded = prefill_embedding_cache(page_size=2)
+        
+        assert loaded == 2
+        assert mock_select.range.call_args_list[0][0] == (0, 1)
+        assert mock_select.range.call_args_list[1][0] == (2, 3)
+        pairs = mock_cache.prefill.call_args[0][1]
+        assert pairs == [
+            ("150y, lie=Rough, ball_pos=Level, wind=calm, elev=Level", [0.1, 0.2]),
+            ("200y, lie=Rough, ball_pos=Level, wind=calm, elev=Level", [0.3, 0.4]),
+        ]
+
+
+class TestLocalShotIndex:
+    """Test retrieval through the in-process shot index."""
+    
+    @patch('agent_caddie.db.shot_index', new_callable=VectorIndex)
+    @patch('agent_caddie.db.supabase_client')
+    def test_load_shot_index(self, mock_supabase, mock_index):
+        """Test stored embeddings are loaded and marked ready."""
+        mock_select = mock_supabase.return_value.table.return_value.select.return_value
+        mock_select.range.return_value.execute.return_value = MagicMock(data=[
+            {"id": 1, "recommended_club": "7-Iron", "embedding": "[1.0,0.0]"},
+            {"id": 2, "recommended_club": "9-Iron", "embedding": "[0.0,1.0]"},
+        ])
+        
+        assert load_shot_index() == 2
+        assert mock_index.loaded
+    
+    @patch('agent_caddie.db.shot_index', new_callable=VectorIndex)
+    @patch('agent_caddie.db.supabase_client')
+    def test_load_empty_shot_index(self, mock_supabase, mock_index):
+        """Test an empty shots table loads an empty, ready index."""
+        mock_select = mock_supabase.return_value.table.return_value.select.return_value
+        mock_select.range.return_value.execute.return_value = MagicMock(data=[])
+        
+        assert load_shot_index() == 0
+        assert mock_index.loaded
+    
+    @patch('agent_caddie.db.shot_index', new_callable=VectorIndex)
+    @patch('agent_caddie.db.storage')
+    def test_load_shot_index_page_by_page(self, mock_storage, mock_index):
+        """Test the index is filled one page at a time rather than from one big buffer."""
+        mock_storage.iter_shots.return_value = iter([
+            {"id": i, "recommended_club": "7-Iron", "embedding": [float(i), 1.0]} for i in range(5)
+        ])
+        
+        with patch.object(mock_index, "add_many", wraps=mock_index.add_many) as add_many:
+            assert load_shot_index(page_size=2) == 5
+        
+        assert [len(c[0][1]) for c in add_many.call_args_list] == [2, 2, 1]
+        assert mock_index.vectors.dtype == np.float32
+        assert [r["id"] for r in mock_index.search([4.0, 1.0], k=5)][0] == 4
+    
+    @patch('agent_caddie.db.get_embedding')
+    @patch('agent_caddie.db.shot_index', new_callable=VectorIndex)
+    @patch('agent_caddie.db.supabase_client')
+    def test_loaded_index_skips_rpc(self, mock_supabase, mock_index, mock_get_embedding):
+        """Test get_similar_shots searches locally once loaded."""
+        mock_index.add_many([[1, 0], [0, 1]], [{"id": 1}, {"id": 2}])
+        mock_index.loaded = True
+        mock_get_embedding.return_value = [0.1, 0.9]
+        
+        result = get_similar_shots("150y", k=1)
+        
+        mock_supabase.return_value.rpc.assert_not_called()
+        assert result[0]["id"] == 2
+    
+    @patch('agent_caddie.db.get_embedding')
+    @patch('agent_caddie.db.shot_index', new_callable=VectorIndex)
+    @patch('agent_caddie.db.supabase_client')
+    def test_save_shot_updates_loaded_index(self, mock_supabase, mock_index,
+                                            mock_get_embedding, sample_scenario,
+                                            sample_shot_result):
+        """Test a saved shot is searchable without reloading."""
+        mock_index.loaded = True
+        mock_get_embedding.return_value = [0.6, 0.8]
+        mock_supabase.return_value.table.return_value.insert.return_value.execute.return_value = (
+            MagicMock(data=[{"id": 42, "recommended_club": "7-Iron"}])
+        )
+        
+        save_shot({**sample_scenario, **sample_shot_result,
+                   "user_id": "user123", "recommended_club": "7-Iron"})
+        
+        assert len(mock_index) == 1
+        assert mock_index.search([0.6, 0.8], k=1)[0]["id"] == 42
+
+
+class TestFeatureRetrieval:
+    """Test the structured-feature retrieval mode."""
+    
+    @patch('agent_caddie.db.get_embedding')
+    @patch('agent_caddie.db.supabase_client')
+    def test_features_mode_save_skips_embedding(self, mock_supabase, mock_get_embedding,
+                                                sample_scenario, sample_shot_result):
+        """Test recording a shot in features mode makes no embedding call."""
+        save_shot({**sample_scenario, **sample_shot_result,
+                   "user_id": "user123", "recommended_club": "7-Iron"}, mode="features")
+        
+        mock_get_embedding.assert_not_called()
+        insert_call_args = mock_supabase.return_value.table.return_value.insert.call_args[0][0]
+        assert insert_call_args["embedding"] is None
+    
+    @patch('agent_caddie.db.get_embedding')
+    @patch('agent_caddie.db.feature_index', new_callable=FeatureIndex)
+    @patch('agent_caddie.db.supabase_client')
+    def test_retrieve_by_features_loads_lazily(self, mock_supabase, mock_index,
+                                               mock_get_embedding, sample_scenario):
+        """Test feature retrieval loads typed rows once and never embeds."""
+        base = {"lie": "Rough", "ball_pos": "Above feet", "elevation": "Uphill",
+                "wind_dir": "Headwind", "wind_speed": 10}
+        mock_select = mock_supabase.return_value.table.return_value.select.return_value
+        mock_select.range.return_value.execute.return_value = MagicMock(data=[
+            {**base, "id": 1, "distance": 150},
+            {**base, "id": 2, "distance": 90},
+            {**base, "id": 3, "distance": None},
+        ])
+        
+        result = retrieve_similar_shots(sample_scenario, k=1, mode="features")
+        
+        assert result[0]["id"] == 1
+        assert len(mock_index) == 2
+        mock_get_embedding.assert_not_called()
+        mock_supabase.return_value.rpc.assert_not_called()
+    
+    @patch('agent_caddie.db.feature_index', new_callable=FeatureIndex)
+    @patch('agent_caddie.db.supabase_client')
+    def test_features_on_empty_table(self, mock_supabase, mock_index, sample_scenario):
+        """Test an empty shots table loads once and finds nothing."""
+        mock_select = mock_supabase.return_value.table.return_value.select.return_value
+        mock_select.range.return_value.execute.return_value = MagicMock(data=[])
+        
+        assert retrieve_similar_shots(sample_scenario, k=3, mode="features") == []
+        assert retrieve_similar_shots(sample_scenario, k=3, mode="features") == []
+        
+        assert mock_index.loaded
+        assert mock_select.range.return_value.execute.call_count == 1
+    
+    @patch('agent_caddie.db.feature_index', new_callable=FeatureIndex)
+    @patch('agent_caddie.db.supabase_client')
+    def test_concurrent_first_requests_load_once(self, mock_supabase, mock_index, sample_scenario):
+        """Test simultaneous first feature lookups share one table scan."""
+        def slow_page():
+            time.sleep(0.05)
+            return MagicMock(data=[{"id": 1, "distance": 150, "lie": "Rough"}])
+        
+        mock_select = mock_supabase.return_value.table.return_value.select.return_value
+        mock_select.range.return_value.execute.side_effect = slow_page
+        
+        async def run():
+            return await asyncio.gather(*(
+                aget_similar_shots_by_features(sample_scenario, k=1) for _ in range(4)
+            ))
+        
+        results = asyncio.run(run())
+        
+        assert [r[0]["id"] for r in results] == [1, 1, 1, 1]
+        assert len(mock_index) == 1
+        assert mock_select.range.return_value.execute.call_count == 1
+    
+    def test_unknown_mode_rejected(self, sample_scenario):
+        """Test an unknown retrieval mode raises."""
+        with pytest.raises(ValueError):
+            retrieve_similar_shots(sample_scenario, mode="bm25")
@@ -1,23 +1,26 @@
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
-from agent_caddie.embeddings import get_embedding
+from unittest.mock import patch, MagicMock, AsyncMock
+from agent_caddie.embeddings import (
+    get_embedding, aget_embedding, get_embeddings, EmbeddingBatcher, embedding_cache
+)
 
 
 class TestGetEmbedding:
     """Test embedding generation functionality."""
     
-    @patch('agent_caddie.embeddings.openai')
+    @patch('agent_caddie.embeddings.openai_client')
     def test_get_embedding_success(self, mock_openai):
         """Test successful embedding generation."""
         # Mock the OpenAI response
         mock_response = MagicMock()
         mock_response.data = [MagicMock(embedding=[0.1, 0.2, 0.3, 0.4, 0.5])]
-        mock_openai.embeddings.create.return_value = mock_response
+        mock_openai.return_value.embeddings.create.return_value = mock_response
         
         result = get_embedding("Test scenario text")
         
         # Verify OpenAI was called correctly
-        mock_openai.embeddings.create.assert_called_once_with(
+        mock_openai.return_value.embeddings.create.assert_called_once_with(
             model="text-embedding-ada-002",
             input="Test scenario text"
         )
@@ -25,51 +28,51 @@ class TestGetEmbedding:
         # Verify the result
         assert result == [0.1, 0.2, 0.3, 0.4, 0.5]
     
-    @patch('agent_caddie.embeddings.openai')
+    @patch('agent_caddie.embeddings.openai_client')
     def test_get_embedding_golf_scenario(self, mock_openai):
         """Test embedding generation for a golf scenario."""
         mock_response = MagicMock()
         mock_response.data = [MagicMock(embedding=[0.5, -0.3, 0.8, -0.1, 0.2])]
-        mock_openai.embeddings.create.return_value = mock_response
+        mock_openai.return_value.embeddings.create.return_value = mock_response
         
         scenario_text = "150y, lie=Rough, ball_pos=Above feet, wind=10mph Headwind, elev=Uphill"
         result = get_embedding(scenario_text)
         
-        mock_openai.embeddings.create.assert_called_once_with(
+        mock_openai.return_value.embeddings.create.assert_called_once_with(
             model="text-embedding-ada-002",
             input=scenario_text
         )
         
         assert result == [0.5, -0.3, 0.8, -0.1, 0.2]
     
-    @patch('agent_caddie.embeddings.openai')
+    @patch('agent_caddie.embeddings.openai_client')
     def test_get_embedding_empty_string(self, mock_openai):
         """Test embedding generation for empty string."""
         mock_response = MagicMock()
         mock_response.data = [MagicMock(embedding=[0.0, 0.0, 0.0])]
-        mock_openai.embeddings.create.return_value = mock_response
+        mock_openai.return_value.embeddings.create.return_value = mock_response
         
         result = get_embedding("")
         
-        mock_openai.embeddings.create.assert_called_once_with(
+        mock_openai.return_value.embeddings.create.assert_called_once_with(
             model="text-embedding-ada-002",
             input=""
         )
         
         assert result == [0.0, 0.0, 0.0]
     
-    @patch('agent_caddie.embeddings.openai')
+    @patch('agent_caddie.embeddings.openai_client')
     def test_get_embedding_long_text(self, mock_openai):
         """Test embedding generation for long text."""
         mock_response = MagicMock()
         mock_response.data = [MagicMock(embedding=[0.1] * 1536)]  # Standard embedding size
-        mock_openai.embeddings.create.return_value = mock_response
+        mock_openai.return_value.embeddings.create.return_value = mock_response
         
         long_text = "This is a very long golf scenario description with many details about the shot, the conditions, the wind, the lie, the ball position, and all the other factors that go into making a club selection decision." * 10
         
         result = get_embedding(long_text)
         
-        mock_openai.embeddings.create.assert_called_once_with(
+        mock_openai.return_value.embeddings.create.assert_called_once_with(
             model="text-embedding-ada-002",
             input=long_text
         )
@@ -77,24 +80,24 @@ class TestGetEmbedding:
         assert len(result) == 1536
         assert all(val == 0.1 for val in result)
     
-    @patch('agent_caddie.embeddings.openai')
+    @patch('agent_caddie.embeddings.openai_client')
     def test_get_embedding_special_characters(self, mock_openai):
         """Test embedding generation with special characters."""
         mock_response = MagicMock()
         mock_response.data = [MagicMock(embedding=[0.3, -0.7, 0.9])]
-        mock_openai.embeddings.create.return_value = mock_response
+        mock_openai.return_value.embeddings.create.return_value = mock_response
         
         special_text = "150y, lie=Rough, ball_pos=Above feet, wind=10mph Headwind →, elev=Uphill"
         result = get_embedding(special_text)
         
-        mock_openai.embeddings.create.assert_called_once_with(
+        mock_openai.return_value.embeddings.create.assert_called_once_with(
             model="text-embedding-ada-002",
             input=special_text
         )
         
         assert result == [0.3, -0.7, 0.9]
     
-    @patch('agent_caddie.embeddings.openai')
+    @patch('agent_caddie.embeddings.openai_client')
     def test_get_embedding_multiple_calls(self, mock_openai):
         """Test multiple embedding generation calls."""
         # First call
@@ -105,12 +108,122 @@ class TestGetEmbedding:
         mock_response2 = MagicMock()
         mock_response2.data = [MagicMock(embedding=[0.4, 0.5, 0.6])]
         
-        mock_openai.embeddings.create.side_effect = [mock_response1, mock_response2]
+        mock_openai.return_value.embeddings.create.side_effect = [mock_response1, mock_response2]
         
         result1 = get_embedding("First scenario")
         result2 = get_embedding("Second scenario")
         
         # Verify both calls were made
-        assert mock_openai.embeddings.create.call_count == 2
+        assert mock_openai.return_value.embeddings.create.call_count == 2
         assert result1 == [0.1, 0.2, 0.3]
-        assert result2 == [0.4, 0.5, 0.6] 
\ No newline at end of file
+        assert result2 == [0.4, 0.5, 0.6] 
+
+class TestAsyncGetEmbedding:
+    """Test the non-blocking embedding path used by the API."""
+    
+    @patch('agent_caddie.embeddings.EMBEDDING_BATCH_WINDOW_MS', 0)
+    @patch('agent_caddie.embeddings.async_openai_client')
+    def test_aget_embedding_success(self, mock_client):
+        """Test async embedding generation awaits the async client."""
+        mock_response = MagicMock()
+        mock_response.data = [MagicMock(embedding=[0.1, 0.2, 0.3])]
+        mock_client.return_value.embeddings.create = AsyncMock(return_value=mock_response)
+        
+        result = asyncio.run(aget_embedding("Test scenario text"))
+        
+        mock_client.return_value.embeddings.create.assert_awaited_once_with(
+            model="text-embedding-ada-002",
+            input="Test scenario text"
+        )
+        assert result == [0.1, 0.2, 0.3]
+
+
+class TestBatchEmbeddings:
+    """Test batched embedding calls."""
+    
+    @patch('agent_caddie.embeddings.openai_client')
+    def test_get_embeddings_batches_and_dedupes(self, mock_openai):
+        """Test distinct uncached texts go out in a single call, in order."""
+        mock_response = MagicMock()
+        mock_response.data = [MagicMock(embedding=[1.0]), MagicMock(embedding=[2.0])]
+        mock_openai.return_value.embeddings.create.return_value = mock_response
+        
+        result = get_embeddings(["150y", "200y", "150y"])
+        
+        mock_openai.return_value.embeddings.create.assert_called_once_with(
+            model="text-embedding-ada-002",
+            input=["150y", "200y"]
+        )
+        assert result == [[1.0], [2.0], [1.0]]
+    
+    @patch('agent_caddie.embeddings.openai_client')
+    def test_get_embeddings_uses_cache(self, mock_openai):
+        """Test cached texts are not sent again."""
+        mock_openai.return_value.embeddings.create.side_effect = [
+            MagicMock(data=[MagicMock(embedding=[1.0])]),
+            MagicMock(data=[MagicMock(embedding=[2.0])]),
+        ]
+        
+        get_embeddings(["150y"])
+        result = get_embeddings(["150y", "200y"])
+        
+        assert mock_openai.return_value.embeddings.create.call_args[1]["input"] == ["200y"]
+        assert result == [[1.0], [2.0]]
+    
+    @patch('agent_caddie.embeddings.openai_client')
+    def test_get_embeddings_all_cached(self, mock_openai):
+        """Test no API call is made when everything is cached."""
+        embedding_cache.put("text-embedding-ada-002", "150y", [1.0])
+        assert get_embeddings(["150y"]) == [[1.0]]
+        mock_openai.return_value.embeddings.create.assert_not_called()
+
+
+class TestEmbeddingBatcher:
+    """Test coalescing of concurrent embedding requests."""
+    
+    @patch('agent_caddie.embeddings.async_openai_client')
+    def test_concurrent_requests_share_one_call(self, mock_client):
+        """Test requests inside the window become one API call."""
+        async def fake_create(model, input):
+            return MagicMock(data=[MagicMock(embedding=[float(len(t))]) for t in input])
+        mock_client.return_value.embeddings.create = AsyncMock(side_effect=fake_create)
+        batcher = EmbeddingBatcher(max_batch=64, max_wait_ms=5)
+        
+        async def run():
+            return await asyncio.gather(*(batcher.embed("x" * n) for n in (1, 2, 3, 2)))
+        
+        result = asyncio.run(run())
+        
+        assert result == [[1.0], [2.0], [3.0], [2.0]]
+        mock_client.return_value.embeddings.create.assert_awaited_once()
+        assert mock_client.return_value.embeddings.create.call_args[1]["input"] == ["x", "xx", "xxx"]
+        assert batcher.stats()["batches"] == 1
+        assert batcher.stats()["requests"] == 4
+    
+    @patch('agent_caddie.embeddings.async_openai_client')
+    def test_full_batch_flushes_immediately(self, mock_client):
+        """Test reaching max_batch sends without waiting for the window."""
+        async def fake_create(model, input):
+            return MagicMock(data=[MagicMock(embedding=[0.0]) for _ in input])
+        mock_client.return_value.embeddings.create = AsyncMock(side_effect=fake_create)
+        batcher = EmbeddingBatcher(max_batch=2, max_wait_ms=10_000)
+        
+        async def run():
+            return await asyncio.wait_for(
+                asyncio.gather(batcher.embed("a"), batcher.embed("b")), timeout=1
+            )
+        
+        assert asyncio.run(run()) == [[0.0], [0.0]]
+    
+    @patch('agent_caddie.embeddings.async_openai_client')
+    def test_errors_reach_every_caller(self, mock_client):
+        """Test an API failure is raised in each waiting request."""
+        mock_client.return_value.embeddings.create = AsyncMock(side_effect=RuntimeError("boom"))
+        batcher = EmbeddingBatcher(max_wait_ms=1)
+        
+        async def run():
+            return await asyncio.gather(batcher.embed("a"), batcher.embed("b"),
+                                        return_exceptions=True)
+        
+        results = asyncio.run(run())
+        assert all(isinstance(r, RuntimeError) for r in results)
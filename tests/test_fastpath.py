@@ -0,0 +1,71 @@
+import pytest
+from agent_caddie.fastpath import pick_club, fast_path_message, fallback_message
+
+
+@pytest.fixture
+def bag():
+    """Average carries for a typical set of irons."""
+    return {"6-Iron": 170, "7-Iron": 160, "8-Iron": 150, "9-Iron": 140}
+
+
+class TestPickClub:
+    """Test the deterministic club pick."""
+    
+    def test_clear_fit(self, bag):
+        """Test a distance on top of one club's carry is answered."""
+        assert pick_club(bag, 161, max_gap=4, margin=6) == ("7-Iron", 160)
+    
+    def test_between_clubs_is_ambiguous(self, bag):
+        """Test a distance halfway between two clubs goes to the LLM."""
+        assert pick_club(bag, 155, max_gap=4, margin=6) is None
+    
+    def test_outside_bag_is_ambiguous(self, bag):
+        """Test a distance beyond the longest club goes to the LLM."""
+        assert pick_club(bag, 185, max_gap=4, margin=6) is None
+    
+    def test_close_runner_up_is_ambiguous(self):
+        """Test two clubs with near-identical carries are not guessed."""
+        assert pick_club({"50°": 100, "52°": 103}, 101, max_gap=4, margin=6) is None
+    
+    def test_no_distances(self):
+        """Test users without stored distances always go to the LLM."""
+        assert pick_club({}, 150) is None
+    
+    def test_single_club(self):
+        """Test a lone club within the gap is picked."""
+        assert pick_club({"Driver": 240}, 238, max_gap=4, margin=6) == ("Driver", 240)
+    
+    def test_message_names_club(self):
+        """Test the fast-path answer leads with the club."""
+        message = fast_path_message("7-Iron", 160, 161.4)
+        
+        assert message.startswith("7-Iron.")
+        assert "161 y" in message
+
+
+class TestFallbackMessage:
+    """Test the answer given when the LLM does not respond in time."""
+    
+    def test_nearest_club_even_between_clubs(self, bag):
+        """Test the closest carry is named where the fast path would not guess."""
+        message = fallback_message(bag, [], 154)
+        
+        assert message.startswith("8-Iron.")
+    
+    def test_past_shots_without_distances(self):
+        """Test the closest past carry is used when no distances are on file."""
+        past = [
+            {"recommended_club": "6-Iron", "carried": 172},
+            {"recommended_club": "7-Iron", "carried": 158},
+        ]
+        
+        message = fallback_message({}, past, 160)
+        
+        assert message.startswith("7-Iron.")
+        assert "158 y" in message
+    
+    def test_nothing_on_file(self):
+        """Test the distance alone is reported with no club data."""
+        assert fallback_message({}, [], 151.6) == (
+            "It plays 152 y. Add your club distances to get a club pick."
+        )
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from agent_caddie.features import encode_scenario, FeatureIndex
+
+
+def scenario(distance=150, lie="Fairway", ball_pos="Level", elevation="Level",
+             wind_dir="None", wind_speed=0):
+    return {"distance": distance, "lie": lie, "ball_pos": ball_pos,
+            "elevation": elevation, "wind_dir": wind_dir, "wind_speed": wind_speed}
+
+
+class TestEncodeScenario:
+    """Test the structured scenario encoder."""
+    
+    def test_cli_and_api_shapes_encode_identically(self):
+        """Test the nested CLI wind dict matches the flat API fields."""
+        flat = scenario(lie="Rough", wind_dir="Headwind", wind_speed=10)
+        nested = {**flat, "wind": {"direction": "Headwind", "speed": 10}}
+        del nested["wind_dir"], nested["wind_speed"]
+        
+        assert np.array_equal(encode_scenario(flat), encode_scenario(nested))
+    
+    def test_small_fixed_width(self):
+        """Test the vector is small and float32."""
+        vec = encode_scenario(scenario())
+        assert vec.dtype == np.float32
+        assert vec.shape == (22,)
+    
+    def test_weights_scale_groups(self):
+        """Test zero weight removes a feature group from the distance."""
+        a = scenario(lie="Rough")
+        b = scenario(lie="Fairway")
+        no_lie = {"lie": 0.0, "carry": 0.0}
+        
+        assert np.linalg.norm(encode_scenario(a) - encode_scenario(b)) > 0
+        assert np.linalg.norm(encode_scenario(a, no_lie) - encode_scenario(b, no_lie)) == 0
+    
+    def test_numeric_elevation(self):
+        """Test feet of elevation map onto the Uphill/Downhill categories."""
+        up_feet = encode_scenario(scenario(elevation=15.0), {"elevation": 0.0})
+        up_label = encode_scenario(scenario(elevation="Uphill"), {"elevation": 0.0})
+        assert np.array_equal(up_feet, up_label)
+
+
+class TestFeatureIndex:
+    """Test weighted nearest-neighbour search over features."""
+    
+    def test_nearest_scenario_wins(self):
+        """Test the closest typed scenario is returned first."""
+        index = FeatureIndex()
+        index.add_scenarios(
+            [scenario(150), scenario(150, lie="Sand / Bunker"), scenario(200)],
+            [{"id": 1}, {"id": 2}, {"id": 3}]
+        )
+        
+        result = index.search_scenario(scenario(152), k=2)
+        
+        assert [r["id"] for r in result] == [1, 2]
+        assert 0 < result[1]["similarity"] < result[0]["similarity"] <= 1
+    
+    def test_exact_match_similarity_is_one(self):
+        """Test an identical scenario scores similarity 1."""
+        index = FeatureIndex()
+        index.add_scenarios([scenario(120, lie="Rough")], [{"id": 7}])
+        assert index.search_scenario(scenario(120, lie="rough"), k=1)[0]["similarity"] == pytest.approx(1.0)
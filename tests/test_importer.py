@@ -0,0 +1,114 @@
+import io
+import json
+import pytest
+from unittest.mock import patch
+from agent_caddie.importer import (
+    detect_format, iter_records, normalize_record, import_shots, import_file, InvalidRecord
+)
+
+
+def export_rows(n, start=0):
+    return [
+        {"user_id": "user123", "distance": str(150 + i % 3), "lie": "Fairway",
+         "ball_pos": "Level", "elevation": "Level", "wind_dir": "Headwind",
+         "wind_speed": "10", "club": "7-Iron", "carry": str(148 + i % 5)}
+        for i in range(start, start + n)
+    ]
+
+
+class TestParsing:
+    """Test streaming parsing of exports."""
+    
+    def test_detect_format(self):
+        """Test formats are picked from the extension."""
+        assert detect_format("shots.CSV") == "csv"
+        assert detect_format("shots.ndjson") == "jsonl"
+        with pytest.raises(ValueError):
+            detect_format("shots.xlsx")
+    
+    def test_iter_records_csv_and_jsonl(self):
+        """Test CSV and JSONL lines both stream out as dicts."""
+        csv_lines = io.StringIO("distance,lie\n150,Rough\n90,Fairway\n")
+        jsonl_lines = io.StringIO('{"distance": 150}\n\n{"distance": 90}\n')
+        
+        assert [r["lie"] for r in iter_records(csv_lines, "csv")] == ["Rough", "Fairway"]
+        assert [r["distance"] for r in iter_records(jsonl_lines, "jsonl")] == [150, 90]
+
+
+class TestNormalizeRecord:
+    """Test conversion of export rows into shot entries."""
+    
+    def test_aliases_types_and_derived_fields(self):
+        """Test aliases map, numbers parse and outcome fields are derived."""
+        entry = normalize_record(export_rows(1)[0])
+        
+        assert entry["distance"] == 150.0
+        assert entry["recommended_club"] == "7-Iron"
+        assert entry["carried"] == 148.0
+        assert entry["effective_dist"] == 155.0  # +5 headwind
+        assert entry["error"] == -2.0
+        assert entry["result"] == "perfect"
+        assert entry["scenario_text"].startswith("150y, lie=Fairway")
+    
+    def test_user_id_override(self):
+        """Test a command-level user id replaces the row's."""
+        assert normalize_record(export_rows(1)[0], user_id="other")["user_id"] == "other"
+    
+    def test_invalid_rows(self):
+        """Test missing and non-numeric fields are rejected."""
+        with pytest.raises(InvalidRecord):
+            normalize_record({"distance": "150", "lie": "Rough", "carry": "150"})
+        with pytest.raises(InvalidRecord):
+            normalize_record({**export_rows(1)[0], "distance": "far"})
+
+
+class TestImportShots:
+    """Test chunked import with checkpoints."""
+    
+    @patch('agent_caddie.importer.insert_shots')
+    @patch('agent_caddie.importer.get_embeddings')
+    def test_chunks_batch_embed_and_insert(self, mock_embed, mock_insert):
+        """Test each chunk costs one embedding call and one insert."""
+        mock_embed.side_effect = lambda texts: [[0.1]] * len(texts)
+        rows = export_rows(5) + [{**export_rows(1)[0], "cause": "Mis-hit"}, {"lie": "Rough"}]
+        progress = []
+        
+        stats = import_shots(rows, chunk_size=2, progress=progress.append)
+        
+        assert stats["inserted"] == 5
+        assert stats["skipped"] == 1
+        assert stats["invalid"] == 1
+        assert mock_embed.call_count == 3
+        assert [len(c[0][0]) for c in mock_insert.call_args_list] == [2, 2, 1]
+        assert mock_insert.call_args_list[0][0][0][0]["embedding"] == [0.1]
+        assert progress[-1]["inserted"] == 5
+        assert stats["rows_per_sec"] > 0
+    
+    @patch('agent_caddie.importer.insert_shots')
+    @patch('agent_caddie.importer.get_embeddings')
+    def test_features_mode_skips_embedding(self, mock_embed, mock_insert):
+        """Test feature-mode imports never call the embedding API."""
+        import_shots(export_rows(3), chunk_size=10, mode="features")
+        
+        mock_embed.assert_not_called()
+        assert mock_insert.call_args[0][0][0]["embedding"] is None
+    
+    @patch('agent_caddie.importer.insert_shots')
+    @patch('agent_caddie.importer.get_embeddings')
+    def test_resume_from_checkpoint_after_failure(self, mock_embed, mock_insert, tmp_path):
+        """Test a failed run resumes after the last committed chunk."""
+        mock_embed.side_effect = lambda texts: [[0.1]] * len(texts)
+        mock_insert.side_effect = [None, RuntimeError("network"), None, None]
+        checkpoint = str(tmp_path / "import.checkpoint")
+        path = tmp_path / "shots.jsonl"
+        path.write_text("".join(json.dumps(r) + "\n" for r in export_rows(6)))
+        
+        with pytest.raises(RuntimeError):
+            import_file(str(path), chunk_size=2, checkpoint=checkpoint)
+        assert json.loads(open(checkpoint).read()) == {"rows_done": 2}
+        
+        stats = import_file(str(path), chunk_size=2, checkpoint=checkpoint)
+        
+        assert stats["resumed_from"] == 2
+        assert stats["inserted"] == 4
+        assert not (tmp_path / "import.checkpoint").exists()
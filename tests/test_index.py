@@ -0,0 +1,179 @@
+import numpy as np
+import pytest
+from agent_caddie.index import VectorIndex, IVFIndex, HNSWIndex, make_index, recall_report
+
+
+def clustered(n=2000, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    return centers[rng.integers(20, size=n)] + 0.1 * rng.normal(size=(n, dim))
+
+
+class TestVectorIndex:
+    """Test the exact in-process cosine index."""
+    
+    def test_search_returns_top_k_by_cosine(self):
+        """Test the nearest rows come back best-first with similarity."""
+        index = VectorIndex()
+        index.add_many(
+            [[1, 0, 0], [0, 1, 0], [0.9, 0.1, 0]],
+            [{"id": 1}, {"id": 2}, {"id": 3}]
+        )
+        
+        result = index.search([1, 0, 0], k=2)
+        
+        assert [r["id"] for r in result] == [1, 3]
+        assert result[0]["similarity"] == pytest.approx(1.0)
+    
+    def test_vectors_are_contiguous_float32(self):
+        """Test storage is a normalized float32 matrix."""
+        index = VectorIndex()
+        index.add([3, 4], {"id": 1})
+        
+        assert index.vectors.dtype == np.float32
+        assert index.vectors.flags["C_CONTIGUOUS"]
+        assert np.allclose(index.vectors[0], [0.6, 0.8])
+    
+    def test_incremental_adds_grow_capacity(self):
+        """Test many single inserts stay searchable."""
+        index = VectorIndex()
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(200, 8))
+        for i, v in enumerate(vectors):
+            index.add(v, {"id": i})
+        
+        assert len(index) == 200
+        assert index.search(vectors[123], k=1)[0]["id"] == 123
+    
+    def test_k_larger_than_index(self):
+        """Test k is clamped to the number of stored vectors."""
+        index = VectorIndex()
+        index.add([1, 0], {"id": 1})
+        assert len(index.search([1, 0], k=5)) == 1
+    
+    def test_empty_index(self):
+        """Test searching an empty index returns nothing."""
+        assert VectorIndex().search([1, 0], k=3) == []
+    
+    def test_add_nothing(self):
+        """Test adding no vectors is a no-op rather than a length mismatch."""
+        index = VectorIndex()
+        index.add_many([], [])
+        
+        assert len(index) == 0
+        assert index.dim is None
+        with pytest.raises(ValueError):
+            index.add_many([[1, 0]], [])
+    
+    def test_dimension_mismatch(self):
+        """Test vectors of the wrong width are rejected."""
+        index = VectorIndex()
+        index.add([1, 0], {"id": 1})
+        with pytest.raises(ValueError):
+            index.add([1, 0, 0], {"id": 2})
+    
+    def test_save_and_load_roundtrip(self, tmp_path):
+        """Test a snapshot restores vectors and rows."""
+        path = str(tmp_path / "shots.idx")
+        index = VectorIndex()
+        index.add_many([[1, 0], [0, 1]], [{"id": 1}, {"id": 2}])
+        index.save(path)
+        
+        restored = VectorIndex()
+        restored.load(path)
+        
+        assert restored.loaded
+        assert restored.search([0, 1], k=1)[0]["id"] == 2
+    
+    def test_load_rejects_other_kind(self, tmp_path):
+        """Test a snapshot of another index kind is refused."""
+        path = str(tmp_path / "shots.idx")
+        index = IVFIndex(nlist=2)
+        index.add_many([[1, 0], [0, 1]], [{"id": 1}, {"id": 2}])
+        index.save(path)
+        
+        with pytest.raises(ValueError):
+            VectorIndex().load(path)
+
+
+class TestIVFIndex:
+    """Test the inverted-file ANN index."""
+    
+    def test_exact_until_trained(self):
+        """Test the index answers exactly before reaching train_size."""
+        index = IVFIndex(nlist=4, train_size=100)
+        index.add_many([[1, 0], [0, 1]], [{"id": 1}, {"id": 2}])
+        
+        assert index.centroids is None
+        assert index.search([0, 1], k=1)[0]["id"] == 2
+    
+    def test_trains_and_assigns_incrementally(self):
+        """Test training kicks in and later inserts are assigned."""
+        vectors = clustered()
+        index = IVFIndex(nlist=8, nprobe=8, train_size=1000)
+        index.add_many(vectors[:1500], [{"id": i} for i in range(1500)])
+        assert index.centroids is not None
+        
+        for i in range(1500, 1510):
+            index.add(vectors[i], {"id": i})
+        
+        assert sum(len(ids) for ids in index._lists) == 1510
+        # nprobe == nlist scores every list, so results match exact search
+        assert index.search(vectors[1505], k=1)[0]["id"] == 1505
+    
+    def test_save_and_load_keeps_layout(self, tmp_path):
+        """Test centroids and list assignment survive a snapshot."""
+        path = str(tmp_path / "ivf.idx")
+        vectors = clustered(500)
+        index = IVFIndex(nlist=8, nprobe=2, train_size=200)
+        index.add_many(vectors, [{"id": i} for i in range(500)])
+        index.save(path)
+        
+        restored = IVFIndex(nlist=8, nprobe=2)
+        restored.load(path)
+        
+        assert np.allclose(restored.centroids, index.centroids)
+        assert restored._lists == index._lists
+        assert restored.search(vectors[7], k=3) == index.search(vectors[7], k=3)
+
+
+class TestHNSWIndex:
+    """Test the optional hnswlib-backed index."""
+    
+    def test_search_and_incremental_resize(self, tmp_path):
+        """Test inserts past the initial capacity and a save/load roundtrip."""
+        pytest.importorskip("hnswlib")
+        vectors = clustered(300)
+        index = HNSWIndex(capacity=16, ef=64)
+        for i, v in enumerate(vectors):
+            index.add(v, {"id": i})
+        
+        assert len(index) == 300
+        assert index.search(vectors[42], k=1)[0]["id"] == 42
+        
+        path = str(tmp_path / "hnsw.idx")
+        index.save(path)
+        restored = HNSWIndex()
+        restored.load(path)
+        assert restored.search(vectors[42], k=1)[0]["id"] == 42
+
+
+class TestIndexFactoryAndReport:
+    """Test index selection and the recall-vs-latency report."""
+    
+    def test_make_index_unknown_kind(self):
+        """Test an unknown kind is rejected."""
+        with pytest.raises(ValueError):
+            make_index("annoy")
+    
+    def test_recall_report_against_exact(self):
+        """Test the report has an exact baseline with perfect recall."""
+        vectors = clustered(400)
+        report = recall_report(vectors, vectors[:20], k=5,
+                               configs=[("ivf", {"nlist": 8, "nprobe": 8})])
+        
+        assert report[0]["index"] == "exact"
+        assert report[0]["recall@5"] == 1.0
+        assert report[1]["index"] == "ivf"
+        assert report[1]["recall@5"] == 1.0
+        assert {"p50_ms", "p95_ms", "build_s"} <= set(report[1])
@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock
+from agent_caddie.llm import LLMTimeout, LLM_REQUESTS, stream_chat
+
+
+class SlowStream:
+    """Streamed chat completion that waits before its first token."""
+    
+    def __init__(self, tokens, first_delay_s=0.0, delay_s=0.0):
+        self.tokens = list(tokens)
+        self.first_delay_s = first_delay_s
+        self.delay_s = delay_s
+        self.sent = 0
+        self.closed = False
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        if not self.tokens:
+            raise StopAsyncIteration
+        await asyncio.sleep(self.delay_s if self.sent else self.first_delay_s)
+        self.sent += 1
+        return MagicMock(choices=[MagicMock(delta=MagicMock(content=self.tokens.pop(0)))])
+    
+    async def close(self):
+        self.closed = True
+
+
+def fake_client(streams):
+    """OpenAI client whose create() hands out ``streams`` in order, or raises them."""
+    calls = []
+    
+    async def create(**kwargs):
+        calls.append(kwargs["model"])
+        stream = streams[len(calls) - 1]
+        if isinstance(stream, Exception):
+            raise stream
+        return stream
+    
+    client = MagicMock()
+    client.chat.completions.create = create
+    return client, calls
+
+
+def collect(**kwargs):
+    async def run():
+        return [token async for token in stream_chat([{"role": "user", "content": "150y"}], **kwargs)]
+    return asyncio.run(run())
+
+
+class TestStreamChat:
+    """Test hedged, deadline-bounded chat streams."""
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    def test_fast_primary_is_not_hedged(self, mock_client):
+        """Test a primary that answers in time is the only request."""
+        client, calls = fake_client([SlowStream(["7-", "Iron"])])
+        mock_client.return_value = client
+        
+        tokens = collect(model="main", hedge_model="cheap", hedge_after_ms=200, ttft_timeout_ms=1000)
+        
+        assert tokens == ["7-", "Iron"]
+        assert calls == ["main"]
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    def test_slow_primary_loses_to_the_hedge(self, mock_client):
+        """Test the hedge fires after the threshold, wins, and the primary is closed."""
+        primary = SlowStream(["8-Iron"], first_delay_s=1.0)
+        hedge = SlowStream(["7-", "Iron"])
+        client, calls = fake_client([primary, hedge])
+        mock_client.return_value = client
+        before = LLM_REQUESTS.value(role="hedge", outcome="won")
+        
+        tokens = collect(model="main", hedge_model="cheap", hedge_after_ms=20, ttft_timeout_ms=1000)
+        
+        assert tokens == ["7-", "Iron"]
+        assert calls == ["main", "cheap"]
+        assert primary.closed is True
+        assert primary.sent == 0
+        assert LLM_REQUESTS.value(role="hedge", outcome="won") == before + 1
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    def test_failed_primary_hedges_at_once(self, mock_client):
+        """Test an upstream error fires the hedge without waiting for the threshold."""
+        client, calls = fake_client([RuntimeError("502"), SlowStream(["7-Iron"])])
+        mock_client.return_value = client
+        
+        tokens = collect(model="main", hedge_model="cheap", hedge_after_ms=5000, ttft_timeout_ms=10000)
+        
+        assert tokens == ["7-Iron"]
+        assert calls == ["main", "cheap"]
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    def test_error_without_hedging_is_raised(self, mock_client):
+        """Test with hedging off the upstream error comes through as is."""
+        client, calls = fake_client([RuntimeError("502")])
+        mock_client.return_value = client
+        
+        with pytest.raises(RuntimeError, match="502"):
+            collect(hedge_after_ms=0, ttft_timeout_ms=1000)
+        assert len(calls) == 1
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    def test_ttft_watchdog_gives_up(self, mock_client):
+        """Test no first token from either request raises a ttft LLMTimeout."""
+        streams = [SlowStream(["a"], first_delay_s=1.0), SlowStream(["b"], first_delay_s=1.0)]
+        client, calls = fake_client(streams)
+        mock_client.return_value = client
+        
+        with pytest.raises(LLMTimeout) as exc:
+            collect(hedge_after_ms=10, ttft_timeout_ms=50)
+        
+        assert exc.value.kind == "ttft"
+        assert exc.value.partial is False
+        assert len(calls) == 2
+        assert all(s.closed for s in streams)
+    
+    @patch('agent_caddie.llm.async_openai_client')
+    def test_deadline_cuts_off_a_slow_stream(self, mock_client):
+        """Test a stream still going at the deadline raises a partial LLMTimeout."""
+        stream = SlowStream(["7-", "Iron", " up"], delay_s=1.0)
+        client, _ = fake_client([stream])
+        mock_client.return_value = client
+        received = []
+        
+        async def run():
+            async for token in stream_chat([], hedge_after_ms=0, deadline_ms=50):
+                received.append(token)
+        
+        with pytest.raises(LLMTimeout) as exc:
+            asyncio.run(run())
+        
+        assert exc.value.kind == "deadline"
+        assert exc.value.partial is True
+        assert received == ["7-"]
+        assert stream.closed is True
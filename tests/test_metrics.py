@@ -0,0 +1,76 @@
+import pytest
+from agent_caddie.metrics import Callback, Counter, Histogram, Registry, ERRORS, STAGE_SECONDS, stage
+
+
+class TestHistogram:
+    """Test bucketed timings."""
+    
+    def test_buckets_are_cumulative(self):
+        """Test the exposition counts each observation in every bucket above it."""
+        h = Histogram("t_seconds", "test", ["stage"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            h.observe(value, stage="llm")
+        
+        lines = h.samples()
+        
+        assert 't_seconds_bucket{stage="llm",le="0.1"} 1' in lines
+        assert 't_seconds_bucket{stage="llm",le="1.0"} 2' in lines
+        assert 't_seconds_bucket{stage="llm",le="+Inf"} 3' in lines
+        assert 't_seconds_count{stage="llm"} 3' in lines
+        assert h.count(stage="llm") == 3
+    
+    def test_time_records_even_on_error(self):
+        """Test the context manager observes a block that raises."""
+        h = Histogram("t_seconds", "test")
+        
+        with pytest.raises(ValueError):
+            with h.time():
+                raise ValueError("boom")
+        
+        assert h.count() == 1
+
+
+class TestStage:
+    """Test the shared per-stage timer."""
+    
+    def test_stage_times_and_counts_errors(self):
+        """Test failures are timed and counted against their stage."""
+        before_errors = ERRORS.value(stage="test_stage")
+        before_count = STAGE_SECONDS.count(stage="test_stage")
+        
+        with stage("test_stage"):
+            pass
+        with pytest.raises(RuntimeError):
+            with stage("test_stage"):
+                raise RuntimeError("down")
+        
+        assert STAGE_SECONDS.count(stage="test_stage") == before_count + 2
+        assert ERRORS.value(stage="test_stage") == before_errors + 1
+
+
+class TestRegistry:
+    """Test the text exposition."""
+    
+    def test_render_includes_types_and_callbacks(self):
+        """Test counters and scrape-time callbacks render with their headers."""
+        registry = Registry()
+        registry.register(Counter("c_total", "a counter", ["kind"])).inc(kind='say "hi"')
+        registry.register(Callback("depth", "queue depth", lambda: {"shots": 4}, labelnames=["queue"]))
+        
+        text = registry.render()
+        
+        assert "# TYPE c_total counter" in text
+        assert 'c_total{kind="say \\"hi\\""} 1' in text
+        assert "# TYPE depth gauge" in text
+        assert 'depth{queue="shots"} 4' in text
+    
+    def test_broken_callback_does_not_break_scrape(self):
+        """Test a failing source is skipped and the rest still renders."""
+        registry = Registry()
+        registry.register(Callback("broken", "fails", lambda: 1 / 0))
+        registry.register(Callback("ok", "works", lambda: 2))
+        
+        text = registry.render()
+        
+        assert "ok 2" in text
+        assert "# TYPE broken" not in text
@@ -0,0 +1,183 @@
+import asyncio
+import time
+import pytest
+from agent_caddie.pipeline import Pipeline, Stage, STAGE_FALLBACKS
+
+
+def sleeper(value, delay_s=0.0, log=None, name=None):
+    """Stage function returning ``value`` after ``delay_s``."""
+    async def fn(ctx):
+        if log is not None:
+            log.append(name)
+        await asyncio.sleep(delay_s)
+        return value
+    return fn
+
+
+class TestPipeline:
+    """Test running a DAG of async stages."""
+    
+    def test_independent_stages_run_concurrently(self):
+        """Test two 50ms stages without deps finish in about 50ms, not 100ms."""
+        async def run():
+            pipeline = Pipeline([
+                Stage("a", sleeper(1, 0.05)),
+                Stage("b", sleeper(2, 0.05)),
+            ])
+            started = time.perf_counter()
+            flow = pipeline.start("a", "b")
+            values = await asyncio.gather(flow.get("a"), flow.get("b"))
+            return values, time.perf_counter() - started
+        
+        values, elapsed = asyncio.run(run())
+        
+        assert values == [1, 2]
+        assert elapsed < 0.09
+    
+    def test_dependants_receive_inputs_and_dep_results(self):
+        """Test a stage's context holds the run inputs and its deps' values."""
+        async def total(ctx):
+            return ctx["a"] + ctx["b"] + ctx["offset"]
+        
+        async def run():
+            pipeline = Pipeline([
+                Stage("a", sleeper(1)),
+                Stage("b", sleeper(2)),
+                Stage("total", total, deps=["a", "b"]),
+            ])
+            flow = pipeline.start("total", offset=10)
+            return await flow.get("total"), sorted(flow.started), flow.timings
+        
+        value, started, timings = asyncio.run(run())
+        
+        assert value == 13
+        assert started == ["a", "b", "total"]
+        assert set(timings) == {"a", "b", "total"}
+    
+    def test_timeout_yields_fallback(self):
+        """Test a slow stage gives its fallback and is recorded as degraded."""
+        async def run():
+            pipeline = Pipeline([Stage("slow", sleeper("late", 1.0), timeout_s=0.01, fallback=list)])
+            flow = pipeline.start("slow")
+            return await flow.get("slow"), flow.fallbacks
+        
+        before = STAGE_FALLBACKS.value(stage="slow", reason="timeout")
+        value, fallbacks = asyncio.run(run())
+        
+        assert value == []
+        assert fallbacks == {"slow": "timeout"}
+        assert STAGE_FALLBACKS.value(stage="slow", reason="timeout") == before + 1
+    
+    def test_error_yields_fallback(self):
+        """Test a failing stage gives its fallback and dependants still run."""
+        async def boom(ctx):
+            raise RuntimeError("db down")
+        
+        async def count(ctx):
+            return len(ctx["distances"])
+        
+        async def run():
+            pipeline = Pipeline([
+                Stage("distances", boom, fallback=dict),
+                Stage("count", count, deps=["distances"]),
+            ])
+            flow = pipeline.start("count")
+            return await flow.get("count"), flow.fallbacks
+        
+        value, fallbacks = asyncio.run(run())
+        
+        assert value == 0
+        assert fallbacks == {"distances": "error"}
+    
+    def test_unrequested_stages_start_lazily(self):
+        """Test only the targets run up front; get starts the rest on demand."""
+        async def run():
+            log = []
+            pipeline = Pipeline([
+                Stage("a", sleeper(1, log=log, name="a")),
+                Stage("b", sleeper(2, log=log, name="b")),
+            ])
+            flow = pipeline.start("a")
+            await flow.get("a")
+            before = list(log)
+            await flow.get("b")
+            return before, log
+        
+        before, after = asyncio.run(run())
+        
+        assert before == ["a"]
+        assert after == ["a", "b"]
+    
+    def test_cancel_stops_running_stages(self):
+        """Test cancel stops a stage nobody needs any more."""
+        async def run():
+            finished = []
+            
+            async def slow(ctx):
+                await asyncio.sleep(1.0)
+                finished.append("slow")
+            
+            flow = Pipeline([Stage("slow", slow)]).start("slow")
+            await asyncio.sleep(0)
+            flow.cancel()
+            await asyncio.sleep(0.01)
+            return finished, flow._tasks["slow"].cancelled()
+        
+        finished, cancelled = asyncio.run(run())
+        
+        assert finished == []
+        assert cancelled is True
+    
+    def test_deps_must_be_listed_first(self):
+        """Test unknown, later and duplicate stages are rejected."""
+        with pytest.raises(ValueError):
+            Pipeline([Stage("b", sleeper(2), deps=["a"]), Stage("a", sleeper(1))])
+        with pytest.raises(ValueError):
+            Pipeline([Stage("a", sleeper(1)), Stage("a", sleeper(2))])
+    
+    def test_warm_run_stages_are_taken_over(self):
+        """Test a stage still running in a warm run is adopted, not restarted."""
+        async def run():
+            log = []
+            pipeline = Pipeline([
+                Stage("a", sleeper(1, 0.02, log=log, name="a"), key=lambda inputs: inputs["user"]),
+                Stage("b", sleeper(2, log=log, name="b")),
+            ])
+            warm = pipeline.start("a", "b", user="u1")
+            await asyncio.sleep(0)
+            flow = pipeline.start("a", "b", warm=warm, user="u1")
+            warm.cancel()
+            values = await asyncio.gather(flow.get("a"), flow.get("b"))
+            return values, log, flow.adopted, flow.timings
+        
+        values, log, adopted, timings = asyncio.run(run())
+        
+        assert values == [1, 2]
+        # b has no key, so it ran again
+        assert sorted(log) == ["a", "b", "b"]
+        assert adopted == ["a"]
+        assert "a" in timings
+    
+    def test_warm_stages_with_other_keys_are_not_reused(self):
+        """Test a mismatched or degraded warm stage runs afresh."""
+        async def flaky(ctx):
+            calls.append(ctx["user"])
+            if len(calls) == 1:
+                raise RuntimeError("db down")
+            return ctx["user"]
+        
+        calls = []
+        
+        async def run():
+            pipeline = Pipeline([Stage("a", flaky, fallback=str, key=lambda inputs: inputs["user"])])
+            first = pipeline.start("a", user="u1")
+            await first.get("a")
+            second = pipeline.start("a", warm=first, user="u1")
+            other = pipeline.start("a", warm=second, user="u2")
+            return await second.get("a"), await other.get("a"), second.adopted, other.adopted
+        
+        second, other, second_adopted, other_adopted = asyncio.run(run())
+        
+        assert (second, other) == ("u1", "u2")
+        assert calls == ["u1", "u1", "u2"]
+        assert second_adopted == other_adopted == []
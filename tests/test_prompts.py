@@ -1,6 +1,18 @@
 import pytest
 from unittest.mock import patch, MagicMock
-from agent_caddie.prompts import ask_shot_details, build_prompt
+from agent_caddie.prompts import (
+    ask_shot_details, build_prompt, count_tokens, count_message_tokens, summarize_history
+)
+
+
+def many_shots(n):
+    """Past shots cycling through three clubs and outcomes."""
+    clubs = ["7-Iron", "8-Iron", "6-Iron"]
+    results = ["perfect", "too short", "too long"]
+    return [
+        {"recommended_club": clubs[i % 3], "carried": 150 + i % 7, "result": results[i % 3]}
+        for i in range(n)
+    ]
 
 
 class TestAskShotDetails:
@@ -205,4 +217,56 @@ class TestBuildPrompt:
         result = build_prompt(scenario, past_shots)
         
         user_content = result[1]["content"]
-        assert "Effective distance: -5 y (100 base + adjustments)." in user_content 
\ No newline at end of file
+        assert "Effective distance: -5 y (100 base + adjustments)." in user_content 
+
+class TestPromptBudget:
+    """Test keeping prompts inside the token budget."""
+    
+    def test_count_tokens(self):
+        """Test the local counter grows with the text."""
+        assert count_tokens("") == 0
+        assert 0 < count_tokens("carried 152y") < count_tokens("carried 152y (too long)")
+    
+    def test_small_history_listed_raw(self):
+        """Test shots are listed one per line while they fit."""
+        result = build_prompt({"distance": 150, "effective_dist": 155}, many_shots(3), budget=400)
+        
+        assert "- You took 7-Iron and carried 150y (perfect)." in result[1]["content"]
+        assert "summarized" not in result[1]["content"]
+    
+    def test_large_history_summarized_within_budget(self):
+        """Test a long history becomes per-club aggregates under the budget."""
+        result = build_prompt({"distance": 150, "effective_dist": 155}, many_shots(300), budget=150)
+        content = result[1]["content"]
+        
+        assert "Similar past shots (300), summarized by club:" in content
+        assert "- 7-Iron: 100 shots" in content
+        assert "You took" not in content
+        assert count_message_tokens(result) <= 150
+        assert content.endswith("Given this, what club would you suggest?")
+    
+    def test_tiny_budget_drops_least_used_clubs(self):
+        """Test aggregates are trimmed when even they do not fit."""
+        shots = many_shots(30) + [{"recommended_club": "Driver", "carried": 240, "result": "perfect"}]
+        scenario = {"distance": 150, "effective_dist": 155}
+        raw = build_prompt(scenario, shots, budget=10**6)
+        summary = build_prompt(scenario, shots, budget=count_message_tokens(raw) - 1)
+        tight = build_prompt(scenario, shots, budget=count_message_tokens(summary) - 1)
+        
+        assert "Driver" in summary[1]["content"]
+        assert "Driver" not in tight[1]["content"]
+        assert "- 7-Iron: 10 shots" in tight[1]["content"]
+    
+    def test_summarize_history(self):
+        """Test per-club count, mean carry and miss rates."""
+        summary = summarize_history([
+            {"recommended_club": "7-Iron", "carried": 150, "result": "too short"},
+            {"recommended_club": "7-Iron", "carried": 160, "result": "perfect"},
+            {"recommended_club": "8-Iron", "carried": 145, "result": "too long"},
+        ])
+        
+        assert summary[0] == {
+            "club": "7-Iron", "count": 2, "mean_carry": 155.0,
+            "short_rate": 0.5, "long_rate": 0.0,
+        }
+        assert summary[1]["long_rate"] == 1.0
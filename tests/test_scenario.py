@@ -0,0 +1,66 @@
+import pytest
+from agent_caddie.scenario import bucket, canonical_scenario, scenario_fields
+
+
+class TestBucket:
+    """Test numeric quantization."""
+    
+    def test_bucket_rounds_to_nearest_bin(self):
+        """Test values snap to the nearest multiple of the bin width."""
+        assert bucket(151, 5) == 150
+        assert bucket(153, 5) == 155
+        assert bucket(9, 5) == 10
+    
+    def test_bucket_zero_width_disables(self):
+        """Test a zero bin width leaves the value untouched."""
+        assert bucket(151.3, 0) == 151.3
+    
+    def test_bucket_has_no_negative_zero(self):
+        """Test small negative values do not format as -0."""
+        assert f"{bucket(-3, 10):+g}" == "+0"
+
+
+class TestCanonicalScenario:
+    """Test canonical scenario keys."""
+    
+    def test_near_identical_shots_share_a_key(self):
+        """Test 151y/9mph and 150y/10mph canonicalize identically."""
+        a = {"distance": 151, "lie": "Rough", "ball_pos": "Level",
+             "wind": {"direction": "Headwind", "speed": 9}, "elevation": "Level"}
+        b = {"distance": 150.0, "lie": "rough", "ball_pos": "level",
+             "wind": {"direction": "headwind", "speed": 10.0}, "elevation": "Level"}
+        
+        assert canonical_scenario(a) == canonical_scenario(b)
+        assert canonical_scenario(a) == (
+            "150y, lie=Rough, ball_pos=Level, wind=10mph Headwind, elev=Level"
+        )
+    
+    def test_flat_api_shape_with_numeric_elevation(self):
+        """Test the flat API payload and numeric elevation are handled."""
+        scn = {"distance": 148, "lie": "Fairway", "ball_pos": "Level",
+               "elevation": -12.0, "wind_dir": "Tailwind", "wind_speed": 4}
+        
+        assert canonical_scenario(scn) == (
+            "150y, lie=Fairway, ball_pos=Level, wind=5mph Tailwind, elev=-10ft"
+        )
+    
+    def test_calm_wind(self):
+        """Test no wind and zero speed both read as calm."""
+        base = {"distance": 100, "lie": "Fairway", "ball_pos": "Level", "elevation": "Level"}
+        
+        assert "wind=calm" in canonical_scenario({**base, "wind_dir": "None", "wind_speed": 12})
+        assert "wind=calm" in canonical_scenario({**base, "wind_dir": "Headwind", "wind_speed": 1})
+    
+    def test_custom_bins(self):
+        """Test bin widths can be overridden per call."""
+        scn = {"distance": 152, "lie": "Fairway", "wind_dir": "None", "wind_speed": 0}
+        
+        assert canonical_scenario(scn, bins={"distance": 10}).startswith("150y")
+        assert canonical_scenario(scn, bins={"distance": 1}).startswith("152y")
+    
+    def test_scenario_fields_defaults(self):
+        """Test missing optional fields fall back to neutral values."""
+        fields = scenario_fields({"distance": 150, "lie": "Rough"})
+        assert fields["ball_pos"] == "Level"
+        assert fields["wind_dir"] == "None"
+        assert fields["wind_speed"] == 0
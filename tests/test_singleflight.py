@@ -0,0 +1,169 @@
+import asyncio
+import pytest
+from agent_caddie.singleflight import SingleFlight, SharedCalls
+
+
+def token_source(tokens, gate=None, log=None):
+    """Producer factory that yields tokens, optionally waiting on a gate first."""
+    async def produce():
+        if log is not None:
+            log.append("started")
+        try:
+            for token in tokens:
+                if gate is not None:
+                    await gate.wait()
+                await asyncio.sleep(0)
+                yield token
+        finally:
+            if log is not None:
+                log.append("closed")
+    return produce
+
+
+async def collect(flight):
+    return [token async for token in flight.subscribe()]
+
+
+class TestSingleFlight:
+    """Test coalescing identical concurrent streams."""
+    
+    def test_concurrent_requests_share_one_producer(self):
+        """Test followers receive the leader's stream from one upstream call."""
+        async def run():
+            group = SingleFlight()
+            log = []
+            flights = [group.join("150y", token_source(["7-", "Iron"], log=log)) for _ in range(3)]
+            results = await asyncio.gather(*(collect(f) for f in flights))
+            return group, log, flights, results
+        
+        group, log, flights, results = asyncio.run(run())
+        
+        assert results == [["7-", "Iron"]] * 3
+        assert log == ["started", "closed"]
+        assert flights[0] is flights[1] is flights[2]
+        assert group.stats() == {"in_flight": 0, "leaders": 1, "followers": 2, "cancelled": 0}
+    
+    def test_late_joiner_gets_prefix_then_live_tokens(self):
+        """Test a follower joining mid-stream still gets every token."""
+        async def run():
+            group = SingleFlight()
+            leader = group.join("k", token_source(["a", "b", "c"]))
+            stream = leader.subscribe()
+            first = await stream.__anext__()
+            follower = group.join("k", token_source(["x"]))
+            rest, late = await asyncio.gather(collect_rest(stream), collect(follower))
+            return [first, *rest], late
+        
+        async def collect_rest(stream):
+            return [token async for token in stream]
+        
+        leader_tokens, follower_tokens = asyncio.run(run())
+        
+        assert leader_tokens == follower_tokens == ["a", "b", "c"]
+    
+    def test_leader_disconnect_keeps_followers(self):
+        """Test the stream continues for followers when the leader leaves."""
+        async def run():
+            group = SingleFlight()
+            gate = asyncio.Event()
+            log = []
+            leader = group.join("k", token_source(["a", "b"], gate=gate, log=log))
+            follower = group.join("k", token_source(["x"]))
+            follower_task = asyncio.create_task(collect(follower))
+            stream = leader.subscribe()
+            gate.set()
+            await stream.__anext__()
+            await stream.aclose()  # what Starlette does when the client goes away
+            return await follower_task, log, group
+        
+        tokens, log, group = asyncio.run(run())
+        
+        assert tokens == ["a", "b"]
+        assert log == ["started", "closed"]
+        assert group.stats()["cancelled"] == 0
+    
+    def test_last_subscriber_leaving_cancels_producer(self):
+        """Test the upstream stream is closed once nobody is listening."""
+        async def run():
+            group = SingleFlight()
+            gate = asyncio.Event()
+            log = []
+            flight = group.join("k", token_source(["a", "b", "c"], gate=gate, log=log))
+            stream = flight.subscribe()
+            gate.set()
+            await stream.__anext__()
+            gate.clear()
+            await stream.aclose()
+            await asyncio.sleep(0.01)
+            return flight, log, group
+        
+        flight, log, group = asyncio.run(run())
+        
+        assert log == ["started", "closed"]
+        assert flight.tokens == ["a"]
+        assert group.stats() == {"in_flight": 0, "leaders": 1, "followers": 0, "cancelled": 1}
+    
+    def test_error_before_first_token(self):
+        """Test wait_started surfaces an upstream failure."""
+        async def failing():
+            raise RuntimeError("rate limited")
+            yield
+        
+        async def run():
+            group = SingleFlight()
+            flight = group.join("k", failing)
+            with pytest.raises(RuntimeError, match="rate limited"):
+                await flight.wait_started()
+            # a failed flight is not reused
+            return group.join("k", token_source(["ok"])) is not flight
+        
+        assert asyncio.run(run())
+
+
+class TestSharedCalls:
+    """Test coalescing identical concurrent awaitables."""
+    
+    def test_concurrent_calls_share_one_task(self):
+        """Test callers with the same key get one call's result."""
+        async def run():
+            shared = SharedCalls()
+            calls = []
+            
+            async def fetch():
+                calls.append(1)
+                await asyncio.sleep(0.01)
+                return ["shot"]
+            
+            results = await asyncio.gather(*(shared.call("k", fetch) for _ in range(3)))
+            return results, calls, len(shared)
+        
+        results, calls, pending = asyncio.run(run())
+        
+        assert results == [["shot"]] * 3
+        assert calls == [1]
+        assert pending == 0
+    
+    def test_last_waiter_leaving_cancels_the_call(self):
+        """Test the shared task stops once nobody is waiting for it."""
+        async def run():
+            shared = SharedCalls()
+            finished = []
+            
+            async def slow():
+                await asyncio.sleep(1.0)
+                finished.append(1)
+            
+            waiters = [asyncio.ensure_future(shared.call("k", slow)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            waiters[0].cancel()
+            await asyncio.sleep(0.01)
+            still_running = len(shared)
+            waiters[1].cancel()
+            await asyncio.sleep(0.01)
+            return still_running, len(shared), finished
+        
+        still_running, pending, finished = asyncio.run(run())
+        
+        assert still_running == 1
+        assert pending == 0
+        assert finished == []
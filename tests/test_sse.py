@@ -0,0 +1,76 @@
+import asyncio
+import json
+from agent_caddie.sse import coalesce, sse_event
+
+
+async def tokens(items, delay=0.0):
+    """Async token source, optionally pausing before each token."""
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+def collect(stream):
+    async def run():
+        return [chunk async for chunk in stream]
+    return asyncio.run(run())
+
+
+class TestSseEvent:
+    """Test SSE frame formatting."""
+    
+    def test_frame_is_json_and_terminated(self):
+        """Test newlines in the payload cannot break the framing."""
+        frame = sse_event("token", {"text": "7-Iron\nsmooth"})
+        
+        assert frame.startswith("event: token\ndata: ")
+        assert frame.endswith("\n\n")
+        assert frame.count("\n") == 3
+        assert json.loads(frame.split("data: ", 1)[1]) == {"text": "7-Iron\nsmooth"}
+
+
+class TestCoalesce:
+    """Test merging tokens into frames."""
+    
+    def test_first_token_alone_then_by_size(self):
+        """Test the first token is not held back and later ones are merged."""
+        chunks = collect(coalesce(tokens(["7", "-", "I", "r", "o", "n"]), window_ms=10_000, max_chars=2))
+        
+        assert chunks == ["7", "-I", "ro", "n"]
+    
+    def test_no_text_lost(self):
+        """Test the merged frames add up to the original stream."""
+        items = [f"t{i} " for i in range(50)]
+        
+        chunks = collect(coalesce(tokens(items), window_ms=10_000, max_chars=16))
+        
+        assert "".join(chunks) == "".join(items)
+        assert len(chunks) < len(items)
+    
+    def test_window_flushes_slow_streams(self):
+        """Test buffered text goes out when the upstream stalls."""
+        chunks = collect(coalesce(tokens(["a", "b", "c"], delay=0.05), window_ms=10, max_chars=1000))
+        
+        assert chunks == ["a", "b", "c"]
+    
+    def test_closing_early_closes_upstream(self):
+        """Test the upstream iterator is closed when the reader stops."""
+        closed = []
+        
+        async def source():
+            try:
+                yield "a"
+                await asyncio.sleep(10)
+                yield "b"
+            finally:
+                closed.append(True)
+        
+        async def run():
+            stream = coalesce(source(), window_ms=10_000)
+            assert await stream.__anext__() == "a"
+            await stream.aclose()
+        
+        asyncio.run(run())
+        
+        assert closed == [True]
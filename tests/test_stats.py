@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from agent_caddie.stats import ClubAggregate, ClubStatsStore
+
+
+def shot(carried, result="perfect", club="7-Iron", user_id="user123"):
+    """Minimal shot row as stored in the shots table."""
+    return {"user_id": user_id, "recommended_club": club, "carried": carried, "result": result}
+
+
+class TestClubAggregate:
+    """Test the O(1) running statistics."""
+    
+    def test_welford_matches_numpy(self):
+        """Test running mean and variance equal a full recomputation."""
+        carries = np.random.default_rng(0).normal(155, 6, 500)
+        agg = ClubAggregate()
+        for c in carries:
+            agg.update(c, "perfect")
+        
+        assert agg.count == 500
+        assert agg.mean == pytest.approx(carries.mean())
+        assert agg.variance == pytest.approx(carries.var(ddof=1))
+    
+    def test_recent_mean_follows_new_shots(self):
+        """Test the recency-weighted mean moves toward the latest carries."""
+        agg = ClubAggregate()
+        for c in [150] * 10 + [160] * 5:
+            agg.update(c, "perfect", alpha=0.5)
+        
+        assert agg.mean == pytest.approx(153.33, abs=0.01)
+        assert agg.recent_mean > 159
+    
+    def test_miss_counts(self):
+        """Test short, long and perfect outcomes are tallied."""
+        agg = ClubAggregate()
+        for result in ["too short", "too short", "too long", "perfect"]:
+            agg.update(150, result)
+        
+        assert (agg.short, agg.long, agg.perfect) == (2, 1, 1)
+        assert agg.to_dict()["std_carry"] == 0.0
+
+
+class TestClubStatsStore:
+    """Test the per-user store."""
+    
+    def test_update_and_read(self):
+        """Test shots land on the right user and club."""
+        store = ClubStatsStore()
+        store.update_many([shot(150), shot(154), shot(140, club="8-Iron"), shot(200, user_id="u2")])
+        
+        assert set(store.get("user123")) == {"7-Iron", "8-Iron"}
+        assert store.club("user123", "7-Iron")["mean_carry"] == 152
+        assert store.club("user123", "Driver") is None
+        assert len(store) == 3
+    
+    def test_skips_rows_without_carry(self):
+        """Test incomplete rows are ignored."""
+        store = ClubStatsStore()
+        store.update_many([shot(None), {"user_id": "user123", "carried": 150}])
+        
+        assert store.get("user123") == {}
+    
+    def test_persists_across_restarts(self, tmp_path):
+        """Test aggregates written through to SQLite are reloaded."""
+        path = str(tmp_path / "stats.sqlite")
+        store = ClubStatsStore(path=path)
+        store.update_many([shot(150, "too short"), shot(156)])
+        store.close()
+        
+        reopened = ClubStatsStore(path=path)
+        
+        assert reopened.get("user123") == store.get("user123")
+        reopened.close()
+    
+    def test_rebuild_replaces_everything(self, tmp_path):
+        """Test a rebuild recomputes from scratch, in memory and on disk."""
+        path = str(tmp_path / "stats.sqlite")
+        store = ClubStatsStore(path=path)
+        store.update_many([shot(999, club="Driver")])
+        
+        assert store.rebuild([shot(150), shot(152)]) == 2
+        store.close()
+        
+        reopened = ClubStatsStore(path=path)
+        assert set(reopened.get("user123")) == {"7-Iron"}
+        assert reopened.club("user123", "7-Iron")["count"] == 2
+        reopened.close()
+    
+    def test_rebuild_from_empty_table(self, tmp_path):
+        """Test rebuilding from no shots clears the aggregates on disk too."""
+        path = str(tmp_path / "stats.sqlite")
+        store = ClubStatsStore(path=path)
+        store.update_many([shot(150)])
+        
+        assert store.rebuild([]) == 0
+        store.close()
+        
+        reopened = ClubStatsStore(path=path)
+        assert len(reopened) == 0
+        assert reopened.get("user123") == {}
+        reopened.close()
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from agent_caddie.storage import SQLiteStorage, SupabaseStorage, make_storage
+
+
+def shot_row(user_id="user123", club="7-Iron", carried=150, embedding=None):
+    """Shot row as built by db._shot_row."""
+    return {
+        "user_id": user_id, "scenario_text": "Approach", "distance": 150, "lie": "Fairway",
+        "ball_pos": "Level", "wind_dir": "None", "wind_speed": 0, "elevation": 0,
+        "effective_dist": 150, "recommended_club": club, "carried": carried,
+        "error": carried - 150, "result": "perfect", "cause": None, "embedding": embedding,
+    }
+
+
+@pytest.fixture
+def store():
+    """In-memory SQLite backend."""
+    s = SQLiteStorage()
+    yield s
+    s.close()
+
+
+class TestSQLiteClubDistances:
+    """Test club distance storage."""
+    
+    def test_upsert_and_read(self, store):
+        """Test a second save for the same club replaces the first."""
+        store.upsert_club_distances([
+            {"user_id": "u", "club": "7-Iron", "distance": 150},
+            {"user_id": "u", "club": "8-Iron", "distance": 140},
+            {"user_id": "other", "club": "7-Iron", "distance": 170},
+        ])
+        store.upsert_club_distances([{"user_id": "u", "club": "7-Iron", "distance": 155}])
+        
+        assert store.club_distances("u") == {"7-Iron": 155.0, "8-Iron": 140.0}
+        assert store.club_distances("nobody") == {}
+
+
+class TestSQLiteShots:
+    """Test shot storage and local similarity search."""
+    
+    def test_insert_returns_ids_and_embeddings_round_trip(self, store):
+        """Test embeddings are stored as float32 BLOBs and read back."""
+        stored = store.insert_shots([shot_row(embedding=[0.5, -1.0, 2.0]), shot_row()])
+        
+        assert [r["id"] for r in stored] == [1, 2]
+        rows = list(store.iter_shots("id,embedding"))
+        assert rows[0]["embedding"] == [0.5, -1.0, 2.0]
+        assert rows[1]["embedding"] is None
+        blob = store._conn.execute("SELECT embedding FROM shots WHERE id = 1").fetchone()[0]
+        assert len(blob) == 3 * np.dtype(np.float32).itemsize
+    
+    def test_match_shots_ranks_by_cosine(self, store):
+        """Test search returns the closest shots first, without embeddings."""
+        store.insert_shots([
+            shot_row(club="Driver", embedding=[0.0, 1.0]),
+            shot_row(club="7-Iron", embedding=[1.0, 0.1]),
+        ])
+        
+        found = store.match_shots([1.0, 0.0], k=2)
+        
+        assert [r["recommended_club"] for r in found] == ["7-Iron", "Driver"]
+        assert found[0]["similarity"] > found[1]["similarity"]
+        assert "embedding" not in found[0]
+    
+    def test_inserts_after_first_search_are_searchable(self, store):
+        """Test the in-memory index is kept current by later inserts."""
+        store.insert_shots([shot_row(club="Driver", embedding=[0.0, 1.0])])
+        store.match_shots([1.0, 0.0], k=1)
+        
+        store.insert_shots([shot_row(club="7-Iron", embedding=[1.0, 0.0])])
+        
+        assert store.match_shots([1.0, 0.0], k=1)[0]["recommended_club"] == "7-Iron"
+    
+    def test_iter_shots_pages_in_order(self, store):
+        """Test paging yields every row once, in id order."""
+        store.insert_shots([shot_row(carried=c) for c in range(100, 125)])
+        
+        rows = list(store.iter_shots("id,carried", page_size=10, order="id"))
+        
+        assert [r["carried"] for r in rows] == list(range(100, 125))
+    
+    def test_iter_shots_rejects_unknown_columns(self, store):
+        """Test column names cannot smuggle SQL into the query."""
+        with pytest.raises(ValueError):
+            list(store.iter_shots("id; DROP TABLE shots"))
+    
+    def test_persists_to_file(self, tmp_path):
+        """Test shots and distances survive reopening the file."""
+        path = str(tmp_path / "caddie.sqlite")
+        first = SQLiteStorage(path)
+        first.insert_shots([shot_row(embedding=[1.0, 0.0])])
+        first.upsert_club_distances([{"user_id": "u", "club": "7-Iron", "distance": 150}])
+        first.close()
+        
+        second = SQLiteStorage(path)
+        
+        assert second.match_shots([1.0, 0.0], k=1)[0]["id"] == 1
+        assert second.club_distances("u") == {"7-Iron": 150.0}
+        second.close()
+
+
+class TestMakeStorage:
+    """Test backend selection."""
+    
+    def test_kinds(self):
+        """Test each backend name builds its class and unknown names fail."""
+        assert isinstance(make_storage("supabase", client=lambda: None), SupabaseStorage)
+        assert isinstance(make_storage("sqlite"), SQLiteStorage)
+        with pytest.raises(ValueError):
+            make_storage("mongo")
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+from agent_caddie import warmup
+from agent_caddie.app import app
+
+# generous enough for a slow CI box; a regression that eagerly imports
+# openai/supabase again shows up in the module check below regardless
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "2000"))
+
+
+@pytest.fixture(autouse=True)
+def cold_state():
+    """Reset warmup state between tests."""
+    warmup.state.update(status="cold", stages={}, total_ms=None)
+    yield
+    warmup.state.update(status="cold", stages={}, total_ms=None)
+
+
+@pytest.fixture
+def stages():
+    """Replace every warmup stage with a mock."""
+    mocks = {name: AsyncMock(return_value={}) for name in warmup.STAGES}
+    with patch.dict(warmup.STAGES, mocks):
+        yield mocks
+
+
+class TestWarmup:
+    """Test the warmup stages and report."""
+    
+    def test_reports_every_stage(self, stages):
+        """Test a warmup runs each stage once and times it."""
+        report = asyncio.run(warmup.warmup())
+        
+        assert report["status"] == "ready"
+        assert set(report["stages"]) == set(warmup.STAGES)
+        assert all("ms" in stage for stage in report["stages"].values())
+        assert all(mock.await_count == 1 for mock in stages.values())
+    
+    def test_failed_stage_is_retried(self, stages):
+        """Test only failed stages run again on the next warmup."""
+        stages["supabase"].side_effect = [RuntimeError("no network"), {}]
+        
+        first = asyncio.run(warmup.warmup())
+        second = asyncio.run(warmup.warmup())
+        
+        assert first["status"] == "degraded"
+        assert second["status"] == "ready"
+        assert "no network" in first["stages"]["supabase"]["error"]
+        assert "error" not in second["stages"]["supabase"]
+        assert stages["supabase"].await_count == 2
+        assert stages["openai"].await_count == 1
+    
+    @patch('agent_caddie.warmup.db.load_shot_index', return_value=5)
+    def test_index_stage_loads_shot_index(self, mock_load):
+        """Test the index stage loads the local index once."""
+        with patch('agent_caddie.warmup.db.RETRIEVAL_MODE', "embedding"):
+            detail = asyncio.run(warmup._index())
+        
+        assert detail == {"index": "exact", "rows": 5}
+    
+    @patch('agent_caddie.warmup.db.prefill_embedding_cache')
+    def test_cache_prefill_is_opt_in(self, mock_prefill):
+        """Test the embedding cache is only prefilled when enabled."""
+        assert "skipped" in asyncio.run(warmup._embedding_cache())
+        mock_prefill.assert_not_called()
+
+
+class TestHealthEndpoints:
+    """Test /healthz and /warmup."""
+    
+    def test_healthz_is_live_while_warming(self):
+        """Test /healthz stays 200 and /readyz is 503 until warmup has run."""
+        client = TestClient(app)
+        warmup.state["status"] = "warming"
+        
+        assert client.get("/healthz").status_code == 200
+        assert client.get("/healthz").json()["status"] == "warming"
+        assert client.get("/readyz").status_code == 503
+        warmup.state["status"] = "degraded"
+        assert client.get("/readyz").status_code == 200
+    
+    def test_refresh_needs_the_token(self, stages):
+        """Test refresh=true is refused without a matching X-Warmup-Token."""
+        client = TestClient(app)
+        
+        assert client.post("/warmup?refresh=true").status_code == 403
+        with patch('agent_caddie.app.WARMUP_TOKEN', "s3cret"):
+            wrong = client.post("/warmup?refresh=true", headers={"X-Warmup-Token": "guess"})
+            right = client.post("/warmup?refresh=true", headers={"X-Warmup-Token": "s3cret"})
+        
+        assert wrong.status_code == 403
+        assert right.status_code == 200
+        assert all(mock.await_count == 1 for mock in stages.values())
+    
+    def test_warmup_endpoint_returns_timings(self, stages):
+        """Test POST /warmup runs the stages and returns the report."""
+        response = TestClient(app).post("/warmup")
+        
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+        assert "index" in response.json()["stages"]
+
+
+class TestImportBudget:
+    """Test that importing the app stays cheap."""
+    
+    def test_app_import_within_budget(self):
+        """Test the app imports fast, without credentials or heavy clients."""
+        code = (
+            "import json, sys, time\n"
+            "t = time.perf_counter()\n"
+            "import agent_caddie.app\n"
+            "ms = (time.perf_counter() - t) * 1000\n"
+            "heavy = ['openai', 'supabase', 'questionary', 'fastapi.staticfiles']\n"
+            "print(json.dumps({'ms': ms, 'loaded': [m for m in heavy if m in sys.modules]}))\n"
+        )
+        env = {k: v for k, v in os.environ.items()
+               if k not in ("SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY", "OPENAI_API_KEY")}
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env["PYTHONPATH"] = root
+        # best of three so one slow run on a busy machine does not fail the test
+        runs = [
+            json.loads(subprocess.run(
+                [sys.executable, "-c", code], env=env, cwd=root,
+                capture_output=True, text=True, check=True
+            ).stdout)
+            for _ in range(3)
+        ]
+        
+        assert runs[0]["loaded"] == []
+        assert min(r["ms"] for r in runs) < IMPORT_BUDGET_MS
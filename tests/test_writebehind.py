@@ -0,0 +1,203 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch, AsyncMock
+from agent_caddie.writebehind import ShotQueue, WriteBehindWorker
+
+
+@pytest.fixture
+def queue(tmp_path):
+    """Fresh on-disk shot queue."""
+    q = ShotQueue(str(tmp_path / "queue.sqlite"), max_attempts=2, backoff_s=0)
+    yield q
+    q.close()
+
+
+@pytest.fixture
+def shot_entry(sample_scenario, sample_shot_result):
+    """Complete shot entry as the record endpoint enqueues it."""
+    return {**sample_scenario, **sample_shot_result,
+            "user_id": "user123", "recommended_club": "7-Iron"}
+
+
+class TestShotQueue:
+    """Test the durable SQLite queue."""
+    
+    def test_put_claim_ack(self, queue, shot_entry):
+        """Test jobs come back in order and disappear once acked."""
+        first = queue.put(shot_entry)
+        queue.put({**shot_entry, "carried": 160}, mode="features")
+        
+        jobs = queue.claim(10)
+        
+        assert [j[0] for j in jobs] == [first, first + 1]
+        assert jobs[1][1]["carried"] == 160
+        assert jobs[1][2] == "features"
+        assert queue.claim(10) == []
+        assert queue.depth() == 2
+        queue.ack([first, first + 1])
+        assert queue.depth() == 0
+    
+    def test_fail_retries_then_dead_letters(self, queue, shot_entry):
+        """Test failed jobs are retried and kept as dead after max attempts."""
+        job_id = queue.put(shot_entry)
+        queue.claim(1)
+        queue.fail([job_id], "timeout")
+        assert queue.claim(1)[0][0] == job_id
+        queue.fail([job_id], "timeout")
+        
+        assert queue.claim(1) == []
+        assert queue.stats() == {"depth": 0, "in_flight": 0, "dead": 1}
+    
+    def test_survives_restart(self, tmp_path, shot_entry):
+        """Test queued and in-flight jobs are still there after reopening."""
+        path = str(tmp_path / "queue.sqlite")
+        q = ShotQueue(path)
+        q.put(shot_entry)
+        q.put(shot_entry)
+        q.claim(1)
+        q.close()
+        
+        reopened = ShotQueue(path)
+        assert len(reopened.claim(10)) == 2
+        reopened.close()
+
+
+class TestWriteBehindWorker:
+    """Test the background batch writer."""
+    
+    @patch('agent_caddie.writebehind._after_insert')
+    @patch('agent_caddie.writebehind.store_shots')
+    @patch('agent_caddie.writebehind.aget_embeddings', new_callable=AsyncMock)
+    def test_drain_batches_embeddings_and_inserts(self, mock_embed, mock_insert, mock_after,
+                                                  queue, shot_entry):
+        """Test a batch costs one embedding call and one insert."""
+        mock_embed.side_effect = lambda texts: [[0.5]] * len(texts)
+        for _ in range(3):
+            queue.put(shot_entry)
+        queue.put(shot_entry, mode="features")
+        worker = WriteBehindWorker(queue, batch_size=10)
+        
+        assert asyncio.run(worker.drain()) == 4
+        
+        mock_embed.assert_awaited_once()
+        assert len(mock_embed.call_args[0][0]) == 3
+        rows = mock_insert.call_args[0][0]
+        assert [r["embedding"] for r in rows] == [[0.5], [0.5], [0.5], None]
+        assert queue.depth() == 0
+        assert worker.stats()["inserted"] == 4
+    
+    @patch('agent_caddie.writebehind._after_insert')
+    @patch('agent_caddie.writebehind.store_shots')
+    @patch('agent_caddie.writebehind.aget_embeddings', new_callable=AsyncMock)
+    def test_failed_insert_is_retried(self, mock_embed, mock_insert, mock_after, queue, shot_entry):
+        """Test an insert failure leaves the jobs queued for a retry."""
+        mock_embed.side_effect = lambda texts: [[0.5]] * len(texts)
+        mock_insert.side_effect = [RuntimeError("supabase down"), []]
+        queue.put(shot_entry)
+        worker = WriteBehindWorker(queue)
+        
+        asyncio.run(worker.drain())
+        
+        assert worker.stats()["failures"] == 1
+        assert worker.stats()["inserted"] == 1
+        assert mock_insert.call_count == 2
+    
+    @patch('agent_caddie.writebehind._after_insert')
+    @patch('agent_caddie.writebehind.store_shots')
+    @patch('agent_caddie.writebehind.aget_embeddings', new_callable=AsyncMock)
+    def test_background_loop_and_flush_on_stop(self, mock_embed, mock_insert, mock_after,
+                                               queue, shot_entry):
+        """Test queued shots are written by the loop or flushed by stop()."""
+        mock_embed.side_effect = lambda texts: [[0.5]] * len(texts)
+        
+        async def run():
+            worker = WriteBehindWorker(queue, interval_s=60)
+            worker.start()
+            queue.put(shot_entry)
+            worker.notify()
+            await asyncio.sleep(0.05)
+            queue.put(shot_entry)
+            await worker.stop()
+            return worker
+        
+        worker = asyncio.run(run())
+        
+        assert worker.stats()["inserted"] == 2
+        assert queue.depth() == 0
+    
+    @patch('agent_caddie.writebehind._after_insert')
+    @patch('agent_caddie.writebehind.store_shots')
+    @patch('agent_caddie.writebehind.aget_embeddings', new_callable=AsyncMock)
+    def test_stop_mid_insert_writes_once(self, mock_embed, mock_insert, mock_after,
+                                         queue, shot_entry):
+        """Test stop() during a slow insert waits for it instead of inserting again."""
+        mock_embed.side_effect = lambda texts: [[0.5]] * len(texts)
+        inserting = threading.Event()
+        
+        def slow_insert(rows):
+            inserting.set()
+            time.sleep(0.1)
+            return rows
+        
+        mock_insert.side_effect = slow_insert
+        
+        async def run():
+            worker = WriteBehindWorker(queue, interval_s=60)
+            worker.start()
+            queue.put(shot_entry)
+            worker.notify()
+            await asyncio.to_thread(inserting.wait, 1)
+            await worker.stop()
+            return worker
+        
+        worker = asyncio.run(run())
+        
+        assert mock_insert.call_count == 1
+        assert worker.stats()["inserted"] == 1
+        assert queue.depth() == 0
+    
+    @patch('agent_caddie.writebehind._after_insert')
+    @patch('agent_caddie.writebehind.store_shots')
+    @patch('agent_caddie.writebehind.aget_embeddings', new_callable=AsyncMock)
+    def test_bad_row_dies_alone(self, mock_embed, mock_insert, mock_after, queue, shot_entry):
+        """Test a failed batch is retried row by row so only the bad shot dead-letters."""
+        mock_embed.side_effect = lambda texts: [[0.5]] * len(texts)
+        
+        def insert(rows):
+            if any(isinstance(r["carried"], str) for r in rows):
+                raise ValueError("invalid input syntax for type numeric")
+            return rows
+        
+        mock_insert.side_effect = insert
+        for _ in range(4):
+            queue.put(shot_entry)
+        queue.put({**shot_entry, "carried": "long"})
+        worker = WriteBehindWorker(queue, batch_size=10)
+        
+        asyncio.run(worker.drain())
+        asyncio.run(worker.drain())
+        
+        assert worker.stats()["inserted"] == 4
+        assert queue.stats() == {"depth": 0, "in_flight": 0, "dead": 1}
+        assert sum(len(c[0][0]) for c in mock_after.call_args_list) == 4
+    
+    @patch('agent_caddie.writebehind._after_insert')
+    @patch('agent_caddie.writebehind.store_shots')
+    @patch('agent_caddie.writebehind.aget_embeddings', new_callable=AsyncMock)
+    def test_indexing_failure_does_not_reinsert(self, mock_embed, mock_insert, mock_after,
+                                                queue, shot_entry):
+        """Test stored shots are acked even if indexing them fails."""
+        mock_embed.side_effect = lambda texts: [[0.5]] * len(texts)
+        mock_insert.side_effect = lambda rows: rows
+        mock_after.side_effect = RuntimeError("index broke")
+        queue.put(shot_entry)
+        worker = WriteBehindWorker(queue)
+        
+        asyncio.run(worker.drain())
+        asyncio.run(worker.drain())
+        
+        assert mock_insert.call_count == 1
+        assert queue.depth() == 0
+        assert worker.stats()["failures"] == 0